@@ -0,0 +1,88 @@
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from core.async_views import AsyncAPIView
+from core.cache import author_cache
+from core.conditional import (
+    apage_validators, has_conditional_headers, not_modified, rows_validators, set_validators, with_modified,
+)
+from core.pagination import KeysetPagination
+from core.renderers import FastJsonResponse
+from .models import Author
+from .serializers import AuthorSerializer, AuthorDetailSerializer
+from .views import AuthorDetailView
+
+
+class AsyncAuthorListView(AsyncAPIView):
+    """
+    List authors on the ASGI path
+    """
+
+    async def get(self, request):
+        """
+        Retrieve a page of authors, keyset-paginated on ('name', 'id')
+        Same payload and validators as AuthorListCreateView.get, read with the async ORM
+        """
+        try:
+            paginator = KeysetPagination(ordering=('name', 'id'))
+            fieldset = AuthorSerializer.fieldset(request.query_params, paginator.ordering)
+            queryset = fieldset.values(Author.objects.all())
+            if has_conditional_headers(request):
+                window = paginator.get_page_window(queryset, request)
+                etag = await apage_validators(request, window)
+                response = not_modified(request, etag, None)
+                if response is not None:
+                    return response
+                rows = [row async for row in window]
+            else:
+                rows = [row async for row in paginator.get_page_window(with_modified(queryset), request)]
+                etag = rows_validators(request, rows)
+
+            authors = fieldset.rows(paginator.paginate_window(rows))
+            data = {'next': paginator.get_next_link(), 'results': authors}
+            return set_validators(FastJsonResponse(data), etag, None)
+        except ValidationError as e:
+            return JsonResponse({"error": "Invalid field selection", "details": e.detail}, status=400)
+        except NotFound as e:
+            return JsonResponse({"error": str(e.detail)}, status=404)
+        except Exception as e:
+            return JsonResponse(
+                {"error": f"An error occurred while retrieving authors: {str(e)}"}, status=500
+            )
+
+
+class AsyncAuthorDetailView(AsyncAPIView):
+    """
+    Retrieve a specific author on the ASGI path
+    """
+
+    async def load_payload(self, pk):
+        """
+        Helper method to serialize an author for the cache, None if it doesn't exist
+        """
+        try:
+            author = await AuthorDetailSerializer.setup_eager_loading(Author.objects.all()).aget(pk=pk)
+        except Author.DoesNotExist:
+            return None
+        return AuthorDetailView.make_payload(author)
+
+    async def get(self, request, pk):
+        """
+        Retrieve a specific author
+        Same payload, validators and cache entries as AuthorDetailView.get
+        """
+        if has_conditional_headers(request):
+            row = await AuthorDetailView.validators_query(pk).afirst()
+            if row is None:
+                return JsonResponse({"error": "Author not found"}, status=404)
+            response = not_modified(request, *AuthorDetailView.make_validators(pk, *row))
+            if response is not None:
+                return response
+
+        entry = await author_cache.aget_or_load(pk, lambda: self.load_payload(pk))
+        if entry is None:
+            return JsonResponse({"error": "Author not found"}, status=404)
+        return set_validators(
+            JsonResponse({"message": "Author retrieved successfully!", "data": entry["data"]}),
+            entry["etag"],
+            entry["last_modified"],
+        )
@@ -1,4 +1,7 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from core.search import search_vector
 
 class Author(models.Model):
     """
@@ -13,6 +16,16 @@ class Author(models.Model):
         null=True, 
         help_text="Biography of the author"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the author, used for HTTP validators"
+    )
+    search_document = models.GeneratedField(
+        expression=search_vector('name', 'bio'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        help_text="Stored tsvector of the name and bio, kept up to date by the database"
+    )
 
     def __str__(self):
         """
@@ -23,4 +36,10 @@ class Author(models.Model):
     class Meta:
         verbose_name = "Author"
         verbose_name_plural = "Authors"
-        ordering = ['name']
\ No newline at end of file
+        ordering = ['name']
+        indexes = [
+            # Backs keyset pagination on (name, id)
+            models.Index(fields=['name', 'id'], name='author_name_id_idx'),
+            # Backs full-text and prefix search on the name and bio
+            GinIndex(fields=['search_document'], name='author_search_idx'),
+        ]
\ No newline at end of file
@@ -1,7 +1,10 @@
+from django.db.models import Prefetch
 from rest_framework import serializers
+from core.serializers import ValuesSerializerMixin
+from books.models import Book
 from .models import Author
 
-class AuthorSerializer(serializers.ModelSerializer):
+class AuthorSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Author model to handle CRUD operations
     """
@@ -10,6 +13,22 @@ class AuthorSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'bio']
         read_only_fields = ['id']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load only the columns this serializer renders
+        """
+        return queryset.only('id', 'name', 'bio')
+
+class AuthorSearchSerializer(AuthorSerializer):
+    """
+    Author search result with its relevance rank
+    """
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(AuthorSerializer.Meta):
+        fields = ['id', 'name', 'bio', 'rank']
+
 class AuthorDetailSerializer(AuthorSerializer):
     """
     Detailed serializer that includes book information
@@ -17,4 +36,15 @@ class AuthorDetailSerializer(AuthorSerializer):
     books = serializers.StringRelatedField(many=True, read_only=True)
 
     class Meta(AuthorSerializer.Meta):
-        fields = ['id', 'name', 'bio', 'books']
\ No newline at end of file
+        fields = ['id', 'name', 'bio', 'books']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Fetch all books in one extra query. Prefetching through the reverse
+        relation also caches each book's author, so `Book.__str__` doesn't
+        query the author again for every book.
+        """
+        return queryset.only('id', 'name', 'bio', 'updated_at').prefetch_related(
+            Prefetch('books', queryset=Book.objects.only('id', 'title', 'author', 'updated_at'))
+        )
\ No newline at end of file
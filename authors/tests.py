@@ -1,15 +1,22 @@
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from books.models import Book
+from core.cache import author_cache
+from core.testing import QueryBudgetMixin
 from .models import Author
 
 class AuthorAPITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
-        self.author_data = {"name": "Jane Doe", "biography": "Test biography"}
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author_data = {"name": "Jane Doe", "bio": "Test biography"}
         
         # Create an author for testing
-        self.author = Author.objects.create(name="John Doe", biography="Test biography")
+        self.author = Author.objects.create(name="John Doe", bio="Test biography")
 
     def test_get_authors(self):
         """
@@ -35,3 +42,111 @@ class AuthorAPITestCase(TestCase):
         response = self.client.post("/api/authors/", data=invalid_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Validation failed", str(response.data))
+
+class AuthorKeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        for name in ["Ann", "Bob", "Bob", "Cid"]:
+            Author.objects.create(name=name)
+
+    def test_pages_cover_every_author_once(self):
+        """
+        Test walking the next links returns each author exactly once, in order
+        """
+        seen = []
+        url = "/api/authors/?page_size=3"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(author["id"] for author in response.data["results"])
+            url = response.data["next"]
+
+        expected = list(Author.objects.order_by("name", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+class AuthorQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="John Doe")
+        for index in range(50):
+            Book.objects.create(
+                title=f"Book {index}", author=self.author, isbn=f"{index:010d}", available_copies=1
+            )
+
+    def test_author_list_query_budget(self):
+        """
+        Test a page of authors is a single query, its validators computed from the rows
+        """
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/authors/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_author_detail_query_budget(self):
+        """
+        Test an author's books cost one query no matter how many there are
+        """
+        with self.assertMaxQueries(2):
+            response = self.client.get(f"/api/authors/{self.author.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]["books"]), 50)
+        self.assertIn("Book 0 by John Doe", response.data["data"]["books"])
+
+
+class AuthorConditionalRequestTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        author_cache.local.clear()
+        self.author = Author.objects.create(name="John Doe")
+        Book.objects.create(title="First Book", author=self.author, isbn="1234567890", available_copies=1)
+        self.url = f"/api/authors/{self.author.id}/"
+
+    def test_detail_not_modified_until_books_change(self):
+        """
+        Test the author's ETag holds until one of their books changes
+        """
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertMaxQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/books/",
+                {"title": "Second Book", "author": self.author.id, "isbn": "1234567891", "available_copies": 1},
+            )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["data"]["books"]), 2)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class AuthorSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        Author.objects.create(name="Charles Dickens", bio="Victorian novelist")
+        Author.objects.create(name="Jane Austen", bio="Regency novels of manners")
+        Author.objects.create(name="Emily Dickinson", bio="Poet")
+
+    def test_search_name_and_bio(self):
+        """
+        Test names and bios are both searched by prefix
+        """
+        response = self.client.get("/api/authors/search/", {"q": "dick"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [author["name"] for author in response.data["results"]], ["Charles Dickens", "Emily Dickinson"]
+        )
+
+        response = self.client.get("/api/authors/search/", {"q": "novel"})
+        self.assertCountEqual(
+            [author["name"] for author in response.data["results"]], ["Charles Dickens", "Jane Austen"]
+        )
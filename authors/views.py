@@ -1,12 +1,22 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from .models import Author
-from .serializers import AuthorSerializer, AuthorDetailSerializer
+from .serializers import AuthorSerializer, AuthorDetailSerializer, AuthorSearchSerializer
 from django.db import IntegrityError
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from books.models import Book
+from django.db.models import Count, Max, Sum
+from core.cache import author_cache, book_cache
+from core.conditional import (
+    has_conditional_headers, make_etag, not_modified, page_validators, rows_validators, set_validators, with_modified,
+)
+from core.pagination import KeysetPagination
+from core.renderers import StreamingListResponse
+from core.search import prefix_query, ranked_matches
 
 class AuthorListCreateView(APIView):
     """
@@ -15,17 +25,59 @@ class AuthorListCreateView(APIView):
     permission_classes = [IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Retrieve list of all authors",
+        operation_description="Retrieve a page of authors",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor taken from the previous page's `next` link"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page"),
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Stream every author in one response instead of a page"),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Comma-separated fields to return, e.g. `id,name`"),
+        ],
         responses={200: AuthorSerializer(many=True)},
     )
     def get(self, request):
         """
-        Retrieve list of all authors
+        Retrieve a page of authors, keyset-paginated on ('name', 'id')
+        Conditional requests are answered 304 from one aggregate over the page when
+        the client's copy is current; others get validators from the loaded rows
+        Rows are read with values(), selecting only the ?fields= asked for
+        With ?stream=1 the whole list is streamed from a server-side cursor instead
         """
         try:
-            authors = Author.objects.all()
-            serializer = AuthorSerializer(authors, many=True)
-            return Response(serializer.data)
+            paginator = KeysetPagination(ordering=('name', 'id'))
+            fieldset = AuthorSerializer.fieldset(request.query_params, paginator.ordering)
+            if request.query_params.get('stream') in ('1', 'true'):
+                return StreamingListResponse(
+                    fieldset.values(Author.objects.order_by(*paginator.ordering)), transform=fieldset.rows
+                )
+
+            queryset = fieldset.values(Author.objects.all())
+            if has_conditional_headers(request):
+                window = paginator.get_page_window(queryset, request)
+                etag = page_validators(request, window)
+                response = not_modified(request, etag, None)
+                if response is not None:
+                    return response
+                rows = list(window)
+            else:
+                rows = list(paginator.get_page_window(with_modified(queryset), request))
+                etag = rows_validators(request, rows)
+
+            authors = fieldset.rows(paginator.paginate_window(rows))
+            return set_validators(paginator.get_paginated_response(authors), etag, None)
+        except ValidationError as e:
+            return Response(
+                {"error": "Invalid field selection", "details": e.detail},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
         except Exception as e:
             return Response(
                 {"error": f"An error occurred while retrieving authors: {str(e)}"},
@@ -76,15 +128,61 @@ class AuthorDetailView(APIView):
     """
     permission_classes = [IsAuthenticated]
     
-    def get_object(self, pk):
+    def get_object(self, pk, queryset=None):
         """
         Helper method to get author instance
         """
+        if queryset is None:
+            queryset = Author.objects.all()
         try:
-            return Author.objects.get(pk=pk)
+            return queryset.get(pk=pk)
         except Author.DoesNotExist:
             return None
 
+    @staticmethod
+    def make_validators(pk, updated_at, books_updated_at, books_count, books_ids):
+        """
+        ETag of an author payload, which also lists the author's books
+        No Last-Modified: a book leaving the list doesn't move the newest timestamp
+        """
+        etag = make_etag('author', pk, updated_at, books_updated_at, books_count, books_ids)
+        return etag, None
+
+    @staticmethod
+    def validators_query(pk):
+        """
+        One-row aggregate of the values make_validators takes
+        """
+        return (
+            Author.objects.filter(pk=pk)
+            .annotate(books_updated_at=Max('books__updated_at'), books_count=Count('books'), books_ids=Sum('books__id'))
+            .values_list('updated_at', 'books_updated_at', 'books_count', 'books_ids')
+        )
+
+    @classmethod
+    def make_payload(cls, author):
+        """
+        Cache entry for an author loaded with AuthorDetailSerializer's eager loading
+        """
+        books = author.books.all()
+        etag, last_modified = cls.make_validators(
+            author.pk,
+            author.updated_at,
+            max((book.updated_at for book in books), default=None),
+            len(books),
+            sum(book.pk for book in books) if books else None,
+        )
+        return {"data": dict(AuthorDetailSerializer(author).data), "etag": etag, "last_modified": last_modified}
+
+    def load_payload(self, pk):
+        """
+        Helper method to serialize an author for the cache, None if it doesn't exist
+        """
+        author = self.get_object(
+            pk, queryset=AuthorDetailSerializer.setup_eager_loading(Author.objects.all())
+        )
+        return self.make_payload(author) if author else None
+
     @swagger_auto_schema(
         operation_description="Retrieve s specific author",
         responses={200: AuthorDetailSerializer(many=True)},
@@ -92,16 +190,30 @@ class AuthorDetailView(APIView):
     def get(self, request, pk):
         """
         Retrieve a specific author
+        Served from the catalog cache when possible; conditional requests
+        are answered from one aggregate over the author and their books
         """
-        author = self.get_object(pk)
-        if not author:
+        if has_conditional_headers(request):
+            row = self.validators_query(pk).first()
+            if row is None:
+                return Response(
+                    {"error": "Author not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            response = not_modified(request, *self.make_validators(pk, *row))
+            if response is not None:
+                return response
+
+        entry = author_cache.get_or_load(pk, lambda: self.load_payload(pk))
+        if entry is None:
             return Response(
                 {"error": "Author not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        serializer = AuthorDetailSerializer(author)
-        return Response(
-            {"message": "Author retrieved successfully!", "data": serializer.data}
+        return set_validators(
+            Response({"message": "Author retrieved successfully!", "data": entry["data"]}),
+            entry["etag"],
+            entry["last_modified"],
         )
 
     @swagger_auto_schema(
@@ -131,9 +243,14 @@ class AuthorDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
         
+        previous_name = author.name
         serializer = AuthorSerializer(author, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            author_cache.invalidate(pk)
+            if author.name != previous_name:
+                # Book payloads carry the author's name
+                book_cache.invalidate(*Book.objects.filter(author_id=pk).values_list('id', flat=True))
             return Response(
                 {"message": "Author updated successfully!", "data": serializer.data}
             )
@@ -158,7 +275,10 @@ class AuthorDetailView(APIView):
             )
         
         try:
+            book_ids = list(Book.objects.filter(author_id=pk).values_list('id', flat=True))
             author.delete()
+            author_cache.invalidate(pk)
+            book_cache.invalidate(*book_ids)
             return Response(
                 {"message": "Author deleted successfully!"},
                 status=status.HTTP_204_NO_CONTENT,
@@ -168,3 +288,51 @@ class AuthorDetailView(APIView):
                 {"error": f"An unexpected error occurred: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class AuthorSearchView(APIView):
+    """
+    Search authors by name or biography
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Search authors by name and biography prefix terms",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Words to find, each matched as a prefix"),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor taken from the previous page's `next` link"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page"),
+        ],
+        responses={200: AuthorSearchSerializer(many=True), 400: "Validation Error"},
+    )
+    def get(self, request):
+        """
+        Retrieve a page of matching authors, best match first, through the GIN index
+        """
+        query = prefix_query(request.query_params.get('q', ''))
+        if query is None:
+            return Response(
+                {"error": "Query parameter 'q' must contain at least one word"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            paginator = KeysetPagination(ordering=('-rank', 'id'))
+            authors = ranked_matches(
+                AuthorSearchSerializer.setup_eager_loading(Author.objects.all()), query
+            )
+            serializer = AuthorSearchSerializer(paginator.paginate_queryset(authors, request, view=self), many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while searching authors: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
@@ -0,0 +1,63 @@
+import random
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.availability import AvailabilityIndex
+from books.models import Book
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the availability index: memory of the array-backed index against a dict of "
+        "isbn -> (id, copies) tuples, and lookups per second against an isbn__in query. "
+        "Needs a populated database (generate_library)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch', type=int, default=1000, help="ISBNs per lookup batch")
+        parser.add_argument('--repeat', type=int, default=20, help="Timed batches per method")
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        batch, repeat = options['batch'], options['repeat']
+        if batch <= 0 or repeat <= 0:
+            raise CommandError("--batch and --repeat must be positive")
+        rows = list(Book.objects.values_list('id', 'isbn', 'available_copies'))
+        if len(rows) < batch:
+            raise CommandError(f"Only {len(rows)} books in the database; generate_library first")
+        self.stdout.write(f"{len(rows):,} books")
+
+        index = AvailabilityIndex()
+        started = time.perf_counter()
+        index.fresh_snapshot()
+        self.stdout.write(f"  index built in {(time.perf_counter() - started) * 1000:.0f}ms")
+
+        # Loaded afresh, so the ISBN strings and ids it keeps are counted too
+        queryset = Book.objects.values_list('id', 'isbn', 'available_copies').iterator(chunk_size=10000)
+        tracemalloc.start()
+        as_dict = {isbn: (book_id, copies) for book_id, isbn, copies in queryset}
+        dict_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.stdout.write(
+            f"  memory: arrays {index.memory_bytes() / 1e6:.1f}MB "
+            f"({index.memory_bytes() / len(rows):.0f} B/book), "
+            f"dict of tuples {dict_bytes / 1e6:.1f}MB ({dict_bytes / len(rows):.0f} B/book)"
+        )
+
+        rng = random.Random(options['seed'])
+        samples = [[isbn for _, isbn, _ in rng.sample(rows, batch)] for _ in range(repeat)]
+        methods = {
+            'index': lambda isbns: index.lookup(isbns=isbns),
+            'dict': lambda isbns: [as_dict.get(isbn) for isbn in isbns],
+            'isbn__in query': lambda isbns: list(
+                Book.objects.filter(isbn__in=isbns).values_list('id', 'isbn', 'available_copies')
+            ),
+        }
+        for name, method in methods.items():
+            started = time.perf_counter()
+            for isbns in samples:
+                method(isbns)
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {name:<16} {batch * repeat / elapsed:>12,.0f} lookups/s")
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from authors.models import Author
+from books.models import Book
+from reports import counters
+
+# Fixed rows so every run loads the same catalog; reruns reuse them and --drop finds them
+ISBN_PREFIX = '978998'
+AUTHOR_NAME = 'Bench Books Author'
+USERNAME = 'bench-books'
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the book list and detail endpoints of a running server: seed a fixed catalog "
+        "and user, then load the endpoints with `loadtest` and report requests/sec and p50/p95/p99. "
+        "Run it against the server before and after a configuration change to compare them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--base-url', default='http://127.0.0.1:8000', help="Server to load, e.g. gunicorn started with gunicorn.conf.py"
+        )
+        parser.add_argument('--books', type=int, default=10_000, help="Books in the benchmark catalog")
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent client connections")
+        parser.add_argument('--duration', type=float, default=15.0, help="Seconds to load each endpoint")
+        parser.add_argument('--host-header', help="Host header to send, if it must match ALLOWED_HOSTS")
+        parser.add_argument('--drop', action='store_true', help="Delete the benchmark catalog and user and exit")
+
+    def handle(self, *args, **options):
+        if options['drop']:
+            self.drop()
+            return
+
+        book_id = self.seed(options['books'])
+        base_url = options['base_url'].rstrip('/')
+        call_command(
+            'loadtest',
+            f'{base_url}/api/books/',
+            f'{base_url}/api/books/{book_id}/',
+            login=USERNAME,
+            concurrency=options['concurrency'],
+            duration=options['duration'],
+            host_header=options['host_header'],
+            stdout=self.stdout,
+        )
+
+    def seed(self, book_count):
+        """
+        Create whatever part of the catalog and user is missing and return the
+        id of the book the detail endpoint is loaded with.
+        """
+        User.objects.get_or_create(username=USERNAME)
+        author, _ = Author.objects.get_or_create(name=AUTHOR_NAME, defaults={'bio': 'Benchmark catalog'})
+        existing = Book.objects.filter(isbn__startswith=ISBN_PREFIX).count()
+        if existing < book_count:
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    [
+                        Book(
+                            title=f"Bench Book {index:06d}",
+                            author=author,
+                            isbn=f"{ISBN_PREFIX}{index:07d}",
+                            available_copies=index % 5,
+                        )
+                        for index in range(existing, book_count)
+                    ],
+                    batch_size=5000,
+                )
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Book._meta.db_table}')
+            # bulk_create skips the counter signals
+            counters.reconcile()
+            self.stdout.write(f"Added {book_count - existing} benchmark books")
+        return Book.objects.get(isbn=f"{ISBN_PREFIX}{0:07d}").pk
+
+    def drop(self):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {Book._meta.db_table} WHERE isbn LIKE %s', [f'{ISBN_PREFIX}%'])
+            books = cursor.rowcount
+        Author.objects.filter(name=AUTHOR_NAME).delete()
+        User.objects.filter(username=USERNAME).delete()
+        counters.reconcile()
+        self.stdout.write(f"Deleted {books} benchmark books")
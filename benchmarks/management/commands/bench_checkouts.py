@@ -0,0 +1,102 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from authors.models import Author
+from books.models import Book
+from borrowrecords.models import BorrowRecord
+from borrowrecords.serializers import BorrowRecordSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress the borrow path with concurrent checkouts of a single hot book and "
+        "report checkouts/sec. Creates its own author and book and deletes them afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16, help="Concurrent borrowers")
+        parser.add_argument('--attempts', type=int, default=2000, help="Total checkout attempts")
+        parser.add_argument(
+            '--copies', type=int, default=None,
+            help="Copies on the hot book (default: half the attempts, so some must be refused)",
+        )
+        parser.add_argument('--keep', action='store_true', help="Keep the benchmark data")
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        attempts = options['attempts']
+        copies = options['copies'] if options['copies'] is not None else attempts // 2
+
+        author = Author.objects.create(name="Benchmark Author")
+        book = Book.objects.create(
+            title="Benchmark Hot Book",
+            author=author,
+            isbn=str(time.time_ns())[-13:],
+            available_copies=copies,
+        )
+
+        results = {'borrowed': 0, 'refused': 0, 'errors': 0}
+        lock = threading.Lock()
+        start_barrier = threading.Barrier(threads)
+
+        def worker(worker_attempts, worker_id):
+            counts = {'borrowed': 0, 'refused': 0, 'errors': 0}
+            try:
+                start_barrier.wait()
+                for attempt in range(worker_attempts):
+                    serializer = BorrowRecordSerializer(
+                        data={'book': book.id, 'borrowed_by': f"bench-{worker_id}-{attempt}"}
+                    )
+                    try:
+                        if serializer.is_valid():
+                            serializer.save()
+                            counts['borrowed'] += 1
+                        else:
+                            counts['refused'] += 1
+                    except ValueError:
+                        counts['refused'] += 1
+                    except Exception:
+                        counts['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in counts.items():
+                        results[key] += value
+
+        per_thread, remainder = divmod(attempts, threads)
+        pool = [
+            threading.Thread(target=worker, args=(per_thread + (1 if i < remainder else 0), i))
+            for i in range(threads)
+        ]
+        started = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        book.refresh_from_db(fields=['available_copies'])
+        records = BorrowRecord.objects.filter(book=book).count()
+        consistent = (
+            book.available_copies >= 0
+            and records == results['borrowed']
+            and book.available_copies == copies - results['borrowed']
+        )
+
+        self.stdout.write(f"threads={threads} attempts={attempts} copies={copies}")
+        self.stdout.write(
+            f"borrowed={results['borrowed']} refused={results['refused']} errors={results['errors']}"
+        )
+        self.stdout.write(f"elapsed={elapsed:.3f}s checkouts/sec={results['borrowed'] / elapsed:.1f}")
+        self.stdout.write(
+            f"remaining_copies={book.available_copies} records={records} consistent={consistent}"
+        )
+
+        if not options['keep']:
+            author.delete()
+
+        if not consistent:
+            raise CommandError("Copy count and borrow records disagree")
@@ -0,0 +1,57 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+
+from books.models import Book
+
+MIDDLEWARE = 'core.metrics.RequestMetricsMiddleware'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the per-request overhead of the request metrics middleware: time the same "
+        "requests in process with and without it, alternating rounds to cancel out drift."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help="Requests per round and endpoint")
+        parser.add_argument('--rounds', type=int, default=7, help="Rounds with and without the middleware")
+
+    def handle(self, *args, **options):
+        if options['rounds'] < 2:
+            raise CommandError("--rounds must be at least 2 to measure round-to-round noise")
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1")
+        book = Book.objects.order_by('id').first()
+        if book is None:
+            raise CommandError("Needs at least one book; run bench_books to seed a catalog")
+        user, _ = User.objects.get_or_create(username='bench-metrics')
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and host[0] != '.'), 'localhost')
+        paths = {'book list': '/api/books/', 'book detail': f'/api/books/{book.pk}/'}
+        without = [name for name in settings.MIDDLEWARE if name != MIDDLEWARE]
+        with_metrics = [MIDDLEWARE] + without
+
+        for name, path in paths.items():
+            timings = {'with': [], 'without': []}
+            for _ in range(options['rounds']):
+                for label, middleware in (('without', without), ('with', with_metrics)):
+                    with override_settings(MIDDLEWARE=middleware):
+                        client = Client(HTTP_HOST=host)
+                        client.force_login(user)
+                        client.get(path)  # load the middleware chain and warm the cache
+                        started = time.perf_counter()
+                        for _ in range(options['requests']):
+                            client.get(path)
+                        timings[label].append((time.perf_counter() - started) / options['requests'] * 1e6)
+
+            base, instrumented = statistics.median(timings['without']), statistics.median(timings['with'])
+            noise = max(statistics.stdev(timings['without']), statistics.stdev(timings['with']))
+            self.stdout.write(
+                f"{name:<12} without={base:.0f}us with={instrumented:.0f}us "
+                f"overhead={instrumented - base:.0f}us ({(instrumented - base) / base:.1%}) "
+                f"round-to-round stdev={noise:.0f}us"
+            )
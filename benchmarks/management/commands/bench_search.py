@@ -0,0 +1,174 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authors.models import Author
+from authors.views import AuthorSearchView
+from books.models import Book
+from books.views import BookSearchView
+from reports import counters
+
+# Synthetic rows are recognised by these, so reruns reuse them and --drop finds them
+ISBN_PREFIX = '978999'
+AUTHOR_PREFIX = 'Bench'
+
+SYLLABLES = (
+    'an', 'bel', 'cor', 'da', 'el', 'fen', 'gar', 'hal', 'is', 'jor', 'kel', 'lan', 'mor', 'nor', 'os',
+    'per', 'quin', 'ral', 'sen', 'tor', 'ul', 'ven', 'wyn', 'yr', 'zan', 'bri', 'cla', 'dro', 'fra', 'gly',
+)
+# Catalog-sized vocabulary: every word is rare, as in real titles
+VOCABULARY_SIZE = 20_000
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark /api/books/search/ and /api/authors/search/ on a synthetic catalog and report "
+        "latency percentiles. The catalog (1M books by default) is generated once and reused."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1_000_000, help="Synthetic books to search")
+        parser.add_argument('--authors', type=int, default=20_000, help="Synthetic authors to search")
+        parser.add_argument('--queries', type=int, default=500, help="Requests timed per endpoint")
+        parser.add_argument('--p95-ms', type=float, default=50.0, help="p95 latency target in milliseconds")
+        parser.add_argument('--seed', type=int, default=1, help="Seed for data and query generation")
+        parser.add_argument('--drop', action='store_true', help="Delete the synthetic catalog and exit")
+
+    def handle(self, *args, **options):
+        if options['drop']:
+            self.drop()
+            return
+
+        rng = random.Random(options['seed'])
+        self.words = self.vocabulary(random.Random(options['seed']))
+        self.generate(rng, options['authors'], options['books'])
+
+        factory = APIRequestFactory()
+        user = User(username='bench-search')
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and host[0] != '.'), 'localhost')
+
+        def request(view, path, params):
+            http_request = factory.get(path, params, HTTP_HOST=host)
+            force_authenticate(http_request, user=user)
+            started = time.perf_counter()
+            response = view(http_request)
+            elapsed = (time.perf_counter() - started) * 1000
+            if response.status_code != 200:
+                raise CommandError(f"{path} {params} returned {response.status_code}: {response.data}")
+            return elapsed
+
+        book_view = BookSearchView.as_view()
+        author_view = AuthorSearchView.as_view()
+        suites = {
+            'books prefix': lambda: request(book_view, '/api/books/search/', {'q': self.prefix_terms(rng)}),
+            'books isbn': lambda: request(
+                book_view, '/api/books/search/', {'q': f"{ISBN_PREFIX}{rng.randrange(options['books']):07d}"}
+            ),
+            'authors prefix': lambda: request(author_view, '/api/authors/search/', {'q': self.prefix_terms(rng)}),
+        }
+
+        failed = []
+        for name, run in suites.items():
+            run()  # warm the connection and plan cache
+            timings = sorted(run() for _ in range(options['queries']))
+            p50, p95, p99 = (timings[int(len(timings) * q) - 1] for q in (0.50, 0.95, 0.99))
+            self.stdout.write(
+                f"{name:<15} n={len(timings)} mean={statistics.fmean(timings):.1f}ms "
+                f"p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms"
+            )
+            if p95 > options['p95_ms']:
+                failed.append(name)
+
+        if failed:
+            raise CommandError(f"p95 above {options['p95_ms']}ms for: {', '.join(failed)}")
+
+    def vocabulary(self, rng):
+        """
+        Distinct pronounceable words of two to four syllables.
+        """
+        words = set()
+        while len(words) < VOCABULARY_SIZE:
+            words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+        return sorted(words)
+
+    def prefix_terms(self, rng):
+        """
+        One or two words, the last one cut short as if still being typed.
+        """
+        words = rng.sample(self.words, rng.choice((1, 2)))
+        words[-1] = words[-1][:rng.randint(3, len(words[-1]))]
+        return ' '.join(words)
+
+    def generate(self, rng, author_count, book_count):
+        """
+        Bulk insert whatever part of the synthetic catalog is missing.
+        """
+        existing_authors = list(
+            Author.objects.filter(name__startswith=f'{AUTHOR_PREFIX} ').order_by('id').values_list('id', flat=True)
+        )
+        existing_books = Book.objects.filter(isbn__startswith=ISBN_PREFIX).count()
+        if len(existing_authors) >= author_count and existing_books >= book_count:
+            self.stdout.write(f"Reusing {existing_books} synthetic books and {len(existing_authors)} authors")
+            return
+
+        started = time.perf_counter()
+        new_authors = Author.objects.bulk_create(
+            [
+                Author(
+                    name=f"{AUTHOR_PREFIX} {' '.join(rng.sample(self.words, 2)).title()} {index}",
+                    bio=' '.join(rng.choices(self.words, k=12)),
+                )
+                for index in range(len(existing_authors), author_count)
+            ],
+            batch_size=5000,
+        )
+        author_ids = existing_authors + [author.id for author in new_authors]
+
+        batch_size = 10_000
+        for offset in range(existing_books, book_count, batch_size):
+            with transaction.atomic():
+                Book.objects.bulk_create(
+                    [
+                        Book(
+                            title=' '.join(rng.choices(self.words, k=rng.randint(2, 5))).title(),
+                            author_id=rng.choice(author_ids),
+                            isbn=f"{ISBN_PREFIX}{index:07d}",
+                            available_copies=rng.randint(0, 5),
+                        )
+                        for index in range(offset, min(offset + batch_size, book_count))
+                    ]
+                )
+            done = min(offset + batch_size, book_count)
+            if done % 100_000 == 0 or done == book_count:
+                self.stdout.write(f"  {done} / {book_count} books")
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ANALYZE {Book._meta.db_table}, {Author._meta.db_table}')
+        # bulk_create skips the counter signals
+        counters.reconcile()
+        self.stdout.write(f"Generated the synthetic catalog in {time.perf_counter() - started:.1f}s")
+
+    def drop(self):
+        """
+        Delete the synthetic catalog with plain DELETEs; going through the ORM
+        would load a million books to run their delete signals.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Book._meta.db_table} WHERE isbn LIKE %s', [f'{ISBN_PREFIX}%']
+            )
+            books = cursor.rowcount
+            cursor.execute(
+                f'DELETE FROM {Author._meta.db_table} a WHERE name LIKE %s '
+                f'AND NOT EXISTS (SELECT 1 FROM {Book._meta.db_table} b WHERE b.author_id = a.id)',
+                [f'{AUTHOR_PREFIX} %'],
+            )
+            authors = cursor.rowcount
+        counters.reconcile()
+        self.stdout.write(f"Deleted {books} synthetic books and {authors} authors")
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from books.models import Book
+from books.serializers import BookSerializer
+from borrowrecords.models import BorrowRecord
+from borrowrecords.serializers import BorrowRecordSerializer
+from core.renderers import FastJSONRenderer
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure list serialization throughput in rows per second: ModelSerializer instances "
+        "rendered by DRF's JSONRenderer against values() rows rendered by FastJSONRenderer, "
+        "split into fetch+serialize and render time. Needs a populated database (generate_library)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows per list")
+        parser.add_argument('--repeat', type=int, default=30, help="Timed runs per mode; the median is reported")
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        if rows <= 0 or repeat <= 0:
+            raise CommandError("--rows and --repeat must be positive")
+        datasets = {
+            'books': (BookSerializer, Book.objects.order_by('title', 'id')),
+            'borrow records': (BorrowRecordSerializer, BorrowRecord.objects.order_by('-borrow_date', '-id')),
+        }
+        for name, (serializer_class, queryset) in datasets.items():
+            window = queryset[:rows]
+            count = window.count()
+            if count < rows:
+                raise CommandError(f"Only {count} {name} in the database; generate_library first")
+            modes = {
+                'serializer + JSONRenderer': (
+                    lambda: serializer_class(serializer_class.setup_eager_loading(window), many=True).data,
+                    JSONRenderer(),
+                ),
+                'serializer + FastJSONRenderer': (
+                    lambda: serializer_class(serializer_class.setup_eager_loading(window), many=True).data,
+                    FastJSONRenderer(),
+                ),
+                'values + FastJSONRenderer': (
+                    lambda: list(serializer_class.values(window)),
+                    FastJSONRenderer(),
+                ),
+            }
+            self.stdout.write(f"{name}, {rows} rows per list:")
+            outputs = set()
+            for mode, (build, renderer) in modes.items():
+                build_ms, render_ms = [], []
+                for _ in range(repeat + 1):
+                    started = time.perf_counter()
+                    data = build()
+                    built = time.perf_counter()
+                    body = renderer.render({'results': data})
+                    build_ms.append((built - started) * 1000)
+                    render_ms.append((time.perf_counter() - built) * 1000)
+                # The first run warms the connection and caches
+                build_ms, render_ms = statistics.median(build_ms[1:]), statistics.median(render_ms[1:])
+                outputs.add(body)
+                self.stdout.write(
+                    f"  {mode:<30} fetch+serialize={build_ms:7.2f}ms render={render_ms:6.2f}ms "
+                    f"{rows / (build_ms + render_ms) * 1000:>9,.0f} rows/s"
+                )
+            if len(outputs) != 1:
+                raise CommandError(f"The modes rendered different {name} payloads")
@@ -0,0 +1,252 @@
+import itertools
+import random
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from authors.models import Author
+from books.models import Book
+from borrowers.models import Borrower
+from borrowrecords import partitions
+from borrowrecords.models import BorrowRecord, LOAN_PERIOD_DAYS
+from reports import counters
+
+# ISBN-13s of generated books start with this (the 979-88 range is unassigned),
+# which is how reruns find what exists and --clear finds what to delete
+ISBN_PREFIX = '97988'
+# Generated authors carry this bio, so --clear leaves real authors alone
+AUTHOR_BIO = 'Generated by generate_library.'
+
+SCALES = {
+    'small': {'authors': 500, 'books': 5_000, 'borrows': 20_000, 'borrowers': 1_000},
+    'medium': {'authors': 5_000, 'books': 100_000, 'borrows': 1_000_000, 'borrowers': 20_000},
+    'large': {'authors': 50_000, 'books': 1_000_000, 'borrows': 10_000_000, 'borrowers': 200_000},
+}
+
+FIRST_NAMES = (
+    'Ada', 'Alan', 'Amara', 'Ben', 'Chen', 'Clara', 'Dario', 'Elena', 'Emeka', 'Farah', 'Grace', 'Hana',
+    'Ivan', 'Jon', 'Kai', 'Lena', 'Luis', 'Maya', 'Nadia', 'Omar', 'Priya', 'Quinn', 'Rosa', 'Sam',
+    'Tariq', 'Uma', 'Vera', 'Wei', 'Yara', 'Zoe',
+)
+LAST_NAMES = (
+    'Abbott', 'Bauer', 'Castillo', 'Dubois', 'Eriksen', 'Fischer', 'Garcia', 'Haddad', 'Ito', 'Jensen',
+    'Kowalski', 'Larsen', 'Moreau', 'Nakamura', 'Okafor', 'Petrov', 'Quispe', 'Rossi', 'Silva', 'Tanaka',
+    'Umarov', 'Varga', 'Walsh', 'Xu', 'Yilmaz', 'Zhang',
+)
+ADJECTIVES = (
+    'Silent', 'Golden', 'Broken', 'Hidden', 'Last', 'Crimson', 'Distant', 'Forgotten', 'Northern', 'Quiet',
+    'Burning', 'Glass', 'Hollow', 'Iron', 'Midnight', 'Painted', 'Restless', 'Salt', 'Winter', 'Wild',
+)
+NOUNS = (
+    'River', 'Garden', 'Kingdom', 'Harbor', 'Archive', 'Orchard', 'Lantern', 'Empire', 'Island', 'Letter',
+    'Mountain', 'Signal', 'Station', 'Tide', 'Voyage', 'Cartographer', 'Engine', 'Library', 'Mirror', 'Sparrow',
+)
+TITLE_PATTERNS = (
+    'The {adjective} {noun}', '{adjective} {noun}', 'The {noun} of {place}', 'A {noun} in {place}',
+    'The {adjective} {noun}s', '{noun} and {noun2}',
+)
+PLACES = ('Avalon', 'Brightwater', 'Carthage', 'Dunmore', 'Elsinore', 'Fairhaven', 'Galway', 'Lisbon', 'Samarkand')
+
+BATCH_SIZE = 5000
+
+
+def isbn13(body):
+    """
+    Complete a 12-digit ISBN body with its check digit.
+    """
+    total = sum(int(digit) * (3 if index % 2 else 1) for index, digit in enumerate(body))
+    return body + str((10 - total % 10) % 10)
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a realistic synthetic library: authors with a long tail of prolific writers, books "
+        "with valid ISBN-13s, and a borrow history whose popularity follows a Zipf distribution. "
+        "A fresh run depends only on the options and --seed; reruns add whatever is missing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=SCALES, default='small', help="Preset sizes, overridden by the options below")
+        parser.add_argument('--authors', type=int, help="Authors to generate")
+        parser.add_argument('--books', type=int, help="Books to generate")
+        parser.add_argument('--borrows', type=int, help="Borrow records to generate")
+        parser.add_argument('--borrowers', type=int, help="Distinct borrower names")
+        parser.add_argument('--days', type=int, default=365, help="Days of borrow history, ending today")
+        parser.add_argument(
+            '--skew', type=float, default=1.1,
+            help="Zipf exponent of book and borrower popularity; 0 is uniform, higher concentrates loans",
+        )
+        parser.add_argument('--seed', type=int, default=1, help="Random seed")
+        parser.add_argument('--clear', action='store_true', help="Delete the generated library and exit")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.clear()
+            return
+
+        sizes = {name: options[name] if options[name] is not None else value for name, value in SCALES[options['scale']].items()}
+        if min(sizes.values()) < 0 or sizes['books'] > 10 ** 7:
+            raise CommandError("Sizes must be non-negative and --books at most 10,000,000")
+        if sizes['books'] and not sizes['authors']:
+            raise CommandError("Books need at least one author")
+
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        author_ids = self.generate_authors(rng, sizes['authors'])
+        book_ids = self.generate_books(rng, author_ids, sizes['books'], options['skew'])
+        if sizes['borrows'] and book_ids:
+            self.generate_borrows(rng, book_ids, sizes['borrows'], sizes['borrowers'], options['days'], options['skew'])
+            # Backdated loans older than a partitioned table's first month land in its default partition
+            partitions.ensure_partitions()
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'ANALYZE {Author._meta.db_table}, {Book._meta.db_table}, {BorrowRecord._meta.db_table}'
+            )
+        # Bulk inserts skip the counter signals
+        counters.reconcile()
+        self.stdout.write(f"Library ready in {time.perf_counter() - started:.1f}s: {sizes}")
+
+    def generate_authors(self, rng, count):
+        existing = list(Author.objects.filter(bio=AUTHOR_BIO).order_by('id').values_list('id', flat=True))
+        if len(existing) < count:
+            Author.objects.bulk_create(
+                [
+                    Author(name=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {index}", bio=AUTHOR_BIO)
+                    for index in range(len(existing), count)
+                ],
+                batch_size=BATCH_SIZE,
+            )
+            existing = list(Author.objects.filter(bio=AUTHOR_BIO).order_by('id').values_list('id', flat=True))
+            self.stdout.write(f"  {len(existing)} authors")
+        return existing[:count]
+
+    def generate_books(self, rng, author_ids, count, skew):
+        """
+        Books with sequential ISBN bodies; a few authors write many of them.
+        """
+        existing = Book.objects.filter(isbn__startswith=ISBN_PREFIX).count()
+        author_weights = list(itertools.accumulate(1 / rank ** (skew / 2) for rank in range(1, len(author_ids) + 1)))
+        for offset in range(existing, count, BATCH_SIZE):
+            books = []
+            for index in range(offset, min(offset + BATCH_SIZE, count)):
+                title = rng.choice(TITLE_PATTERNS).format(
+                    adjective=rng.choice(ADJECTIVES), noun=rng.choice(NOUNS),
+                    noun2=rng.choice(NOUNS), place=rng.choice(PLACES),
+                )
+                books.append(Book(
+                    title=title,
+                    author_id=rng.choices(author_ids, cum_weights=author_weights)[0],
+                    isbn=isbn13(f"{ISBN_PREFIX}{index:07d}"),
+                    available_copies=rng.randint(1, 5),
+                ))
+            with transaction.atomic():
+                Book.objects.bulk_create(books)
+            done = min(offset + BATCH_SIZE, count)
+            if done % 100_000 == 0 or done == count:
+                self.stdout.write(f"  {done} / {count} books")
+        return list(
+            Book.objects.filter(isbn__startswith=ISBN_PREFIX).order_by('isbn').values_list('id', flat=True)[:count]
+        )
+
+    def generate_borrows(self, rng, book_ids, count, borrower_count, days, skew):
+        """
+        Loans spread over the last ``days`` days. Books and borrowers are
+        drawn by Zipf weight over a shuffled ranking, so a few titles account
+        for most loans. Older loans are returned after 1 to 30 days (some late);
+        recent ones may still be out, never more than a book's copies.
+
+        Inserted with plain multi-row INSERTs: bulk_create would overwrite
+        borrow_date (auto_now_add) with today.
+        """
+        existing = BorrowRecord.objects.filter(book__isbn__startswith=ISBN_PREFIX).count()
+        if existing >= count:
+            self.stdout.write(f"  Reusing {existing} borrow records")
+            return
+
+        ranked_books = book_ids[:]
+        rng.shuffle(ranked_books)
+        book_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, len(ranked_books) + 1)))
+        borrower_weights = list(itertools.accumulate(1 / rank ** skew for rank in range(1, max(borrower_count, 1) + 1)))
+        borrowers = [
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} #{index}" for index in range(max(borrower_count, 1))
+        ]
+
+        borrower_ids = Borrower.objects.resolve(borrowers)
+        copies = dict(Book.objects.filter(pk__in=book_ids).values_list('id', 'available_copies'))
+        open_loans = dict.fromkeys(book_ids, 0)
+        today = timezone.localdate()
+        table = BorrowRecord._meta.db_table
+
+        rows = []
+
+        def flush():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'INSERT INTO {table} (book_id, borrowed_by, borrower_id, borrow_date, return_date) VALUES '
+                    + ', '.join(['(%s, %s, %s, %s, %s)'] * len(rows)),
+                    [value for row in rows for value in row],
+                )
+            rows.clear()
+
+        with transaction.atomic():
+            for index in range(existing, count):
+                book_id = rng.choices(ranked_books, cum_weights=book_weights)[0]
+                borrowed_by = rng.choices(borrowers, cum_weights=borrower_weights)[0]
+                borrow_date = today - timedelta(days=rng.randrange(max(days, 1)))
+                loan_days = rng.randint(1, 2 * LOAN_PERIOD_DAYS + 2)
+                return_date = borrow_date + timedelta(days=loan_days)
+                if return_date > today:
+                    if open_loans[book_id] < copies[book_id]:
+                        open_loans[book_id] += 1
+                        return_date = None
+                    else:
+                        return_date = today
+                rows.append((book_id, borrowed_by, borrower_ids[borrowed_by], borrow_date, return_date))
+                if len(rows) == BATCH_SIZE:
+                    flush()
+                done = index + 1
+                if done % 1_000_000 == 0:
+                    self.stdout.write(f"  {done} / {count} borrow records")
+            if rows:
+                flush()
+
+            # The copies on the shelf are what the open loans leave
+            for book_id, out in open_loans.items():
+                if out:
+                    Book.objects.filter(pk=book_id).update(available_copies=copies[book_id] - out)
+        self.stdout.write(f"  {count} borrow records, {sum(open_loans.values())} still out")
+
+    def clear(self):
+        """
+        Delete the generated library with plain DELETEs; going through the ORM
+        would load every row to run its delete signals.
+        """
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {BorrowRecord._meta.db_table} WHERE book_id IN '
+                f'(SELECT id FROM {Book._meta.db_table} WHERE isbn LIKE %s)',
+                [f'{ISBN_PREFIX}%'],
+            )
+            borrows = cursor.rowcount
+            cursor.execute(f'DELETE FROM {Book._meta.db_table} WHERE isbn LIKE %s', [f'{ISBN_PREFIX}%'])
+            books = cursor.rowcount
+            cursor.execute(
+                f'DELETE FROM {Author._meta.db_table} a WHERE bio = %s '
+                f'AND NOT EXISTS (SELECT 1 FROM {Book._meta.db_table} b WHERE b.author_id = a.id)',
+                [AUTHOR_BIO],
+            )
+            authors = cursor.rowcount
+            # Borrowers only come into being by borrowing, so one without loans was generated
+            cursor.execute(
+                f'DELETE FROM {Borrower._meta.db_table} p WHERE NOT EXISTS '
+                f'(SELECT 1 FROM {BorrowRecord._meta.db_table} r WHERE r.borrower_id = p.id)'
+            )
+            borrowers = cursor.rowcount
+        counters.reconcile()
+        self.stdout.write(
+            f"Deleted {borrows} borrow records, {books} books, {authors} authors and {borrowers} borrowers"
+        )
@@ -0,0 +1,198 @@
+import asyncio
+import random
+import statistics
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test one or more running endpoints with many concurrent keep-alive clients and report "
+        "requests/sec and latency percentiles. Pass the WSGI and ASGI URLs of the same read "
+        "(e.g. /api/books/ and /api/async/books/) to compare the two servers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('urls', nargs='+', help="Full URLs to load, tested one after another")
+        parser.add_argument('--concurrency', type=int, default=100, help="Concurrent client connections")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds to load each URL")
+        parser.add_argument(
+            '--think-ms', type=float, default=0.0,
+            help="Pause between a client's requests; models slow clients holding connections open",
+        )
+        parser.add_argument(
+            '--trickle-ms', type=float, default=0.0,
+            help="Send each request's headers in two halves this far apart, like a client on a slow link",
+        )
+        parser.add_argument(
+            '--login', metavar='USERNAME',
+            help="Authenticate as this user with a session created here, so no password hashing is measured",
+        )
+        parser.add_argument('--host-header', help="Host header to send, if it must match ALLOWED_HOSTS")
+        parser.add_argument('--timeout', type=float, default=30.0, help="Seconds before a request counts as failed")
+
+    def handle(self, *args, **options):
+        headers = {}
+        if options['login']:
+            headers['Cookie'] = f"{settings.SESSION_COOKIE_NAME}={self.create_session(options['login'])}"
+
+        failed = []
+        for url in options['urls']:
+            result = asyncio.run(self.load(url, headers, options))
+            self.report(url, result, options)
+            if not result['latencies']:
+                failed.append(url)
+
+        if failed:
+            raise CommandError(f"No successful requests for: {', '.join(failed)}")
+
+    def create_session(self, username):
+        """
+        Database session logged in as ``username``, as django.contrib.auth.login would store it.
+        """
+        User = get_user_model()
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"User '{username}' does not exist")
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return session.session_key
+
+    async def load(self, url, headers, options):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError("Only plain http:// URLs are supported")
+        host, port = parts.hostname, parts.port or 80
+        target = parts.path + (f'?{parts.query}' if parts.query else '')
+        request = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {options['host_header'] or parts.netloc}\r\n"
+            + ''.join(f"{name}: {value}\r\n" for name, value in headers.items())
+            + "Accept: application/json\r\n\r\n"
+        ).encode('latin-1')
+
+        latencies = []
+        statuses = Counter()
+        errors = Counter()
+        think = options['think_ms'] / 1000
+        trickle = options['trickle_ms'] / 1000
+        split = len(request) // 2
+        deadline = time.monotonic() + options['duration']
+
+        async def send(writer):
+            if trickle:
+                writer.write(request[:split])
+                await writer.drain()
+                await asyncio.sleep(trickle)
+                writer.write(request[split:])
+            else:
+                writer.write(request)
+            await writer.drain()
+
+        async def exchange(connection):
+            reader, writer = connection
+            await send(writer)
+            return await asyncio.wait_for(self.read_response(reader), options['timeout'])
+
+        async def connect():
+            return await asyncio.wait_for(asyncio.open_connection(host, port), options['timeout'])
+
+        async def client():
+            connection = None
+            # Spread the first requests over one think time instead of a thundering herd
+            await asyncio.sleep(random.uniform(0, think))
+            while time.monotonic() < deadline:
+                try:
+                    reused = connection is not None
+                    if connection is None:
+                        connection = await connect()
+                    started = time.perf_counter()
+                    try:
+                        status, keep_alive = await exchange(connection)
+                    except (asyncio.IncompleteReadError, ConnectionResetError, BrokenPipeError):
+                        if not reused:
+                            raise
+                        # The server closed the idle keep-alive connection; reconnect like a browser would
+                        connection[1].close()
+                        connection = await connect()
+                        started = time.perf_counter()
+                        status, keep_alive = await exchange(connection)
+                    latencies.append(time.perf_counter() - started)
+                    statuses[status] += 1
+                    if not keep_alive:
+                        connection[1].close()
+                        connection = None
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+                    errors[type(e).__name__] += 1
+                    if connection is not None:
+                        connection[1].close()
+                    connection = None
+                if think:
+                    await asyncio.sleep(think)
+            if connection is not None:
+                connection[1].close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return {
+            'elapsed': time.perf_counter() - started,
+            'latencies': sorted(latencies),
+            'statuses': statuses,
+            'errors': errors,
+        }
+
+    async def read_response(self, reader):
+        """
+        Read one HTTP/1.1 response and return its status and whether the
+        connection can be reused. The body is read and discarded.
+        """
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split(' ', 2)[1])
+        fields = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                fields[name.strip().lower()] = value.strip().lower()
+
+        if fields.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif 'content-length' in fields:
+            await reader.readexactly(int(fields['content-length']))
+        elif status not in (204, 304):
+            await reader.read()
+            return status, False
+        return status, fields.get('connection') != 'close'
+
+    def report(self, url, result, options):
+        latencies = result['latencies']
+        self.stdout.write(f"{url}")
+        self.stdout.write(
+            f"  concurrency={options['concurrency']} think={options['think_ms']:.0f}ms "
+            f"trickle={options['trickle_ms']:.0f}ms "
+            f"elapsed={result['elapsed']:.1f}s requests={len(latencies)} "
+            f"req/sec={len(latencies) / result['elapsed']:.1f}"
+        )
+        if latencies:
+            p50, p95, p99 = (latencies[max(int(len(latencies) * q) - 1, 0)] * 1000 for q in (0.50, 0.95, 0.99))
+            self.stdout.write(
+                f"  mean={statistics.fmean(latencies) * 1000:.1f}ms p50={p50:.1f}ms p95={p95:.1f}ms p99={p99:.1f}ms"
+            )
+        self.stdout.write(
+            "  statuses=" + (' '.join(f"{code}:{count}" for code, count in sorted(result['statuses'].items())) or '-')
+            + " errors=" + (' '.join(f"{name}:{count}" for name, count in result['errors'].items()) or '-')
+        )
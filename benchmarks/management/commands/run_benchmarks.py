@@ -0,0 +1,247 @@
+import json
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import timedelta
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from authors.models import Author
+from books.models import Book
+from borrowers.models import Borrower
+from borrowrecords.models import BorrowRecord
+from core.celery import app as celery_app
+from reports.tasks import generate_library_report
+
+USERNAME = 'bench-runner'
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every catalog, borrow and report endpoint plus the report task in process against "
+        "the current database (see generate_library), and write the results as JSON. With "
+        "--compare, report the change from an earlier results file and fail on regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200, help="Timed runs per benchmark")
+        parser.add_argument('--warmup', type=int, default=20, help="Untimed runs per benchmark first")
+        parser.add_argument('--only', nargs='+', metavar='NAME', help="Run only these benchmarks")
+        parser.add_argument('--seed', type=int, default=1, help="Seed for picking ids and search terms")
+        parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+        parser.add_argument('--compare', metavar='BASELINE', help="Earlier results file to compare against")
+        parser.add_argument(
+            '--threshold', type=float, default=0.10,
+            help="Fail when a benchmark's median is this fraction slower than the baseline's",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        benchmarks = self.benchmarks(rng)
+        names = options['only'] or list(benchmarks)
+        unknown = set(names) - set(benchmarks)
+        if unknown:
+            raise CommandError(f"Unknown benchmarks: {', '.join(sorted(unknown))}; choose from {', '.join(benchmarks)}")
+
+        results = {}
+        # DEBUG keeps every query in memory and would be measured too
+        with override_settings(DEBUG=False):
+            for name in names:
+                run, iterations = benchmarks[name]
+                iterations = iterations or options['iterations']
+                for _ in range(min(options['warmup'], iterations)):
+                    run()
+                timings = []
+                for _ in range(iterations):
+                    started = time.perf_counter()
+                    run()
+                    timings.append((time.perf_counter() - started) * 1000)
+                results[name] = summarize(timings)
+                self.stderr.write(
+                    f"{name:<24} n={iterations:<4} p50={results[name]['p50_ms']:.2f}ms "
+                    f"p95={results[name]['p95_ms']:.2f}ms p99={results[name]['p99_ms']:.2f}ms"
+                )
+
+        document = {
+            'commit': git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'platform': platform.platform(),
+                'cache': settings.CACHES['default']['BACKEND'],
+            },
+            'dataset': {
+                'authors': Author.objects.count(),
+                'books': Book.objects.count(),
+                'borrow_records': BorrowRecord.objects.count(),
+            },
+            'options': {key: options[key] for key in ('iterations', 'warmup', 'seed')},
+            'results': results,
+        }
+        text = json.dumps(document, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+        else:
+            self.stdout.write(text)
+
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def benchmarks(self, rng):
+        """
+        Name -> (callable running one request, iterations or None for --iterations).
+        """
+        book_ids = list(Book.objects.order_by('id').values_list('id', flat=True))
+        author_ids = list(Author.objects.order_by('id').values_list('id', flat=True))
+        if not book_ids or not author_ids:
+            raise CommandError("The database has no books; run generate_library first")
+        # The same sample for the same seed and data, so runs are comparable
+        book_ids = rng.sample(book_ids, min(len(book_ids), 1000))
+        author_ids = rng.sample(author_ids, min(len(author_ids), 1000))
+        borrower_ids = list(Borrower.objects.order_by('id').values_list('id', flat=True)[:20_000])
+        borrower_ids = rng.sample(borrower_ids, min(len(borrower_ids), 1000))
+        title_words = [
+            word for title in Book.objects.filter(pk__in=book_ids[:200]).values_list('title', flat=True)
+            for word in title.split() if len(word) > 3
+        ]
+        user, _ = User.objects.get_or_create(username=USERNAME)
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*',) and host[0] != '.'), 'localhost')
+        client = Client(HTTP_HOST=host)
+        client.force_login(user)
+
+        def get(path, params=None, expect=200, stream=False):
+            def run():
+                response = client.get(path() if callable(path) else path, params() if callable(params) else params)
+                if response.status_code != expect:
+                    raise CommandError(f"GET {path} returned {response.status_code}")
+                if stream:
+                    for _ in response.streaming_content:
+                        pass
+            return run
+
+        def borrow_and_return():
+            # Rolled back, so every run sees the same data
+            with transaction.atomic():
+                book = Book.objects.filter(pk__in=book_ids, available_copies__gt=0).first()
+                response = client.post('/api/borrow/', {'book': book.pk, 'borrowed_by': USERNAME})
+                if response.status_code != 201:
+                    raise CommandError(f"POST /api/borrow/ returned {response.status_code}")
+                response = client.put(f"/api/borrow/{response.json()['data']['id']}/return/")
+                if response.status_code != 200:
+                    raise CommandError(f"PUT /api/borrow/<id>/return/ returned {response.status_code}")
+                transaction.set_rollback(True)
+
+        isbns = list(Book.objects.filter(pk__in=book_ids).values_list('isbn', flat=True))
+
+        def availability():
+            response = client.post('/api/books/availability/', {'isbns': isbns}, content_type='application/json')
+            if response.status_code != 200:
+                raise CommandError(f"POST /api/books/availability/ returned {response.status_code}")
+
+        year_ago = (timezone.localdate() - timedelta(days=364)).isoformat()
+
+        def report_task():
+            # Run the shards and the merge in process: the chord needs no result backend then
+            eager = celery_app.conf.task_always_eager
+            celery_app.conf.task_always_eager = True
+            try:
+                with tempfile.TemporaryDirectory() as directory, override_settings(REPORTS_DIR=directory):
+                    generate_library_report()
+            finally:
+                celery_app.conf.task_always_eager = eager
+
+        return {
+            'books.list': (get('/api/books/'), None),
+            'books.list_100': (get('/api/books/', {'page_size': 100}), None),
+            'books.list_1000': (get('/api/books/', {'page_size': 1000}), None),
+            'books.list_1000_fields': (
+                get('/api/books/', {'page_size': 1000, 'fields': 'id,title,available_copies'}), None,
+            ),
+            'books.list_1000_expand': (
+                get('/api/books/', {'page_size': 1000, 'expand': 'author', 'fields': 'id,title,author.name'}), None,
+            ),
+            'books.detail': (get(lambda: f'/api/books/{rng.choice(book_ids)}/'), None),
+            'books.availability_1000': (availability, None),
+            'books.search': (get('/api/books/search/', lambda: {'q': rng.choice(title_words)[:4]}), None),
+            'authors.list': (get('/api/authors/'), None),
+            'authors.detail': (get(lambda: f'/api/authors/{rng.choice(author_ids)}/'), None),
+            'authors.search': (get('/api/authors/search/', lambda: {'q': rng.choice(title_words)[:3]}), None),
+            'borrow.create_return': (borrow_and_return, None),
+            'borrow.overdue': (get('/api/borrow/overdue/'), None),
+            'borrowers.detail': (get(lambda: f'/api/borrowers/{rng.choice(borrower_ids)}/'), None),
+            'borrowers.loans': (get(lambda: f'/api/borrowers/{rng.choice(borrower_ids)}/loans/'), None),
+            'borrowers.history': (get(lambda: f'/api/borrowers/{rng.choice(borrower_ids)}/history/'), None),
+            'borrow.export_csv': (get('/api/borrow/export/', {'type': 'csv'}, stream=True), 5),
+            'reports.generate_task': (report_task, 5),
+            'reports.circulation_year': (get('/api/reports/circulation/', {'start': year_ago}), None),
+            'reports.circulation_book_year': (
+                get('/api/reports/circulation/', lambda: {'start': year_ago, 'book': rng.choice(book_ids)}), None,
+            ),
+            'reports.circulation_top_month': (get('/api/reports/circulation/books/'), None),
+        }
+
+    def compare(self, results, path, threshold):
+        with open(path) as f:
+            baseline = json.load(f)
+        self.stderr.write(f"Compared with {path} (commit {baseline.get('commit') or 'unknown'}):")
+        regressions = []
+        for name, result in results.items():
+            before = baseline['results'].get(name)
+            if before is None:
+                self.stderr.write(f"  {name:<24} new")
+                continue
+            change = result['p50_ms'] / before['p50_ms'] - 1
+            flag = ''
+            if change > threshold:
+                regressions.append(name)
+                flag = '  REGRESSION'
+            self.stderr.write(
+                f"  {name:<24} p50 {before['p50_ms']:.2f} -> {result['p50_ms']:.2f}ms ({change:+.1%}){flag}"
+            )
+        if regressions:
+            raise CommandError(f"Slower than {path} by more than {threshold:.0%}: {', '.join(regressions)}")
+
+
+def summarize(timings):
+    ordered = sorted(timings)
+
+    def percentile(q):
+        return round(ordered[max(int(len(ordered) * q) - 1, 0)], 3)
+
+    return {
+        'iterations': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def git_commit():
+    """
+    Commit the results were measured at, with '-dirty' for uncommitted changes; None outside a checkout.
+    """
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if dirty else commit
@@ -0,0 +1,64 @@
+import io
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from authors.models import Author
+from books.models import Book
+from borrowers.models import Borrower
+from borrowrecords.models import BorrowRecord
+from reports import counters
+from reports.models import LibraryCounter
+
+
+class GenerateLibraryTestCase(TestCase):
+    def generate(self, **sizes):
+        call_command(
+            "generate_library", authors=3, books=10, borrows=40, borrowers=5, days=60, stdout=io.StringIO(), **sizes
+        )
+
+    def test_generates_a_small_library(self):
+        """
+        Test a tiny library is generated with linked borrowers, and a rerun adds nothing
+        """
+        self.generate()
+        self.assertEqual(Author.objects.count(), 3)
+        self.assertEqual(Book.objects.count(), 10)
+        self.assertEqual(BorrowRecord.objects.count(), 40)
+        self.assertFalse(BorrowRecord.objects.filter(borrower__isnull=True).exists())
+        self.assertLessEqual(Borrower.objects.count(), 5)
+        self.assertEqual(counters.snapshot()[LibraryCounter.OPEN_LOANS], BorrowRecord.objects.open().count())
+
+        self.generate()
+        self.assertEqual(BorrowRecord.objects.count(), 40)
+
+    def test_clear_removes_the_generated_library(self):
+        """
+        Test --clear deletes what was generated
+        """
+        self.generate()
+        call_command("generate_library", clear=True, stdout=io.StringIO())
+        self.assertFalse(Book.objects.exists())
+        self.assertFalse(BorrowRecord.objects.exists())
+
+
+class BenchMetricsTestCase(TestCase):
+    def setUp(self):
+        author = Author.objects.create(name="Jane Doe")
+        Book.objects.create(title="Bench", author=author, isbn="0000000001", available_copies=1)
+
+    def test_reports_with_two_rounds(self):
+        """
+        Test the smallest run that can measure noise reports both endpoints
+        """
+        out = io.StringIO()
+        call_command("bench_metrics", rounds=2, requests=1, stdout=out)
+        self.assertIn("book list", out.getvalue())
+        self.assertIn("book detail", out.getvalue())
+
+    def test_single_round_rejected(self):
+        """
+        Test one round is refused up front instead of failing on the stdev
+        """
+        with self.assertRaises(CommandError):
+            call_command("bench_metrics", rounds=1, stdout=io.StringIO())
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        from core import events
+        from .availability import availability_index
+        # Re-read books as their changes commit, here or in other processes
+        events.subscribe('book', availability_index.on_events)
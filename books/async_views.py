@@ -0,0 +1,88 @@
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound, ValidationError
+from core.async_views import AsyncAPIView
+from core.cache import book_cache
+from core.conditional import (
+    apage_validators, has_conditional_headers, not_modified, rows_validators, set_validators, with_modified,
+)
+from core.pagination import KeysetPagination
+from core.renderers import FastJsonResponse
+from .models import Book
+from .serializers import BookSerializer, BookDetailSerializer
+from .views import BookDetailView
+
+
+class AsyncBookListView(AsyncAPIView):
+    """
+    List books on the ASGI path
+    """
+
+    async def get(self, request):
+        """
+        Retrieve a page of books, keyset-paginated on ('title', 'id')
+        Same payload and validators as BookListCreateView.get, read with the async ORM
+        """
+        try:
+            paginator = KeysetPagination(ordering=('title', 'id'))
+            fieldset = BookSerializer.fieldset(request.query_params, paginator.ordering)
+            queryset = fieldset.values(Book.objects.all())
+            if has_conditional_headers(request):
+                window = paginator.get_page_window(queryset, request)
+                etag = await apage_validators(request, window, fieldset.modified)
+                response = not_modified(request, etag, None)
+                if response is not None:
+                    return response
+                rows = [row async for row in window]
+            else:
+                rows = [row async for row in paginator.get_page_window(with_modified(queryset, fieldset.modified), request)]
+                etag = rows_validators(request, rows)
+
+            books = fieldset.rows(paginator.paginate_window(rows))
+            data = {'next': paginator.get_next_link(), 'results': books}
+            return set_validators(FastJsonResponse(data), etag, None)
+        except ValidationError as e:
+            return JsonResponse({"error": "Invalid field selection", "details": e.detail}, status=400)
+        except NotFound as e:
+            return JsonResponse({"error": str(e.detail)}, status=404)
+        except Exception as e:
+            return JsonResponse(
+                {"error": f"An error occurred while retrieving books: {str(e)}"}, status=500
+            )
+
+
+class AsyncBookDetailView(AsyncAPIView):
+    """
+    Retrieve a specific book on the ASGI path
+    """
+
+    async def load_payload(self, pk):
+        """
+        Helper method to serialize a book for the cache, None if it doesn't exist
+        """
+        try:
+            book = await BookDetailSerializer.setup_eager_loading(Book.objects.all()).aget(pk=pk)
+        except Book.DoesNotExist:
+            return None
+        return BookDetailView.make_payload(book)
+
+    async def get(self, request, pk):
+        """
+        Retrieve a specific book
+        Same payload, validators and cache entries as BookDetailView.get
+        """
+        if has_conditional_headers(request):
+            row = await BookDetailView.validators_query(pk).afirst()
+            if row is None:
+                return JsonResponse({"error": "Book not found"}, status=404)
+            response = not_modified(request, *BookDetailView.make_validators(pk, *row))
+            if response is not None:
+                return response
+
+        entry = await book_cache.aget_or_load(pk, lambda: self.load_payload(pk))
+        if entry is None:
+            return JsonResponse({"error": "Book not found"}, status=404)
+        return set_validators(
+            JsonResponse({"message": "Book retrieved successfully!", "data": entry["data"]}),
+            entry["etag"],
+            entry["last_modified"],
+        )
@@ -0,0 +1,269 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import timedelta
+
+from django.conf import settings
+
+from .models import Book
+
+DEFAULT_AVAILABILITY_INDEX = {
+    'SYNC_SECONDS': 1,
+    'SYNC_OVERLAP_SECONDS': 5,
+    'REBUILD_SECONDS': 300,
+}
+
+# available_copies of a slot whose book was deleted or moved to another ISBN
+GONE = -1
+# ISBN-13 keys are offset past every ISBN-10, so leading zeros can't collide
+_ISBN13_OFFSET = 10 ** 13
+
+
+def isbn_key(isbn):
+    """
+    64-bit key of a 10 or 13 digit ISBN, None for anything else.
+    """
+    if not isbn.isdigit() or len(isbn) not in (10, 13):
+        return None
+    return int(isbn) + (_ISBN13_OFFSET if len(isbn) == 13 else 0)
+
+
+class _Snapshot:
+    """
+    Every book at rebuild time, in parallel arrays sorted by ISBN key.
+
+    The five arrays cost 32 bytes per book, against a few hundred for a
+    dict of tuples. ISBNs are found by binary search over
+    ``keys`` and ids by binary search over ``ids_sorted`` (whose
+    ``id_slots`` give the matching slot). Copy counts are updated in place;
+    books added or re-keyed after the rebuild live in the small ``extra``
+    dicts until the next one.
+    """
+    __slots__ = ('keys', 'ids', 'copies', 'ids_sorted', 'id_slots', 'extra_isbns', 'extra_ids')
+
+    def __init__(self, rows):
+        encoded, extra = [], []
+        for book_id, isbn, copies in rows:
+            key = isbn_key(isbn)
+            (encoded if key is not None else extra).append((key, book_id, isbn, copies))
+        encoded.sort()
+        self.keys = array('q', (row[0] for row in encoded))
+        self.ids = array('q', (row[1] for row in encoded))
+        self.copies = array('i', (row[3] for row in encoded))
+        by_id = sorted(range(len(self.ids)), key=self.ids.__getitem__)
+        self.ids_sorted = array('q', (self.ids[slot] for slot in by_id))
+        self.id_slots = array('i', by_id)
+        # isbn -> book id and book id -> [isbn, copies]
+        self.extra_isbns = {}
+        self.extra_ids = {}
+        for _, book_id, isbn, copies in extra:
+            self.put_extra(book_id, isbn, copies)
+
+    def put_extra(self, book_id, isbn, copies):
+        self.extra_isbns[isbn] = book_id
+        self.extra_ids[book_id] = [isbn, copies]
+
+    def slot_of_isbn(self, isbn):
+        key = isbn_key(isbn)
+        if key is None:
+            return None
+        position = bisect_left(self.keys, key)
+        if position < len(self.keys) and self.keys[position] == key:
+            return position
+        return None
+
+    def slot_of_id(self, book_id):
+        position = bisect_left(self.ids_sorted, book_id)
+        if position < len(self.ids_sorted) and self.ids_sorted[position] == book_id:
+            return self.id_slots[position]
+        return None
+
+    def by_isbn(self, isbn):
+        """
+        (book id, available copies) of the book with `isbn`, or None.
+        """
+        book_id = self.extra_isbns.get(isbn)
+        if book_id is not None:
+            return book_id, self.extra_ids[book_id][1]
+        slot = self.slot_of_isbn(isbn)
+        if slot is None or self.copies[slot] == GONE:
+            return None
+        return self.ids[slot], self.copies[slot]
+
+    def by_id(self, book_id):
+        """
+        (isbn, available copies) of book `book_id`, or None.
+        """
+        entry = self.extra_ids.get(book_id)
+        if entry is not None:
+            return entry[0], entry[1]
+        slot = self.slot_of_id(book_id)
+        if slot is None or self.copies[slot] == GONE:
+            return None
+        return self.isbn_at(slot), self.copies[slot]
+
+    def isbn_at(self, slot):
+        key = self.keys[slot]
+        if key >= _ISBN13_OFFSET:
+            return f'{key - _ISBN13_OFFSET:013d}'
+        return f'{key:010d}'
+
+    def apply(self, book_id, isbn, copies):
+        """
+        Record the current state of a book; `isbn` None means it was deleted.
+        """
+        entry = self.extra_ids.pop(book_id, None)
+        if entry is not None and self.extra_isbns.get(entry[0]) == book_id:
+            del self.extra_isbns[entry[0]]
+        slot = self.slot_of_id(book_id)
+        if slot is not None:
+            if isbn is not None and self.keys[slot] == isbn_key(isbn):
+                self.copies[slot] = copies
+                return
+            self.copies[slot] = GONE
+        if isbn is not None:
+            self.put_extra(book_id, isbn, copies)
+
+    def nbytes(self):
+        arrays = (self.keys, self.ids, self.copies, self.ids_sorted, self.id_slots)
+        return sum(len(values) * values.itemsize for values in arrays)
+
+
+class AvailabilityIndex:
+    """
+    Per-process index of ISBN -> (book id, available copies) for batch lookups.
+
+    Borrows, returns and book edits mark their books dirty through the
+    'book' change events (core/events.py), right after they commit in this
+    process and as soon as the listener receives them from other processes,
+    and the next lookup re-reads just those rows. As a fallback for lost
+    events, books whose ``updated_at`` moved are re-read at most every
+    SYNC_SECONDS; the window re-read overlaps the previous one by
+    SYNC_OVERLAP_SECONDS so a transaction committing late isn't missed. New
+    books show up at the next such sync; deletions that weren't announced
+    show up at the full rebuild every REBUILD_SECONDS.
+    """
+
+    def __init__(self):
+        self._snapshot = None
+        self._dirty = set()
+        # Guards the snapshot reference, the dirty set and in-place updates;
+        # never held across a query, so mark_dirty() doesn't wait on a rebuild
+        self._lock = threading.Lock()
+        # One lookup at a time reads the database to refresh the snapshot
+        self._refresh_lock = threading.Lock()
+        self._built_at = 0.0
+        self._synced_at = 0.0
+        self._watermark = None
+        self.stats = {'rebuilds': 0, 'syncs': 0, 'rows_synced': 0}
+
+    @property
+    def config(self):
+        return {**DEFAULT_AVAILABILITY_INDEX, **getattr(settings, 'AVAILABILITY_INDEX', {})}
+
+    def mark_dirty(self, book_ids):
+        """
+        Have the next lookup re-read `book_ids`. Called once their change committed.
+        """
+        with self._lock:
+            self._dirty.update(book_ids)
+
+    def on_events(self, changes, local):
+        """
+        Change event subscriber: re-read the changed books at the next lookup,
+        or rebuild when events were missed.
+        """
+        if any(change.id is None for change in changes):
+            with self._lock:
+                self._built_at = float('-inf')
+            return
+        self.mark_dirty(change.id for change in changes)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+            self._dirty.clear()
+
+    def lookup(self, isbns=(), ids=()):
+        """
+        Availability of each ISBN and id, in order: dicts of id, isbn and
+        available_copies, with None for the id and copies of unknown books.
+        """
+        snapshot = self.fresh_snapshot()
+        results = []
+        for isbn in isbns:
+            found = snapshot.by_isbn(isbn)
+            book_id, copies = found if found is not None else (None, None)
+            results.append({'id': book_id, 'isbn': isbn, 'available_copies': copies})
+        for book_id in ids:
+            found = snapshot.by_id(book_id)
+            isbn, copies = found if found is not None else (None, None)
+            results.append({'id': book_id, 'isbn': isbn, 'available_copies': copies})
+        return results
+
+    def fresh_snapshot(self):
+        """
+        The snapshot, after applying pending changes and rebuilding it when due.
+        """
+        with self._refresh_lock:
+            config = self.config
+            now = time.monotonic()
+            if self._snapshot is None or now - self._built_at >= config['REBUILD_SECONDS']:
+                self._rebuild(now)
+            elif now - self._synced_at >= config['SYNC_SECONDS']:
+                self._sync_changed(now, config['SYNC_OVERLAP_SECONDS'])
+            if self._dirty:
+                self._sync_dirty()
+            return self._snapshot
+
+    def memory_bytes(self):
+        snapshot = self._snapshot
+        return snapshot.nbytes() if snapshot is not None else 0
+
+    def _rebuild(self, now):
+        # Books marked dirty so far changed before the rows below are read;
+        # those marked from here on are re-read after the swap
+        with self._lock:
+            self._dirty.clear()
+        watermark = Book.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        snapshot = _Snapshot(Book.objects.values_list('id', 'isbn', 'available_copies').iterator(chunk_size=10000))
+        with self._lock:
+            self._snapshot = snapshot
+            self._built_at = self._synced_at = now
+        self._watermark = watermark
+        self.stats['rebuilds'] += 1
+
+    def _sync_changed(self, now, overlap):
+        self._synced_at = now
+        if self._watermark is None:
+            rows = Book.objects.all()
+        else:
+            rows = Book.objects.filter(updated_at__gte=self._watermark - timedelta(seconds=overlap))
+        rows = list(rows.values_list('id', 'isbn', 'available_copies', 'updated_at'))
+        with self._lock:
+            # clear() may have dropped the snapshot meanwhile
+            if self._snapshot is not None:
+                for book_id, isbn, copies, _ in rows:
+                    self._snapshot.apply(book_id, isbn, copies)
+        for _, _, _, updated_at in rows:
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+        self.stats['syncs'] += 1
+        self.stats['rows_synced'] += len(rows)
+
+    def _sync_dirty(self):
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+        found = list(Book.objects.filter(pk__in=dirty).values_list('id', 'isbn', 'available_copies'))
+        with self._lock:
+            if self._snapshot is None:
+                return
+            for book_id, isbn, copies in found:
+                self._snapshot.apply(book_id, isbn, copies)
+                dirty.discard(book_id)
+            for book_id in dirty:
+                self._snapshot.apply(book_id, None, None)
+
+
+availability_index = AvailabilityIndex()
@@ -0,0 +1,213 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from authors.models import Author
+from core.cache import author_cache, book_cache
+from reports import counters
+from reports.models import LibraryCounter
+from .models import Book
+
+# Errors kept in the summary; the rest are only counted
+MAX_REPORTED_ERRORS = 100
+
+
+class CatalogImportError(Exception):
+    """
+    Raised when the input can't be read at all (as opposed to bad rows).
+    """
+
+
+class CatalogImporter:
+    """
+    Stream a vendor catalog of books or authors into the database.
+
+    Rows are read lazily from CSV or JSONL and processed in chunks, so memory
+    use depends on the chunk size rather than the file size. Each chunk is
+    validated in memory, its authors are resolved through a name -> id map
+    that is filled with at most one lookup and one bulk insert per chunk, and
+    it is written with a single bulk_create that upserts on ISBN.
+    """
+    kinds = ('books', 'authors')
+    formats = ('csv', 'jsonl')
+
+    def __init__(self, kind='books', chunk_size=1000):
+        if kind not in self.kinds:
+            raise CatalogImportError(f"Unknown import kind '{kind}'")
+        self.kind = kind
+        self.chunk_size = chunk_size
+        self.isbn_regex = Book.isbn_validator.regex
+        self.author_ids = {}
+        self.stats = {'rows': 0, 'created': 0, 'updated': 0, 'skipped': 0}
+        self.errors = []
+
+    def run(self, stream, fmt):
+        """
+        Import every row of the text stream and return a summary.
+        """
+        started = time.perf_counter()
+        rows = enumerate(self.iter_rows(stream, fmt), start=1)
+        process_chunk = self.import_books if self.kind == 'books' else self.import_authors
+
+        while True:
+            chunk = list(islice(rows, self.chunk_size))
+            if not chunk:
+                break
+            self.stats['rows'] += len(chunk)
+            with transaction.atomic():
+                process_chunk(chunk)
+
+        elapsed = time.perf_counter() - started
+        return {
+            'kind': self.kind,
+            **self.stats,
+            'errors': self.errors,
+            'elapsed_seconds': round(elapsed, 3),
+            'rows_per_second': round(self.stats['rows'] / elapsed, 1) if elapsed else None,
+        }
+
+    def iter_rows(self, stream, fmt):
+        """
+        Yield one dict per input row without reading the whole stream.
+        """
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+        elif fmt == 'jsonl':
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    row = None
+                yield row if isinstance(row, dict) else None
+        else:
+            raise CatalogImportError(f"Unknown import format '{fmt}'")
+
+    def import_books(self, chunk):
+        """
+        Validate a chunk of book rows and upsert them on ISBN.
+        """
+        books = {}
+        for line, row in chunk:
+            if row is None:
+                self.reject(line, "Malformed row")
+                continue
+            title = (row.get('title') or '').strip()
+            author_name = (row.get('author') or '').strip()
+            isbn = str(row.get('isbn') or '').replace('-', '').replace(' ', '')
+            try:
+                copies = int(row.get('available_copies') or 0)
+            except (TypeError, ValueError):
+                copies = -1
+
+            if not title or len(title) > 255:
+                self.reject(line, "Title is required and must be at most 255 characters")
+            elif not author_name or len(author_name) > 255:
+                self.reject(line, "Author is required and must be at most 255 characters")
+            elif not self.isbn_regex.match(isbn):
+                self.reject(line, Book.isbn_validator.message)
+            elif copies < 0:
+                self.reject(line, "available_copies must be a non-negative integer")
+            else:
+                # The last row wins when a chunk repeats an ISBN
+                books[isbn] = (title, author_name, copies)
+
+        if not books:
+            return
+
+        self.resolve_authors({author_name for _, author_name, _ in books.values()})
+        existing = {
+            isbn: (book_id, author_id)
+            for isbn, book_id, author_id in Book.objects.filter(isbn__in=books.keys())
+            .values_list('isbn', 'id', 'author_id')
+        }
+        Book.objects.bulk_create(
+            [
+                Book(title=title, author_id=self.author_ids[author_name], isbn=isbn, available_copies=copies)
+                for isbn, (title, author_name, copies) in books.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['isbn'],
+            update_fields=['title', 'author', 'available_copies', 'updated_at'],
+        )
+        # Updated books and every author whose book list changed
+        book_cache.invalidate(*(book_id for book_id, _ in existing.values()))
+        author_cache.invalidate(
+            *{author_id for _, author_id in existing.values()},
+            *{self.author_ids[author_name] for _, author_name, _ in books.values()},
+        )
+        # bulk_create sends no post_save signals, so count the new rows here
+        counters.increment(LibraryCounter.BOOKS, len(books) - len(existing))
+        self.stats['updated'] += len(existing)
+        self.stats['created'] += len(books) - len(existing)
+
+    def import_authors(self, chunk):
+        """
+        Validate a chunk of author rows, create new names and refresh bios of
+        existing ones.
+        """
+        authors = {}
+        for line, row in chunk:
+            if row is None:
+                self.reject(line, "Malformed row")
+                continue
+            name = (row.get('name') or '').strip()
+            if not name or len(name) > 255:
+                self.reject(line, "Name is required and must be at most 255 characters")
+                continue
+            authors[name] = row.get('bio') or None
+
+        if not authors:
+            return
+
+        existing = {
+            author.name: author
+            for author in Author.objects.filter(name__in=authors.keys()).only('id', 'name').order_by('-id')
+        }
+        changed = []
+        now = timezone.now()
+        for name, author in existing.items():
+            self.author_ids[name] = author.id
+            if authors[name] is not None:
+                author.bio = authors[name]
+                # bulk_update doesn't apply auto_now
+                author.updated_at = now
+                changed.append(author)
+        Author.objects.bulk_update(changed, ['bio', 'updated_at'])
+        author_cache.invalidate(*(author.id for author in changed))
+
+        created = Author.objects.bulk_create(
+            [Author(name=name, bio=bio) for name, bio in authors.items() if name not in existing]
+        )
+        for author in created:
+            self.author_ids[author.name] = author.id
+        counters.increment(LibraryCounter.AUTHORS, len(created))
+        self.stats['updated'] += len(existing)
+        self.stats['created'] += len(created)
+
+    def resolve_authors(self, names):
+        """
+        Make sure every name is in the author map, looking up unknown names in
+        one query and creating the ones that don't exist in one bulk insert.
+        """
+        missing = names.difference(self.author_ids)
+        if not missing:
+            return
+        # Authors aren't unique by name; reuse the oldest one with that name
+        for author_id, name in Author.objects.filter(name__in=missing).order_by('-id').values_list('id', 'name'):
+            self.author_ids[name] = author_id
+        missing.difference_update(self.author_ids)
+        for author in Author.objects.bulk_create([Author(name=name) for name in missing]):
+            self.author_ids[author.name] = author.id
+        counters.increment(LibraryCounter.AUTHORS, len(missing))
+
+    def reject(self, line, message):
+        self.stats['skipped'] += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line, 'error': message})
@@ -0,0 +1,46 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.importer import CatalogImporter, CatalogImportError
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a CSV or JSONL catalog of books or authors into the database in bulk chunks. "
+        "Book rows need title, author (name), isbn and optionally available_copies; "
+        "author rows need name and optionally bio. Books are upserted on ISBN."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSONL file to import")
+        parser.add_argument('--kind', choices=CatalogImporter.kinds, default='books')
+        parser.add_argument(
+            '--format', choices=CatalogImporter.formats, default=None,
+            help="Input format (default: inferred from the file extension)",
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Rows per bulk write")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format']
+        if fmt is None:
+            extension = os.path.splitext(path)[1].lower()
+            fmt = 'csv' if extension == '.csv' else 'jsonl' if extension in ('.jsonl', '.ndjson') else None
+        if fmt is None:
+            raise CommandError("Could not infer the format; pass --format csv or --format jsonl")
+
+        importer = CatalogImporter(kind=options['kind'], chunk_size=options['chunk_size'])
+        try:
+            with open(path, newline='', encoding='utf-8') as stream:
+                summary = importer.run(stream, fmt)
+        except (OSError, UnicodeDecodeError, CatalogImportError) as e:
+            raise CommandError(f"Import failed: {e}")
+
+        for error in summary['errors']:
+            self.stderr.write(f"row {error['row']}: {error['error']}")
+        self.stdout.write(
+            f"{summary['rows']} rows: {summary['created']} created, {summary['updated']} updated, "
+            f"{summary['skipped']} skipped in {summary['elapsed_seconds']}s "
+            f"({summary['rows_per_second']} rows/sec)"
+        )
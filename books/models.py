@@ -1,6 +1,32 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import F
 from django.core.validators import RegexValidator
+from django.utils import timezone
 from authors.models import Author
+from core import events
+from core.search import search_vector
+
+class BookQuerySet(models.QuerySet):
+    """
+    Copy-count updates expressed as single conditional UPDATE statements.
+    QuerySet.update() skips auto_now, so each one stamps updated_at itself.
+    """
+    def take_copies(self, count=1):
+        """
+        Atomically take `count` copies from every matched book that still has
+        them. Returns the number of books updated; 0 means none were available.
+        """
+        return self.filter(available_copies__gte=count).update(
+            available_copies=F('available_copies') - count, updated_at=timezone.now()
+        )
+
+    def put_back_copies(self, count=1):
+        """
+        Atomically return `count` copies to every matched book.
+        """
+        return self.update(available_copies=F('available_copies') + count, updated_at=timezone.now())
 
 class Book(models.Model):
     """
@@ -32,6 +58,18 @@ class Book(models.Model):
         default=0, 
         help_text="Number of copies available in the library"
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text="Last change to the book, used for HTTP validators"
+    )
+    search_document = models.GeneratedField(
+        expression=search_vector('title'),
+        output_field=SearchVectorField(),
+        db_persist=True,
+        help_text="Stored tsvector of the title, kept up to date by the database"
+    )
+
+    objects = BookQuerySet.as_manager()
     
     def __str__(self):
         """
@@ -48,21 +86,31 @@ class Book(models.Model):
     def reduce_available_copies(self):
         """
         Reduce available copies when a book is borrowed.
+        The check and the decrement happen in one UPDATE, so concurrent
+        borrowers can never take the count below zero.
         """
-        if self.is_available():
-            self.available_copies -= 1
-            self.save()
-        else:
+        if not Book.objects.filter(pk=self.pk).take_copies():
             raise ValueError("No copies available for borrowing")
+        self.refresh_from_db(fields=['available_copies', 'updated_at'])
+        events.publish('book', [self.pk], fields=['available_copies'], version=self.updated_at)
 
     def increase_available_copies(self):
         """
         Increase available copies when a book is returned.
         """
-        self.available_copies += 1
-        self.save()
+        Book.objects.filter(pk=self.pk).put_back_copies()
+        self.refresh_from_db(fields=['available_copies', 'updated_at'])
+        events.publish('book', [self.pk], fields=['available_copies'], version=self.updated_at)
 
     class Meta:
         verbose_name = "Book"
         verbose_name_plural = "Books"
-        ordering = ['title']
\ No newline at end of file
+        ordering = ['title']
+        indexes = [
+            # Backs keyset pagination on (title, id)
+            models.Index(fields=['title', 'id'], name='book_title_id_idx'),
+            # Backs full-text and prefix search on the title
+            GinIndex(fields=['search_document'], name='book_search_idx'),
+            # Backs the availability index's sync of recently changed books
+            models.Index(fields=['updated_at'], name='book_updated_at_idx'),
+        ]
\ No newline at end of file
@@ -1,25 +1,25 @@
 from rest_framework import serializers
+from authors.serializers import AuthorSerializer
+from core.serializers import ValuesSerializerMixin
 from .models import Book
-from authors.models import Author
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for Book model to handle CRUD operations
     """
+    expandable_fields = {'author': AuthorSerializer}
+
     class Meta:
         model = Book
         fields = ['id', 'title', 'author', 'isbn', 'available_copies']
         read_only_fields = ['id']
 
-    def validate_author(self, value):
+    @staticmethod
+    def setup_eager_loading(queryset):
         """
-        Ensure the author exists
+        Load only the columns this serializer renders
         """
-        try:
-            Author.objects.get(id=value.id)
-        except Author.DoesNotExist:
-            raise serializers.ValidationError("Invalid author")
-        return value
+        return queryset.only('id', 'title', 'author', 'isbn', 'available_copies')
 
 class BookDetailSerializer(BookSerializer):
     """
@@ -30,5 +30,70 @@ class BookDetailSerializer(BookSerializer):
     class Meta(BookSerializer.Meta):
         fields = ['id', 'title', 'author', 'author_name', 'isbn', 'available_copies']
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Join the author so `author_name` doesn't cost a query per book
+        """
+        return queryset.select_related('author').only(
+            'id', 'title', 'isbn', 'available_copies', 'updated_at',
+            'author__id', 'author__name', 'author__updated_at',
+        )
+
     def get_author_name(self, obj):
-        return obj.author.name
\ No newline at end of file
+        return obj.author.name
+
+class BookSearchSerializer(BookSerializer):
+    """
+    Book search result with its relevance rank
+    """
+    rank = serializers.FloatField(read_only=True)
+
+    class Meta(BookSerializer.Meta):
+        fields = ['id', 'title', 'author', 'isbn', 'available_copies', 'rank']
+
+class CatalogImportSerializer(serializers.Serializer):
+    """
+    Upload of a CSV or JSONL catalog file
+    """
+    file = serializers.FileField()
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], required=False)
+    chunk_size = serializers.IntegerField(min_value=1, max_value=10000, default=1000)
+
+    def validate(self, attrs):
+        """
+        Infer the format from the file name when it isn't given
+        """
+        if 'format' not in attrs:
+            name = attrs['file'].name.lower()
+            if name.endswith('.csv'):
+                attrs['format'] = 'csv'
+            elif name.endswith(('.jsonl', '.ndjson')):
+                attrs['format'] = 'jsonl'
+            else:
+                raise serializers.ValidationError({"format": "Could not infer the format; pass csv or jsonl"})
+        return attrs
+
+# Upper bound on ISBNs plus ids in one availability request
+MAX_AVAILABILITY_ITEMS = 5000
+
+class BookAvailabilitySerializer(serializers.Serializer):
+    """
+    Batch of ISBNs and/or book ids to look up the available copies of
+    """
+    isbns = serializers.ListField(child=serializers.CharField(max_length=32), required=False, default=list)
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+    def validate_isbns(self, value):
+        """
+        Accept ISBNs written with hyphens or spaces, as search does
+        """
+        return [isbn.replace('-', '').replace(' ', '') for isbn in value]
+
+    def validate(self, attrs):
+        count = len(attrs['isbns']) + len(attrs['ids'])
+        if not count:
+            raise serializers.ValidationError("Pass at least one ISBN or id")
+        if count > MAX_AVAILABILITY_ITEMS:
+            raise serializers.ValidationError(f"At most {MAX_AVAILABILITY_ITEMS} ISBNs and ids per request")
+        return attrs
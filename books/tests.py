@@ -1,16 +1,48 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest import mock
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.db import connection, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from prometheus_client import REGISTRY
+from authors.models import Author
+from borrowrecords.models import BorrowRecord
+from core.cache import author_cache, book_cache
+from core import events, metrics
+from core.renderers import FastJSONRenderer
+from core.testing import QueryBudgetMixin
+from . import availability
+from .availability import availability_index
 from .models import Book
+from .serializers import BookDetailSerializer, BookSerializer
 
 class BookAPITestCase(TestCase):
     def setUp(self):
         self.client = APIClient()
-        self.book_data = {"title": "Test Book", "author": "John Doe", "published_date": "2024-12-12"}
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Jane Doe")
+        self.book_data = {"title": "Test Book", "author": self.author.id, "isbn": "9780306406157", "available_copies": 2}
 
         # Create a book for testing
         self.book = Book.objects.create(
-            title="Existing Book", author="Jane Doe", published_date="2024-12-12"
+            title="Existing Book", author=self.author, isbn="0306406152", available_copies=1
         )
 
     def test_get_books(self):
@@ -33,7 +65,924 @@ class BookAPITestCase(TestCase):
         """
         Test creating a book with invalid data
         """
-        invalid_data = {"title": "", "author": "John Doe"}
+        invalid_data = {"title": "", "author": self.author.id, "isbn": "123"}
         response = self.client.post("/api/books/", data=invalid_data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("Validation failed", str(response.data))
+
+class BookKeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="John Doe")
+        # Duplicate titles make sure the id tie-breaker is honoured
+        for index, title in enumerate(["Alpha", "Beta", "Beta", "Beta", "Gamma"]):
+            Book.objects.create(
+                title=title, author=self.author, isbn=f"{index:010d}", available_copies=1
+            )
+
+    def test_pages_cover_every_book_once(self):
+        """
+        Test walking the next links returns each book exactly once, in order
+        """
+        seen = []
+        url = "/api/books/?page_size=2"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data["results"]), 2)
+            seen.extend(book["id"] for book in response.data["results"])
+            url = response.data["next"]
+
+        expected = list(Book.objects.order_by("title", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursor(self):
+        """
+        Test a malformed cursor is rejected
+        """
+        response = self.client.get("/api/books/?cursor=not-a-cursor")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn("Invalid cursor", str(response.data))
+
+class BookQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="John Doe")
+        self.books = [
+            Book.objects.create(
+                title=f"Book {index}", author=self.author, isbn=f"{index:010d}", available_copies=1
+            )
+            for index in range(25)
+        ]
+
+    def test_book_list_query_budget(self):
+        """
+        Test a page of books is a single query, its validators computed from the rows
+        """
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/books/?page_size=20")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_book_detail_query_budget(self):
+        """
+        Test a book and its author name come from a single query
+        """
+        with self.assertMaxQueries(1):
+            response = self.client.get(f"/api/books/{self.books[0].id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["author_name"], "John Doe")
+
+class CatalogImportTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="cataloguer", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Existing Author")
+        Book.objects.create(title="Old Title", author=self.author, isbn="9780000000001", available_copies=1)
+
+    def test_csv_import_upserts_on_isbn(self):
+        """
+        Test a CSV catalog creates books, reuses authors and updates existing ISBNs
+        """
+        rows = ["title,author,isbn,available_copies", "New Title,Existing Author,978-0000000001,4"]
+        rows += [f"Book {i},Author {i % 3},{9781000000000 + i},2" for i in range(30)]
+        rows += ["Bad Isbn,Someone,12345,1", ",Nobody,9782000000000,1"]
+        upload = SimpleUploadedFile("catalog.csv", "\n".join(rows).encode("utf-8"))
+
+        with self.assertMaxQueries(30):
+            response = self.client.post("/api/books/import/", {"file": upload, "chunk_size": 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        summary = response.data["data"]
+        self.assertEqual(summary["rows"], 33)
+        self.assertEqual(summary["created"], 30)
+        self.assertEqual(summary["updated"], 1)
+        self.assertEqual(summary["skipped"], 2)
+        self.assertEqual([error["row"] for error in summary["errors"]], [32, 33])
+
+        updated = Book.objects.get(isbn="9780000000001")
+        self.assertEqual((updated.title, updated.available_copies), ("New Title", 4))
+        self.assertEqual(Author.objects.filter(name__startswith="Author ").count(), 3)
+
+    def test_jsonl_author_import(self):
+        """
+        Test a JSONL author import creates new names and refreshes existing bios
+        """
+        lines = [
+            json.dumps({"name": "Existing Author", "bio": "Updated bio"}),
+            json.dumps({"name": "New Author"}),
+            "not json",
+        ]
+        upload = SimpleUploadedFile("authors.jsonl", "\n".join(lines).encode("utf-8"))
+        response = self.client.post("/api/authors/import/", {"file": upload})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["created"], 1)
+        self.assertEqual(response.data["data"]["updated"], 1)
+        self.assertEqual(response.data["data"]["skipped"], 1)
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.bio, "Updated bio")
+
+class BookCacheTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        book_cache.local.clear()
+        author_cache.local.clear()
+        self.author = Author.objects.create(name="John Doe")
+        self.book = Book.objects.create(
+            title="Cached Book", author=self.author, isbn="1234567890", available_copies=2
+        )
+        self.url = f"/api/books/{self.book.id}/"
+
+    def test_repeated_reads_skip_the_database(self):
+        """
+        Test a second read is served from the cache without queries
+        """
+        self.client.get(self.url)
+        with self.assertMaxQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["data"]["title"], "Cached Book")
+
+    def test_shared_tier_serves_after_local_eviction(self):
+        """
+        Test the shared cache answers when the process-local tier is cold
+        """
+        self.client.get(self.url)
+        book_cache.local.clear()
+        shared_hits = book_cache.get_stats()["shared_hits"]
+        with self.assertMaxQueries(0):
+            self.client.get(self.url)
+        self.assertEqual(book_cache.get_stats()["shared_hits"], shared_hits + 1)
+
+    def test_load_racing_an_invalidation_is_not_cached(self):
+        """
+        Test a payload loaded before a change committed isn't served once the change is invalidated
+        """
+        def stale_loader():
+            # The row is read, then a write commits and invalidates before the reader stores it
+            with self.captureOnCommitCallbacks(execute=True):
+                book_cache.invalidate(self.book.id)
+            return {"stale": True}
+
+        self.assertEqual(book_cache.get_or_load(self.book.id, stale_loader), {"stale": True})
+        self.assertEqual(book_cache.get_or_load(self.book.id, lambda: {"stale": False}), {"stale": False})
+        book_cache.local.clear()
+        self.assertEqual(book_cache.get_or_load(self.book.id, lambda: {"stale": True}), {"stale": False})
+
+    def test_update_invalidates(self):
+        """
+        Test an update is visible on the next read
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                self.url,
+                {"title": "Renamed", "author": self.author.id, "isbn": "1234567890", "available_copies": 2},
+            )
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["data"]["title"], "Renamed")
+
+    def test_borrow_and_return_invalidate(self):
+        """
+        Test copy-count changes from borrowing and returning reach the cached payload
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+        self.assertEqual(self.client.get(self.url).data["data"]["available_copies"], 1)
+
+        record_id = self.book.borrow_records.get().id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put("/api/borrow/bulk/return/", {"ids": [record_id]}, format="json")
+        self.assertEqual(self.client.get(self.url).data["data"]["available_copies"], 2)
+
+    def test_author_rename_invalidates_book(self):
+        """
+        Test renaming the author refreshes the book's author name
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/authors/{self.author.id}/", {"name": "Jane Doe"})
+        self.assertEqual(self.client.get(self.url).data["data"]["author_name"], "Jane Doe")
+
+    def test_delete_invalidates(self):
+        """
+        Test a deleted book is no longer served from the cache
+        """
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.url)
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookConditionalRequestTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        book_cache.local.clear()
+        self.author = Author.objects.create(name="John Doe")
+        self.book = Book.objects.create(
+            title="Polled Book", author=self.author, isbn="1234567890", available_copies=2
+        )
+        self.url = f"/api/books/{self.book.id}/"
+
+    def test_detail_not_modified(self):
+        """
+        Test a matching If-None-Match gets an empty 304 from one query
+        """
+        response = self.client.get(self.url)
+        self.assertIn("Last-Modified", response)
+        etag = response["ETag"]
+        self.assertFalse(etag.startswith("W/"))
+
+        with self.assertMaxQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_etag_changes_with_copies_and_author(self):
+        """
+        Test borrowing a copy or renaming the author invalidates the ETag
+        """
+        etag = self.client.get(self.url)["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["available_copies"], 1)
+
+        etag = response["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f"/api/authors/{self.author.id}/", {"name": "Jane Doe"})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["author_name"], "Jane Doe")
+
+    def test_detail_if_modified_since(self):
+        """
+        Test If-Modified-Since is honoured when no ETag is sent
+        """
+        last_modified = self.client.get(self.url)["Last-Modified"]
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_not_modified_until_page_changes(self):
+        """
+        Test a page answers 304 from its aggregate and changes when a book is added
+        """
+        etag = self.client.get("/api/books/")["ETag"]
+        with self.assertMaxQueries(1):
+            response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        Book.objects.create(title="Another Book", author=self.author, isbn="1234567891", available_copies=1)
+        response = self.client.get("/api/books/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 2)
+
+
+    def test_list_validators_match_with_and_without_conditional_headers(self):
+        """
+        Test a page's validators computed from its rows equal the ones its aggregate gives
+        """
+        Book.objects.create(title="Another Book", author=self.author, isbn="1234567891", available_copies=1)
+        for params in ({"page_size": 1}, {"page_size": 1, "expand": "author"}, {"fields": "title"}):
+            plain = self.client.get("/api/books/", params)
+            self.assertNotIn("page_modified", plain.data["results"][0])
+            checked = self.client.get("/api/books/", params, HTTP_IF_NONE_MATCH='"stale"')
+            self.assertEqual(checked.status_code, status.HTTP_200_OK)
+            self.assertEqual(checked["ETag"], plain["ETag"])
+            self.assertNotIn("Last-Modified", plain)
+
+    def test_list_if_modified_since_sees_deleted_rows(self):
+        """
+        Test deleting a book on a page changes it even for clients sending only If-Modified-Since
+        """
+        for index in range(4):
+            Book.objects.create(title=f"Book {index}", author=self.author, isbn=f"555000000{index}", available_copies=1)
+        response = self.client.get("/api/books/", {"page_size": 4})
+        self.assertEqual(len(response.data["results"]), 4)
+        since = http_date(time.time() + 60)
+        Book.objects.filter(title="Book 1").delete()
+        response = self.client.get("/api/books/", {"page_size": 4}, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Book 1", [book["title"] for book in response.data["results"]])
+
+        author_url = f"/api/authors/{self.author.id}/"
+        self.assertNotIn("Last-Modified", self.client.get(author_url))
+        Book.objects.filter(title="Book 2").delete()
+        response = self.client.get(author_url, HTTP_IF_MODIFIED_SINCE=since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class BookSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="John Doe")
+        titles = ["Harry Potter", "Harry Potter Potter", "Hard Times", "Great Expectations"]
+        self.books = [
+            Book.objects.create(title=title, author=self.author, isbn=f"{index:010d}", available_copies=1)
+            for index, title in enumerate(titles)
+        ]
+
+    def test_prefix_terms_ranked(self):
+        """
+        Test every term is matched as a prefix and the better match ranks first
+        """
+        response = self.client.get("/api/books/search/", {"q": "harry pot"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        titles = [book["title"] for book in response.data["results"]]
+        self.assertEqual(titles, ["Harry Potter Potter", "Harry Potter"])
+
+    def test_pages_cover_every_match_once(self):
+        """
+        Test keyset pages over the ranked results neither repeat nor skip books
+        """
+        seen = []
+        url = "/api/books/search/?q=har&page_size=1"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(book["id"] for book in response.data["results"])
+            url = response.data["next"]
+        self.assertCountEqual(seen, [book.id for book in self.books[:3]])
+
+    def test_capped_matches_keep_the_best_ranked(self):
+        """
+        Test past the match cap the best ranked books are kept, ties by id, on every page
+        """
+        best = Book.objects.create(title="Harry Harry Harry", author=self.author, isbn="0000000099", available_copies=1)
+        with mock.patch("core.search.MAX_RANKED_MATCHES", 2):
+            response = self.client.get("/api/books/search/", {"q": "harry"})
+            self.assertEqual([book["id"] for book in response.data["results"]], [best.id, self.books[0].id])
+
+            seen = []
+            url = "/api/books/search/?q=harry&page_size=1"
+            while url:
+                response = self.client.get(url)
+                seen.extend(book["id"] for book in response.data["results"])
+                url = response.data["next"]
+        self.assertEqual(seen, [best.id, self.books[0].id])
+
+    def test_exact_isbn(self):
+        """
+        Test an ISBN, with or without dashes, finds exactly that book
+        """
+        response = self.client.get("/api/books/search/", {"q": "000-000-0003"})
+        self.assertEqual([book["title"] for book in response.data["results"]], ["Great Expectations"])
+
+    def test_query_operators_are_ignored(self):
+        """
+        Test tsquery syntax in the input is treated as plain words
+        """
+        response = self.client.get("/api/books/search/", {"q": "great & !(exp"})
+        self.assertEqual([book["title"] for book in response.data["results"]], ["Great Expectations"])
+
+    def test_empty_query(self):
+        """
+        Test a query without words is rejected
+        """
+        response = self.client.get("/api/books/search/", {"q": " -- "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncBookViewTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reader", password="password123")
+        cache.clear()
+        book_cache.local.clear()
+        self.author = Author.objects.create(name="John Doe")
+        self.books = [
+            Book.objects.create(title=f"Book {index}", author=self.author, isbn=f"{index:010d}", available_copies=1)
+            for index in range(3)
+        ]
+
+    async def test_async_list_matches_sync_list(self):
+        """
+        Test the async list pages like the sync one and honours its validators
+        """
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get("/api/async/books/", {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([book["title"] for book in response.json()["results"]], ["Book 0", "Book 1"])
+        etag = response["ETag"]
+
+        response = await self.async_client.get(response.json()["next"])
+        self.assertEqual([book["title"] for book in response.json()["results"]], ["Book 2"])
+        self.assertIsNone(response.json()["next"])
+
+        response = await self.async_client.get(
+            "/api/async/books/", {"page_size": 2}, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_async_detail(self):
+        """
+        Test the async detail shares the cache entry and answers 304 and 404
+        """
+        await self.async_client.aforce_login(self.user)
+        url = f"/api/async/books/{self.books[0].id}/"
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["data"]["author_name"], "John Doe")
+
+        response = await self.async_client.get(url, headers={"if-none-match": response["ETag"]})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = await self.async_client.get("/api/async/books/999999/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_requires_authentication(self):
+        """
+        Test anonymous requests are refused like the DRF views refuse them
+        """
+        response = await self.async_client.get("/api/async/books/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FastListRenderingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Jane Doe")
+        for index in range(3):
+            Book.objects.create(title=f"Caf\u00e9 {index}", author=author, isbn=f"{index:010d}", available_copies=index)
+
+    def test_list_renders_what_the_serializer_would(self):
+        """
+        Test the values() list renders byte for byte what BookSerializer and DRF's JSONRenderer produce
+        """
+        response = self.client.get("/api/books/", {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        books = Book.objects.order_by("title", "id")[:2]
+        expected = {"next": response.json()["next"], "results": BookSerializer(books, many=True).data}
+        self.assertEqual(response.content, JSONRenderer().render(expected))
+
+    def test_renderer_matches_drf_encoding(self):
+        """
+        Test FastJSONRenderer encodes datetimes, dates, decimals and unicode like DRF's JSONRenderer
+        """
+        data = {
+            "at": datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            "naive": datetime(2024, 5, 1, 12, 30),
+            "day": date(2024, 5, 1),
+            "price": Decimal("12.50"),
+            "title": "Caf\u00e9 \u2603",
+            1: None,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_values_refuses_computed_fields(self):
+        """
+        Test values() refuses a serializer whose fields aren't all plain columns
+        """
+        with self.assertRaises(ImproperlyConfigured):
+            BookDetailSerializer.values(Book.objects.all())
+
+
+class SparseFieldsetTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Jane Doe", bio="Writes")
+        self.books = [
+            Book.objects.create(title=f"Book {index}", author=self.author, isbn=f"{index:010d}", available_copies=index)
+            for index in range(3)
+        ]
+
+    def test_fields_narrow_the_list(self):
+        """
+        Test ?fields= returns only the chosen fields, in serializer order, and still pages by title
+        """
+        response = self.client.get("/api/books/", {"fields": "available_copies,id", "page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"],
+            [{"id": book.id, "available_copies": book.available_copies} for book in self.books[:2]],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"], [{"id": self.books[2].id, "available_copies": 2}])
+
+    def test_expand_embeds_the_author_in_one_query(self):
+        """
+        Test ?expand=author embeds the author from a join, and the page ETag follows the author's changes
+        """
+        with self.assertMaxQueries(2):
+            response = self.client.get("/api/books/", {"expand": "author", "fields": "title,author.name,author.id"})
+        self.assertEqual(response.data["results"][0], {"title": "Book 0", "author": {"id": self.author.id, "name": "Jane Doe"}})
+        etag = response["ETag"]
+
+        time.sleep(0.01)
+        self.author.name = "Jane Roe"
+        self.author.save()
+        response = self.client.get(
+            "/api/books/", {"expand": "author", "fields": "title,author.name,author.id"}, headers={"if-none-match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["author"]["name"], "Jane Roe")
+
+        response = self.client.get("/api/books/", {"stream": 1, "expand": "author", "fields": "id,author"})
+        results = json.loads(b"".join(response.streaming_content))["results"]
+        self.assertEqual(results[0], {"id": self.books[0].id, "author": {"id": self.author.id, "name": "Jane Roe", "bio": "Writes"}})
+
+    def test_invalid_selection_is_rejected(self):
+        """
+        Test unknown fields, relations that can't be expanded and nested fields without expand answer 400
+        """
+        for params in ({"fields": "id,price"}, {"expand": "isbn"}, {"fields": "author.name"}):
+            response = self.client.get("/api/books/", params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn("details", response.data)
+
+        response = self.client.get("/api/authors/", {"fields": "name"})
+        self.assertEqual(response.data["results"], [{"name": "Jane Doe"}])
+
+
+class CompressionAndStreamingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Jane Doe")
+        Book.objects.bulk_create([
+            Book(title=f"Book {index:03d}", author=author, isbn=f"{index:010d}", available_copies=1)
+            for index in range(120)
+        ])
+
+    def test_list_is_compressed_when_accepted(self):
+        """
+        Test a large page is gzipped for clients accepting gzip, weakening its ETag, and sent as is otherwise
+        """
+        plain = self.client.get("/api/books/", {"page_size": 100})
+        self.assertFalse(plain.has_header("Content-Encoding"))
+        self.assertIn("Accept-Encoding", plain["Vary"])
+
+        response = self.client.get("/api/books/", {"page_size": 100}, headers={"accept-encoding": "br;q=0, gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response["ETag"], "W/" + plain["ETag"])
+
+        response = self.client.get(
+            "/api/books/", {"page_size": 100}, headers={"accept-encoding": "gzip", "if-none-match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get("/api/books/", {"page_size": 100}, headers={"accept-encoding": "gzip;q=0"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_small_responses_are_not_compressed(self):
+        """
+        Test bodies under COMPRESSION_MIN_BYTES go out uncompressed
+        """
+        response = self.client.get("/api/books/", {"page_size": 1}, headers={"accept-encoding": "gzip"})
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_html_is_not_compressed(self):
+        """
+        Test HTML pages, which may carry a CSRF token next to reflected input, are never compressed
+        """
+        staff = User.objects.create_superuser(username="admin", password="password123")
+        self.client.force_login(staff)
+        response = self.client.get("/admin/books/book/", {"q": "Book"}, headers={"accept-encoding": "gzip"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/html"))
+        self.assertGreater(len(response.content), settings.COMPRESSION_MIN_BYTES)
+        self.assertFalse(response.has_header("Content-Encoding"))
+
+    def test_stream_writes_the_whole_list_in_chunks(self):
+        """
+        Test ?stream=1 streams every book in list order, in the last page's shape, compressed chunk by chunk
+        """
+        with override_settings(STREAM_CHUNK_ROWS=50):
+            response = self.client.get("/api/books/", {"stream": 1})
+            self.assertTrue(response.streaming)
+            chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 5)
+        data = json.loads(b"".join(chunks))
+        self.assertIsNone(data["next"])
+        expected = BookSerializer(Book.objects.order_by("title", "id"), many=True).data
+        self.assertEqual(data["results"], json.loads(JSONRenderer().render(expected)))
+
+        response = self.client.get("/api/books/", {"stream": 1}, headers={"accept-encoding": "gzip"})
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(b"".join(response.streaming_content))), data)
+
+        response = self.client.get("/api/authors/", {"stream": "true"})
+        self.assertEqual([author["name"] for author in json.loads(b"".join(response.streaming_content))["results"]], ["Jane Doe"])
+
+
+class BookAvailabilityTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="kiosk", password="password123")
+        self.client.force_authenticate(user=self.user)
+        availability_index.clear()
+        self.addCleanup(availability_index.clear)
+        author = Author.objects.create(name="Jane Doe")
+        self.book = Book.objects.create(title="Book", author=author, isbn="9780306406157", available_copies=2)
+        self.short = Book.objects.create(title="Short", author=author, isbn="0306406152", available_copies=0)
+
+    def lookup(self, **body):
+        response = self.client.post("/api/books/availability/", body, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["data"]
+
+    def test_batch_lookup_by_isbn_and_id(self):
+        """
+        Test ISBNs and ids are answered in request order, with nulls for unknown books
+        """
+        self.assertEqual(self.lookup(isbns=["978-0-306-40615-7", "0306406152", "0000000000"], ids=[self.short.id, 999999]), [
+            {"id": self.book.id, "isbn": "9780306406157", "available_copies": 2},
+            {"id": self.short.id, "isbn": "0306406152", "available_copies": 0},
+            {"id": None, "isbn": "0000000000", "available_copies": None},
+            {"id": self.short.id, "isbn": "0306406152", "available_copies": 0},
+            {"id": 999999, "isbn": None, "available_copies": None},
+        ])
+        response = self.client.post("/api/books/availability/", {"isbns": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_borrows_edits_and_deletes_here_show_at_once(self):
+        """
+        Test committed borrows, ISBN changes and deletions in this process re-read just those books
+        """
+        self.lookup(isbns=[self.book.isbn])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+        with self.assertMaxQueries(2):
+            self.assertEqual(self.lookup(ids=[self.book.id])[0]["available_copies"], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                f"/api/books/{self.short.id}/",
+                {"title": "Short", "author": self.short.author_id, "isbn": "0306406160", "available_copies": 3},
+            )
+            self.client.delete(f"/api/books/{self.book.id}/")
+        self.assertEqual(self.lookup(isbns=["0306406152", "0306406160"], ids=[self.book.id]), [
+            {"id": None, "isbn": "0306406152", "available_copies": None},
+            {"id": self.short.id, "isbn": "0306406160", "available_copies": 3},
+            {"id": self.book.id, "isbn": None, "available_copies": None},
+        ])
+
+    def test_changes_from_other_processes_are_synced(self):
+        """
+        Test rows changed without a notification, as by another process, are picked up from updated_at
+        """
+        self.lookup(isbns=[self.book.isbn])
+        Book.objects.filter(pk=self.book.pk).update(available_copies=7, updated_at=timezone.now())
+        added = Book.objects.create(title="New", author=self.book.author, isbn="9781234567897", available_copies=4)
+
+        with override_settings(AVAILABILITY_INDEX={"SYNC_SECONDS": 60}):
+            self.assertEqual(self.lookup(isbns=[self.book.isbn])[0]["available_copies"], 2)
+        with override_settings(AVAILABILITY_INDEX={"SYNC_SECONDS": 0}):
+            results = self.lookup(isbns=[self.book.isbn, added.isbn])
+        self.assertEqual([row["available_copies"] for row in results], [7, 4])
+
+
+    def test_marking_dirty_does_not_wait_for_a_rebuild(self):
+        """
+        Test committed changes can mark books dirty while another thread is rebuilding the index
+        """
+        building, release = threading.Event(), threading.Event()
+        real_snapshot = availability._Snapshot
+
+        def slow_snapshot(rows):
+            building.set()
+            release.wait(5)
+            return real_snapshot(rows)
+
+        def rebuild():
+            try:
+                availability_index.lookup(ids=[self.book.id])
+            finally:
+                connection.close()
+
+        with mock.patch.object(availability, "_Snapshot", slow_snapshot):
+            worker = threading.Thread(target=rebuild)
+            worker.start()
+            self.assertTrue(building.wait(5))
+            marker = threading.Thread(target=availability_index.mark_dirty, args=([self.book.id],))
+            marker.start()
+            marker.join(1)
+            blocked = marker.is_alive()
+            release.set()
+            worker.join(5)
+            marker.join(5)
+        self.assertFalse(blocked)
+
+class ChangeEventTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        book_cache.local.clear()
+        self.book = Book.objects.create(
+            title="Book", author=Author.objects.create(name="Jane Doe"), isbn="1234567890", available_copies=2
+        )
+        self.received = []
+        events.subscribe("book", self.record)
+        self.addCleanup(events._subscribers["book"].remove, self.record)
+
+    def record(self, changes, local):
+        self.received.extend((change, local) for change in changes)
+
+    def test_borrows_publish_after_commit(self):
+        """
+        Test a borrow announces its copy-count change once committed, and a rolled back change nothing
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+            self.assertEqual(self.received, [])
+        self.book.refresh_from_db()
+        [(change, local)] = self.received
+        self.assertEqual(change.entity, "book")
+        self.assertEqual(change.id, self.book.id)
+        self.assertEqual(change.fields, ("available_copies",))
+        self.assertEqual(change.version, int(self.book.updated_at.timestamp() * 1_000_000))
+        self.assertTrue(local)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                events.publish("book", [self.book.id])
+                transaction.set_rollback(True)
+        self.assertEqual(len(self.received), 1)
+
+    def test_returns_publish_the_new_version(self):
+        """
+        Test a return announces its copy-count change with the book's new updated_at
+        """
+        record = BorrowRecord.objects.create(book=self.book, borrowed_by="Reader")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(record.mark_as_returned())
+        self.book.refresh_from_db()
+        [(change, local)] = self.received
+        self.assertEqual(change.fields, ("available_copies",))
+        self.assertEqual(change.version, int(self.book.updated_at.timestamp() * 1_000_000))
+
+    def test_payloads_round_trip_within_notify_limit(self):
+        """
+        Test a large batch is split into NOTIFY payloads under 8000 bytes that decode to the same events
+        """
+        changes = [events.Event("book", pk, ("available_copies",), 1_700_000_000_000_000 + pk) for pk in range(2000)]
+        payloads = list(events._encode(changes))
+        self.assertGreater(len(payloads), 1)
+        self.assertTrue(all(len(payload.encode()) < 8000 for payload in payloads))
+        decoded = [change for payload in payloads for change in events._decode(payload)[1]]
+        self.assertEqual(decoded, changes)
+
+    def test_other_processes_events_drop_local_state(self):
+        """
+        Test another process's change drops the local cache tier and dirties the availability index,
+        leaving the shared tier to the process that made it
+        """
+        availability_index.clear()
+        self.addCleanup(availability_index.clear)
+        availability_index.lookup(ids=[self.book.id])
+        url = f"/api/books/{self.book.id}/"
+        self.client.get(url)
+        key = book_cache.make_key(self.book.id)
+        Book.objects.filter(pk=self.book.pk).update(available_copies=9)
+
+        events._deliver([events.Event("book", self.book.id, ("available_copies",), None)], local=False)
+        self.assertIsNone(book_cache.local.get(key))
+        self.assertIsNotNone(cache.get(key))
+        self.assertEqual(availability_index.lookup(ids=[self.book.id])[0]["available_copies"], 9)
+
+        events._deliver([events.Event("book", self.book.id, (), None)], local=True)
+        self.assertIsNone(cache.get(key))
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="reader", password="password123")
+        self.client.force_authenticate(user=self.user)
+        cache.clear()
+        book_cache.local.clear()
+        self.author = Author.objects.create(name="John Doe")
+        self.book = Book.objects.create(title="Book", author=self.author, isbn="0000000001", available_copies=1)
+        # The test database connection was opened before the middleware was loaded
+        metrics.instrument_connections()
+
+    def sample(self, name, view):
+        return REGISTRY.get_sample_value(name, {"view": view}) or 0
+
+    def test_request_metrics_recorded_per_view(self):
+        """
+        Test a request is counted against its view with its queries and size, and timed in Server-Timing
+        """
+        requests = self.sample("lms_request_queries_count", "BookListCreateView")
+        queries = self.sample("lms_request_queries_sum", "BookListCreateView")
+        size = self.sample("lms_response_size_bytes_sum", "BookListCreateView")
+
+        response = self.client.get("/api/books/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.sample("lms_request_queries_count", "BookListCreateView"), requests + 1)
+        self.assertEqual(self.sample("lms_request_queries_sum", "BookListCreateView"), queries + 1)
+        self.assertEqual(self.sample("lms_response_size_bytes_sum", "BookListCreateView"), size + len(response.content))
+        self.assertRegex(response["Server-Timing"], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries, 0 duplicate"$')
+
+    def test_duplicate_queries_counted(self):
+        """
+        Test repeating a query with the same parameters counts as a duplicate, and other parameters don't
+        """
+        stats = metrics.RequestStats()
+        token = metrics._current.set(stats)
+        try:
+            list(Book.objects.filter(pk=self.book.pk))
+            list(Book.objects.filter(pk=self.book.pk))
+            list(Book.objects.filter(pk=self.book.pk + 1))
+        finally:
+            metrics._current.reset(token)
+        self.assertEqual((stats.queries, stats.duplicates), (3, 1))
+        self.assertGreater(stats.db_seconds, 0)
+
+    async def test_async_view_queries_counted(self):
+        """
+        Test queries the async ORM runs in worker threads count against the request
+        """
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(f"/api/async/books/{self.book.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertRegex(response["Server-Timing"], r'desc="[1-9]\d* queries')
+
+    def test_metrics_endpoint(self):
+        """
+        Test /metrics serves the Prometheus text format to allowed addresses only
+        """
+        self.client.get("/api/books/")
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        self.assertIn(b'lms_request_duration_seconds_count{method="GET",status="200",view="BookListCreateView"}', response.content)
+
+        with override_settings(METRICS_ALLOWED_IPS=["10.0.0.1"]):
+            response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_n_plus_one_logged(self):
+        """
+        Test a request reading a relation once per row is logged with its statement count and call site
+        """
+        for index in range(2, 5):
+            Book.objects.create(title=f"Book {index}", author=self.author, isbn=f"{index:010d}", available_copies=1)
+
+        def view(request):
+            return HttpResponse(", ".join(book.author.name for book in Book.objects.all()))
+
+        with self.assertLogs("core.metrics", "WARNING") as logs:
+            metrics.RequestMetricsMiddleware(view)(RequestFactory().get("/api/books/"))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("ran the same SQL 4 times, likely an N+1 query", logs.output[0])
+        self.assertIn("in view", logs.output[0])
+
+    @override_settings(SLOW_QUERY_MS=0)
+    def test_slow_query_logged(self):
+        """
+        Test each query over the latency threshold is logged
+        """
+        with self.assertLogs("core.metrics", "WARNING") as logs:
+            self.client.get(f"/api/books/{self.book.id}/")
+        self.assertTrue(logs.output)
+        self.assertTrue(all("BookDetailView /api/books/" in line and "slow query" in line for line in logs.output))
+
+    def test_sampling_profiler_writes_folded_stacks(self):
+        """
+        Test a sampled request's stacks are written in the folded flame graph format
+        """
+        def view(request):
+            time.sleep(0.05)
+            return HttpResponse()
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(REQUEST_PROFILE_RATE=1.0, REQUEST_PROFILE_INTERVAL_MS=1, REQUEST_PROFILE_DIR=directory):
+                metrics.RequestMetricsMiddleware(view)(RequestFactory().get("/"))
+            files = os.listdir(directory)
+            self.assertEqual(len(files), 1)
+            self.assertTrue(files[0].startswith("unmatched.") and files[0].endswith(".folded"))
+            with open(os.path.join(directory, files[0])) as f:
+                lines = f.read().splitlines()
+        self.assertTrue(lines)
+        stack, count = lines[0].rsplit(" ", 1)
+        self.assertGreater(int(count), 0)
+        self.assertTrue(any("view (books/tests.py:" in line for line in lines))
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(REQUEST_PROFILE_DIR=directory):
+                metrics.RequestMetricsMiddleware(view)(RequestFactory().get("/"))
+            self.assertEqual(os.listdir(directory), [])
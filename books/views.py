@@ -1,12 +1,28 @@
+import io
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from .models import Book
-from .serializers import BookSerializer, BookDetailSerializer
+from .availability import availability_index
+from .serializers import (
+    BookAvailabilitySerializer, BookSerializer, BookDetailSerializer, BookSearchSerializer, CatalogImportSerializer,
+)
+from .importer import CatalogImporter, CatalogImportError
 from django.db import IntegrityError
+from django.db.models import FloatField, Value
+from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from core import events
+from core.cache import author_cache, book_cache
+from core.conditional import (
+    has_conditional_headers, make_etag, not_modified, page_validators, rows_validators, set_validators, with_modified,
+)
+from core.pagination import KeysetPagination
+from core.renderers import StreamingListResponse
+from core.search import prefix_query, ranked_matches
 
 class BookListCreateView(APIView):
     """
@@ -15,17 +31,62 @@ class BookListCreateView(APIView):
     permission_classes = [IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Retrieve list of all books",
+        operation_description="Retrieve a page of books",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor taken from the previous page's `next` link"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page"),
+            openapi.Parameter('stream', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Stream every book in one response instead of a page"),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Comma-separated fields to return, e.g. `id,title,author.name`"),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Embed the `author` object instead of its id"),
+        ],
         responses={200: BookSerializer(many=True)},
     )
     def get(self, request):
         """
-        Retrieve list of all books
+        Retrieve a page of books, keyset-paginated on ('title', 'id')
+        Conditional requests are answered 304 from one aggregate over the page when
+        the client's copy is current; others get validators from the loaded rows
+        Rows are read with values(), selecting only the ?fields= asked for and
+        joining the author in the same query for ?expand=author
+        With ?stream=1 the whole list is streamed from a server-side cursor instead
         """
         try:
-            books = Book.objects.all()
-            serializer = BookSerializer(books, many=True)
-            return Response(serializer.data)
+            paginator = KeysetPagination(ordering=('title', 'id'))
+            fieldset = BookSerializer.fieldset(request.query_params, paginator.ordering)
+            if request.query_params.get('stream') in ('1', 'true'):
+                return StreamingListResponse(
+                    fieldset.values(Book.objects.order_by(*paginator.ordering)), transform=fieldset.rows
+                )
+
+            queryset = fieldset.values(Book.objects.all())
+            if has_conditional_headers(request):
+                window = paginator.get_page_window(queryset, request)
+                etag = page_validators(request, window, fieldset.modified)
+                response = not_modified(request, etag, None)
+                if response is not None:
+                    return response
+                rows = list(window)
+            else:
+                rows = list(paginator.get_page_window(with_modified(queryset, fieldset.modified), request))
+                etag = rows_validators(request, rows)
+
+            books = fieldset.rows(paginator.paginate_window(rows))
+            return set_validators(paginator.get_paginated_response(books), etag, None)
+        except ValidationError as e:
+            return Response(
+                {"error": "Invalid field selection", "details": e.detail},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
         except Exception as e:
             return Response(
                 {"error": f"An error occurred while retrieving books: {str(e)}"},
@@ -50,7 +111,8 @@ class BookListCreateView(APIView):
         serializer = BookSerializer(data=request.data)
         try:
             if serializer.is_valid():
-                serializer.save()
+                book = serializer.save()
+                author_cache.invalidate(book.author_id)
                 return Response(
                     {"message": "Book created successfully!", "data": serializer.data},
                     status=status.HTTP_201_CREATED,
@@ -81,10 +143,39 @@ class BookDetailView(APIView):
         Helper method to get book instance
         """
         try:
-            return Book.objects.get(pk=pk)
+            return BookDetailSerializer.setup_eager_loading(Book.objects.all()).get(pk=pk)
         except Book.DoesNotExist:
             return None
 
+    @staticmethod
+    def make_validators(pk, updated_at, author_updated_at):
+        """
+        ETag and Last-Modified of a book payload, which also shows its author's name
+        """
+        return make_etag('book', pk, updated_at, author_updated_at), max(updated_at, author_updated_at)
+
+    @staticmethod
+    def validators_query(pk):
+        """
+        One-row query of the values make_validators takes
+        """
+        return Book.objects.filter(pk=pk).values_list('updated_at', 'author__updated_at')
+
+    @classmethod
+    def make_payload(cls, book):
+        """
+        Cache entry for a book loaded with BookDetailSerializer's eager loading
+        """
+        etag, last_modified = cls.make_validators(book.pk, book.updated_at, book.author.updated_at)
+        return {"data": dict(BookDetailSerializer(book).data), "etag": etag, "last_modified": last_modified}
+
+    def load_payload(self, pk):
+        """
+        Helper method to serialize a book for the cache, None if it doesn't exist
+        """
+        book = self.get_object(pk)
+        return self.make_payload(book) if book else None
+
     @swagger_auto_schema(
         operation_description="Retrieve a specific books",
         responses={200: BookDetailSerializer(many=True)},
@@ -92,16 +183,32 @@ class BookDetailView(APIView):
     def get(self, request, pk):
         """
         Retrieve a specific book
+        Served from the catalog cache when possible; conditional requests
+        are answered from the book's timestamps alone
         """
-        book = self.get_object(pk)
-        if not book:
+        if has_conditional_headers(request):
+            row = self.validators_query(pk).first()
+            if row is None:
+                return Response(
+                    {"error": "Book not found"},
+                    status=status.HTTP_404_NOT_FOUND,
+                )
+            response = not_modified(request, *self.make_validators(pk, *row))
+            if response is not None:
+                return response
+
+        entry = book_cache.get_or_load(pk, lambda: self.load_payload(pk))
+        if entry is None:
             return Response(
                 {"error": "Book not found"},
                 status=status.HTTP_404_NOT_FOUND,
             )
-        serializer = BookDetailSerializer(book)
-        return Response(
-            {"message": "Book retrieved successfully!", "data": serializer.data}
+        # The validators come with the payload, so a briefly stale cache
+        # entry is never served under a newer ETag
+        return set_validators(
+            Response({"message": "Book retrieved successfully!", "data": entry["data"]}),
+            entry["etag"],
+            entry["last_modified"],
         )
 
     @swagger_auto_schema(
@@ -131,9 +238,13 @@ class BookDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND,
             )
         
+        previous_author_id = book.author_id
         serializer = BookSerializer(book, data=request.data)
         if serializer.is_valid():
             serializer.save()
+            events.publish('book', [pk], fields=list(serializer.validated_data), version=book.updated_at)
+            # Author payloads list their books' titles
+            author_cache.invalidate(previous_author_id, book.author_id)
             return Response(
                 {"message": "Book updated successfully!", "data": serializer.data}
             )
@@ -159,6 +270,8 @@ class BookDetailView(APIView):
         
         try:
             book.delete()
+            events.publish('book', [pk])
+            author_cache.invalidate(book.author_id)
             return Response(
                 {"message": "Book deleted successfully!"},
                 status=status.HTTP_204_NO_CONTENT,
@@ -168,3 +281,141 @@ class BookDetailView(APIView):
                 {"error": f"An unexpected error occurred: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class BookSearchView(APIView):
+    """
+    Search books by title or ISBN
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Search books by title prefix terms, or look one up by exact ISBN",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True,
+                              description="Title words (each matched as a prefix) or a 10/13 digit ISBN"),
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor taken from the previous page's `next` link"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page"),
+        ],
+        responses={200: BookSearchSerializer(many=True), 400: "Validation Error"},
+    )
+    def get(self, request):
+        """
+        Retrieve a page of matching books, best match first
+        An ISBN is looked up on the unique index; anything else goes through the title GIN index
+        """
+        text = request.query_params.get('q', '').strip()
+        isbn = text.replace('-', '').replace(' ', '')
+        query = prefix_query(text)
+        if query is None:
+            return Response(
+                {"error": "Query parameter 'q' must contain at least one word"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        try:
+            paginator = KeysetPagination(ordering=('-rank', 'id'))
+            books = BookSearchSerializer.setup_eager_loading(Book.objects.all())
+            if Book.isbn_validator.regex.match(isbn) and books.filter(isbn=isbn).exists():
+                books = books.filter(isbn=isbn).annotate(rank=Value(1.0, output_field=FloatField()))
+            else:
+                books = ranked_matches(books, query)
+            serializer = BookSearchSerializer(paginator.paginate_queryset(books, request, view=self), many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while searching books: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class CatalogImportView(APIView):
+    """
+    Bulk import books or authors from an uploaded CSV or JSONL file
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+    kind = 'books'
+
+    @swagger_auto_schema(
+        operation_description="Import a CSV or JSONL catalog file in bulk chunks",
+        request_body=CatalogImportSerializer,
+        responses={
+            200: openapi.Response(description="Import summary with row counts, errors and rows/sec"),
+            400: "Validation Error",
+        },
+    )
+    def post(self, request):
+        """
+        Stream the uploaded file through the catalog importer
+        """
+        serializer = CatalogImportSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        upload = serializer.validated_data['file']
+        importer = CatalogImporter(kind=self.kind, chunk_size=serializer.validated_data['chunk_size'])
+        try:
+            upload.seek(0)
+            stream = io.TextIOWrapper(upload.file, encoding='utf-8', newline='')
+            summary = importer.run(stream, serializer.validated_data['format'])
+            return Response({"message": "Catalog imported successfully!", "data": summary})
+        except (UnicodeDecodeError, CatalogImportError) as e:
+            return Response(
+                {"error": f"Could not read the catalog file: {str(e)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An unexpected error occurred: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BookAvailabilityView(APIView):
+    """
+    Available copies of many books at once, for kiosks
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Look up the available copies of a batch of ISBNs and/or book ids",
+        request_body=BookAvailabilitySerializer,
+        responses={
+            200: openapi.Response(
+                description="One result per ISBN, then per id, in request order; "
+                            "`id` (for ISBNs) and `available_copies` are null for unknown books"
+            ),
+            400: "Validation Error",
+        },
+    )
+    def post(self, request):
+        """
+        Answer from the per-process availability index rather than the books table
+        A lookup costs two binary searches over arrays; at most the rows changed
+        since the last one are read from the database first
+        """
+        serializer = BookAvailabilitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            results = availability_index.lookup(**serializer.validated_data)
+            return Response({"message": "Availability retrieved successfully!", "data": results})
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving availability: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
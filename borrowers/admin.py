@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import Borrower
+
+@admin.register(Borrower)
+class BorrowerAdmin(admin.ModelAdmin):
+    list_display = ('name', 'created_at')
+    search_fields = ('name',)
+    readonly_fields = ('name_key',)
@@ -0,0 +1,47 @@
+"""
+Link borrow records written before the Borrower model to their borrowers.
+
+Records are taken in id order, ``batch_size`` at a time, each batch in its
+own transaction: the distinct names of the batch are resolved to borrowers
+(creating them, deduplicated by normalized name) and the batch is updated
+with one statement. Locks are held for one batch at a time, and an
+interrupted run picks up where it stopped, since linked records are skipped.
+"""
+from django.db import connection, transaction
+
+from borrowrecords.models import BorrowRecord
+from .models import Borrower
+
+BATCH_SIZE = 10_000
+
+
+def backfill_borrowers(batch_size=BATCH_SIZE, progress=None):
+    """
+    Link every record without a borrower. Returns the number of records
+    linked; ``progress`` is called with the running total after each batch.
+    """
+    table = BorrowRecord._meta.db_table
+    last_id, linked = 0, 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                BorrowRecord.objects.filter(id__gt=last_id, borrower__isnull=True)
+                .order_by('id')
+                .values_list('id', 'borrowed_by')[:batch_size]
+            )
+            if not rows:
+                return linked
+            borrower_ids = Borrower.objects.resolve({name for _, name in rows})
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'''
+                    UPDATE {table} r SET borrower_id = v.borrower_id
+                    FROM unnest(%s::bigint[], %s::bigint[]) AS v(id, borrower_id)
+                    WHERE r.id = v.id AND r.borrower_id IS NULL
+                    ''',
+                    [[pk for pk, _ in rows], [borrower_ids[name] for _, name in rows]],
+                )
+                linked += cursor.rowcount
+        last_id = rows[-1][0]
+        if progress:
+            progress(linked)
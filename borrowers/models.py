@@ -0,0 +1,88 @@
+from django.db import connection, models
+from django.utils import timezone
+
+class BorrowerQuerySet(models.QuerySet):
+    """
+    Name lookups that resolve many borrowers in a fixed number of queries.
+    """
+    def resolve(self, names):
+        """
+        Map each of `names` to its borrower's id, creating the borrowers that
+        don't exist yet. Names that differ only in case or spacing map to the
+        same borrower. One query however many names.
+        """
+        keys = {name: Borrower.normalize(name) for name in names}
+        first_names = {}
+        for name in sorted(keys):
+            first_names.setdefault(keys[name], name)
+        table = Borrower._meta.db_table
+        ids = {}
+        while len(ids) < len(first_names):
+            missing = [key for key in first_names if key not in ids]
+            with connection.cursor() as cursor:
+                # Existing borrowers and the ones this statement inserts, which
+                # its own snapshot can't see, are disjoint
+                cursor.execute(
+                    f'''
+                    WITH wanted (name, name_key) AS (SELECT * FROM unnest(%s::varchar[], %s::varchar[])),
+                    inserted AS (
+                        INSERT INTO {table} (name, name_key, created_at)
+                        SELECT name, name_key, %s FROM wanted
+                        ON CONFLICT (name_key) DO NOTHING
+                        RETURNING name_key, id
+                    )
+                    SELECT name_key, id FROM inserted
+                    UNION ALL
+                    SELECT b.name_key, b.id FROM {table} b JOIN wanted USING (name_key)
+                    ''',
+                    [[first_names[key] for key in missing], missing, timezone.now()],
+                )
+                # A borrower committed concurrently is neither inserted nor seen
+                # by this snapshot; the next round picks it up
+                ids.update(cursor.fetchall())
+        return {name: ids[key] for name, key in keys.items()}
+
+    def for_name(self, name):
+        """
+        The borrower going by `name`, created on first use.
+        """
+        borrower, _ = self.get_or_create(name_key=Borrower.normalize(name), defaults={'name': name})
+        return borrower
+
+class Borrower(models.Model):
+    """
+    Model representing a library patron who borrows books.
+    """
+    name = models.CharField(
+        max_length=255,
+        help_text="Name of the borrower, as first given when borrowing"
+    )
+    name_key = models.CharField(
+        max_length=255,
+        unique=True,
+        help_text="Lowercased name with spacing collapsed, the borrower's identity for lookups"
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When the borrower first borrowed a book"
+    )
+
+    objects = BorrowerQuerySet.as_manager()
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(name.split()).lower()
+
+    def __str__(self):
+        """
+        String representation of the Borrower model.
+        """
+        return self.name
+
+    class Meta:
+        verbose_name = "Borrower"
+        verbose_name_plural = "Borrowers"
+        indexes = [
+            # Backs keyset pagination on (name, id)
+            models.Index(fields=['name', 'id'], name='borrower_name_id_idx'),
+        ]
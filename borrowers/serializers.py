@@ -0,0 +1,28 @@
+from rest_framework import serializers
+from .models import Borrower
+
+class BorrowerSerializer(serializers.ModelSerializer):
+    """
+    Serializer for Borrower model
+    """
+    class Meta:
+        model = Borrower
+        fields = ['id', 'name', 'created_at']
+        read_only_fields = fields
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load only the columns this serializer renders
+        """
+        return queryset.only('id', 'name', 'created_at')
+
+class BorrowerDetailSerializer(BorrowerSerializer):
+    """
+    Borrower with counts of their loans still out and overdue
+    """
+    open_loans = serializers.IntegerField(read_only=True)
+    overdue_loans = serializers.IntegerField(read_only=True)
+
+    class Meta(BorrowerSerializer.Meta):
+        fields = ['id', 'name', 'created_at', 'open_loans', 'overdue_loans']
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from authors.models import Author
+from books.models import Book
+from borrowrecords.models import BorrowRecord
+from core.testing import QueryBudgetMixin
+from .backfill import backfill_borrowers
+from .models import Borrower
+
+
+class BorrowerTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Author Name")
+        self.book = Book.objects.create(title="Test Book", author=author, isbn="1234567890", available_copies=50)
+
+    def borrow(self, name, days_ago=0, kept=None):
+        record = BorrowRecord.objects.create(book=self.book, borrowed_by=name)
+        borrow_date = timezone.localdate() - timedelta(days=days_ago)
+        BorrowRecord.objects.filter(pk=record.pk).update(
+            borrow_date=borrow_date,
+            return_date=None if kept is None else borrow_date + timedelta(days=kept),
+        )
+        return record
+
+    def test_borrowing_links_records_to_one_borrower(self):
+        """
+        Test single and bulk borrows resolve names that differ in case and spacing to one borrower
+        """
+        response = self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Ada Lovelace"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        borrower = Borrower.objects.get()
+        self.assertEqual(response.data["data"]["borrower"], borrower.id)
+
+        items = [{"book": self.book.id, "borrowed_by": name} for name in ("ada  LOVELACE", "Alan Turing", "Alan Turing")]
+        response = self.client.post("/api/borrow/bulk/", {"items": items}, format="json")
+        self.assertEqual(response.data["data"]["borrowed"], 3)
+        self.assertEqual(
+            sorted(Borrower.objects.values_list("name", flat=True)), ["Ada Lovelace", "Alan Turing"]
+        )
+        self.assertEqual(borrower.borrow_records.count(), 2)
+
+    def test_backfill_deduplicates_names_in_batches(self):
+        """
+        Test the backfill links records written without a borrower, one borrower per normalized name
+        """
+        BorrowRecord.objects.bulk_create([
+            BorrowRecord(book=self.book, borrowed_by=name)
+            for name in ("Grace Hopper", "grace hopper", " Grace  Hopper ", "Edsger Dijkstra", "Grace Hopper")
+        ])
+        existing = Borrower.objects.for_name("Edsger Dijkstra")
+
+        batches = []
+        self.assertEqual(backfill_borrowers(batch_size=2, progress=batches.append), 5)
+        self.assertEqual(batches, [2, 4, 5])
+        self.assertEqual(Borrower.objects.count(), 2)
+        self.assertEqual(existing.borrow_records.count(), 1)
+        self.assertFalse(BorrowRecord.objects.filter(borrower__isnull=True).exists())
+        self.assertEqual(backfill_borrowers(), 0)
+
+    def test_borrower_endpoints(self):
+        """
+        Test the lookup, loan counts, open loans and history of a borrower
+        """
+        overdue = self.borrow("Reader", days_ago=20)
+        still_out = self.borrow("Reader", days_ago=3)
+        returned = self.borrow("Reader", days_ago=40, kept=5)
+        self.borrow("Someone Else", days_ago=1)
+        borrower = Borrower.objects.get(name="Reader")
+
+        response = self.client.get("/api/borrowers/", {"name": " reader"})
+        self.assertEqual([row["id"] for row in response.data["results"]], [borrower.id])
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(f"/api/borrowers/{borrower.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["open_loans"], 2)
+        self.assertEqual(response.data["data"]["overdue_loans"], 1)
+
+        response = self.client.get(f"/api/borrowers/{borrower.id}/loans/")
+        self.assertEqual([row["id"] for row in response.data["results"]], [overdue.id, still_out.id])
+
+        response = self.client.get(f"/api/borrowers/{borrower.id}/history/", {"page_size": 2})
+        self.assertEqual([row["id"] for row in response.data["results"]], [still_out.id, overdue.id])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([row["id"] for row in response.data["results"]], [returned.id])
+        self.assertIsNone(response.data["next"])
+
+        response = self.client.get("/api/borrowers/999999/history/")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
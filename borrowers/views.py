@@ -0,0 +1,157 @@
+from datetime import timedelta
+from django.db.models import Count, Q
+from django.utils import timezone
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticated
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
+from borrowrecords.models import BorrowRecord, LOAN_PERIOD_DAYS
+from borrowrecords.serializers import BorrowRecordSerializer
+from core.pagination import KeysetPagination
+from .models import Borrower
+from .serializers import BorrowerSerializer, BorrowerDetailSerializer
+
+PAGE_PARAMETERS = [
+    openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                      description="Opaque cursor taken from the previous page's `next` link"),
+    openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                      description="Number of results per page"),
+]
+
+
+class BorrowerListView(APIView):
+    """
+    List borrowers or look one up by name
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Retrieve a page of borrowers, or the borrower going by `name`",
+        manual_parameters=PAGE_PARAMETERS + [
+            openapi.Parameter('name', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Exact name, ignoring case and spacing"),
+        ],
+        responses={200: BorrowerSerializer(many=True)},
+    )
+    def get(self, request):
+        """
+        Retrieve a page of borrowers, keyset-paginated on ('name', 'id')
+        A `name` lookup goes through the unique index on the normalized name
+        """
+        try:
+            queryset = BorrowerSerializer.setup_eager_loading(Borrower.objects.all())
+            name = request.query_params.get('name')
+            if name is not None:
+                queryset = queryset.filter(name_key=Borrower.normalize(name))
+            paginator = KeysetPagination(ordering=('name', 'id'))
+            borrowers = paginator.paginate_queryset(queryset, request, view=self)
+            serializer = BorrowerSerializer(borrowers, many=True)
+            return paginator.get_paginated_response(serializer.data)
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving borrowers: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BorrowerDetailView(APIView):
+    """
+    Retrieve a borrower with their open and overdue loan counts
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Retrieve a borrower with the number of loans still out and overdue",
+        responses={200: BorrowerDetailSerializer, 404: "Borrower not found"},
+    )
+    def get(self, request, pk):
+        """
+        Retrieve a specific borrower
+        Both counts come from one aggregate over the partial index on open
+        loans, so they cost the same however long the borrower's history is
+        """
+        borrower = BorrowerSerializer.setup_eager_loading(Borrower.objects.filter(pk=pk)).first()
+        if borrower is None:
+            return Response(
+                {"error": "Borrower not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            cutoff = timezone.localdate() - timedelta(days=LOAN_PERIOD_DAYS)
+            counts = BorrowRecord.objects.filter(borrower_id=pk).open().aggregate(
+                open_loans=Count('id'),
+                overdue_loans=Count('id', filter=Q(borrow_date__lt=cutoff)),
+            )
+            borrower.open_loans = counts['open_loans']
+            borrower.overdue_loans = counts['overdue_loans']
+            return Response(
+                {"message": "Borrower retrieved successfully!", "data": BorrowerDetailSerializer(borrower).data}
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving the borrower: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BorrowerLoansView(APIView):
+    """
+    A borrower's loans: the ones still out, or their whole history
+    """
+    permission_classes = [IsAuthenticated]
+    # Loans still out oldest first; history newest first
+    history = False
+
+    @swagger_auto_schema(
+        operation_description="Retrieve a page of a borrower's loans",
+        manual_parameters=PAGE_PARAMETERS + [
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Comma-separated fields to return, e.g. `id,borrow_date,book.title`"),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Embed the `book` object instead of its id"),
+        ],
+        responses={200: BorrowRecordSerializer(many=True), 404: "Borrower not found"},
+    )
+    def get(self, request, pk):
+        """
+        Retrieve a page of the borrower's loans, keyset-paginated on
+        (borrow_date, id) within the borrower, from the borrower's index
+        """
+        if not Borrower.objects.filter(pk=pk).exists():
+            return Response(
+                {"error": "Borrower not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        try:
+            records = BorrowRecord.objects.filter(borrower_id=pk)
+            if self.history:
+                paginator = KeysetPagination(ordering=('-borrow_date', '-id'))
+            else:
+                records = records.open()
+                paginator = KeysetPagination(ordering=('borrow_date', 'id'))
+            fieldset = BorrowRecordSerializer.fieldset(request.query_params, paginator.ordering)
+            page = paginator.paginate_queryset(fieldset.values(records), request, view=self)
+            return paginator.get_paginated_response(fieldset.rows(page))
+        except ValidationError as e:
+            return Response(
+                {"error": "Invalid field selection", "details": e.detail},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving loans: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
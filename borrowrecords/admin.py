@@ -5,4 +5,5 @@ from .models import BorrowRecord
 class BorrowRecordAdmin(admin.ModelAdmin):
     list_display = ('book', 'borrowed_by', 'borrow_date', 'return_date')
     list_filter = ('return_date',)
-    search_fields = ('book__title', 'borrowed_by')
\ No newline at end of file
+    search_fields = ('book__title', 'borrowed_by')
+    ordering = ('-borrow_date', '-id')
\ No newline at end of file
@@ -0,0 +1,90 @@
+import csv
+import json
+import zlib
+
+from django.db import transaction
+
+from .models import BorrowRecord
+
+# Columns fetched per record; book fields come from a join, not a query per row
+EXPORT_COLUMNS = ('id', 'book_id', 'book__title', 'book__isbn', 'borrowed_by', 'borrow_date', 'return_date')
+EXPORT_HEADER = ('id', 'book_id', 'book_title', 'book_isbn', 'borrowed_by', 'borrow_date', 'return_date')
+EXPORT_FORMATS = {
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'csv': ('text/csv', 'csv'),
+}
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# Bytes gathered before a piece is handed to the response or file
+EXPORT_BUFFER_SIZE = 64 * 1024
+
+
+def export_borrow_history(fmt='ndjson', compress=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield the full borrow history as NDJSON or CSV bytes.
+
+    Records are streamed in primary key order from a server-side cursor as
+    plain tuples, with no model instances or serializers, and written out in
+    pieces of about EXPORT_BUFFER_SIZE bytes. Memory use is bounded by the
+    chunk and buffer sizes, whatever the number of records.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'")
+
+    rows = _rows(BorrowRecord.objects.order_by('id').values_list(*EXPORT_COLUMNS), chunk_size)
+    lines = _ndjson_lines(rows) if fmt == 'ndjson' else _csv_lines(rows)
+    pieces = _buffered(lines)
+    return _gzipped(pieces) if compress else pieces
+
+
+def _rows(queryset, chunk_size):
+    # Outside a transaction Django declares the cursor WITH HOLD, and the
+    # database builds the whole result before returning the first row
+    with transaction.atomic(using=queryset.db):
+        yield from queryset.iterator(chunk_size=chunk_size)
+
+
+def _ndjson_lines(rows):
+    for row in rows:
+        record = dict(zip(EXPORT_HEADER, row))
+        yield json.dumps(record, default=str, separators=(',', ':')) + '\n'
+
+
+class _Echo:
+    """
+    File-like object whose write() hands the line back to the csv writer caller.
+    """
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def _buffered(lines):
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= EXPORT_BUFFER_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def _gzipped(pieces):
+    # wbits=31 writes a gzip container incrementally
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for piece in pieces:
+        compressed = compressor.compress(piece)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from borrowrecords import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Partition the borrow history by month (once; the table is locked while its rows are "
+        "copied), then create upcoming partitions and archive old ones as the daily task does."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, help="Months of partitions to create ahead of today")
+        parser.add_argument(
+            '--archive-after', type=int,
+            help="Archive months that ended this many months ago (0 archives nothing)",
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        moved = partitions.partition_table(months_ahead=options['months_ahead'])
+        if moved is not None:
+            self.stdout.write(f"Partitioned the borrow history: {moved} rows in {time.perf_counter() - started:.1f}s")
+        created = partitions.ensure_partitions(months_ahead=options['months_ahead'])
+        archived = partitions.archive_partitions(after_months=options['archive_after'])
+        with connection.cursor() as cursor:
+            months = partitions.partitions(cursor)
+        span = f" ({months[0][1]} to {months[-1][2]})" if months else ""
+        self.stdout.write(
+            f"{len(months)} monthly partitions{span}; created {len(created)}, archived {len(archived)}"
+        )
@@ -1,6 +1,33 @@
-from django.db import models
+from datetime import timedelta
+from django.db import models, transaction
+from django.db.models import Q
 from django.utils import timezone
 from books.models import Book
+from borrowers.models import Borrower
+from core import events
+from reports import counters
+from reports.models import LibraryCounter
+
+# A loan becomes overdue once it has been out for more than this many days
+LOAN_PERIOD_DAYS = 14
+
+class BorrowRecordQuerySet(models.QuerySet):
+    """
+    Loan-status filters that run in SQL instead of per row in Python.
+    """
+    def open(self):
+        """
+        Loans that haven't been returned yet.
+        """
+        return self.filter(return_date__isnull=True)
+
+    def overdue(self, today=None):
+        """
+        Open loans borrowed more than LOAN_PERIOD_DAYS days ago, the SQL form
+        of `BorrowRecord.is_overdue`.
+        """
+        today = today or timezone.localdate()
+        return self.open().filter(borrow_date__lt=today - timedelta(days=LOAN_PERIOD_DAYS))
 
 class BorrowRecord(models.Model):
     """
@@ -16,6 +43,16 @@ class BorrowRecord(models.Model):
         max_length=255, 
         help_text="Name of the person who borrowed the book"
     )
+    borrower = models.ForeignKey(
+        Borrower,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='borrow_records',
+        # Covered by the composite indexes below
+        db_index=False,
+        help_text="Borrower behind borrowed_by; filled in on save, or by backfill_borrowers for older records"
+    )
     borrow_date = models.DateField(
         auto_now_add=True, 
         help_text="Date when the book was borrowed"
@@ -26,6 +63,8 @@ class BorrowRecord(models.Model):
         help_text="Date when the book was returned (optional)"
     )
 
+    objects = BorrowRecordQuerySet.as_manager()
+
     def __str__(self):
         """
         String representation of the BorrowRecord model.
@@ -33,15 +72,38 @@ class BorrowRecord(models.Model):
         status = "Returned" if self.return_date else "Not Returned"
         return f"{self.book.title} borrowed by {self.borrowed_by} - {status}"
 
+    def save(self, *args, **kwargs):
+        """
+        Link the record to its borrower, by name, before saving it.
+        """
+        if self.borrower_id is None and self.borrowed_by:
+            self.borrower = Borrower.objects.for_name(self.borrowed_by)
+        super().save(*args, **kwargs)
+
     def mark_as_returned(self):
         """
         Mark the book as returned and update book's available copies.
+        Returns False if the record had already been returned, including by a
+        concurrent request.
         """
-        if not self.return_date:
-            self.return_date = timezone.now()
-            self.save()
-            # Increase available copies of the book
-            self.book.increase_available_copies()
+        if self.return_date:
+            return False
+        return_date = timezone.localdate()
+        with transaction.atomic():
+            # Only the request that flips return_date from NULL gives the copy back;
+            # borrow_date confines the update to one month of a partitioned table
+            returned = BorrowRecord.objects.filter(
+                pk=self.pk, borrow_date=self.borrow_date, return_date__isnull=True
+            ).update(return_date=return_date)
+            if not returned:
+                return False
+            books = Book.objects.filter(pk=self.book_id)
+            books.put_back_copies()
+            counters.increment(LibraryCounter.OPEN_LOANS, -1)
+            version = books.values_list('updated_at', flat=True).first()
+            events.publish('book', [self.book_id], fields=['available_copies'], version=version)
+        self.return_date = return_date
+        return True
 
     @property
     def is_overdue(self):
@@ -49,11 +111,33 @@ class BorrowRecord(models.Model):
         Check if the book is overdue (not returned within 14 days).
         """
         if not self.return_date:
-            days_borrowed = (timezone.now().date() - self.borrow_date).days
-            return days_borrowed > 14
+            days_borrowed = (timezone.localdate() - self.borrow_date).days
+            return days_borrowed > LOAN_PERIOD_DAYS
         return False
 
     class Meta:
         verbose_name = "Borrow Record"
         verbose_name_plural = "Borrow Records"
-        ordering = ['-borrow_date']
\ No newline at end of file
+        # No default ordering: it would sort every query over the whole
+        # history; lists order explicitly on an indexed key
+        indexes = [
+            # Only open loans are indexed: the index stays the size of the
+            # current circulation however much history accumulates, and backs
+            # open()/overdue() and keyset pagination on (borrow_date, id)
+            models.Index(
+                fields=['borrow_date', 'id'],
+                name='borrow_open_date_idx',
+                condition=Q(return_date__isnull=True),
+            ),
+            # A borrower's history newest first, and keyset pagination over it
+            models.Index(fields=['borrower', 'borrow_date', 'id'], name='borrow_borrower_date_idx'),
+            # A borrower's open and overdue loans, as small as borrow_open_date_idx
+            models.Index(
+                fields=['borrower', 'borrow_date'],
+                name='borrow_borrower_open_idx',
+                condition=Q(return_date__isnull=True),
+            ),
+            # Let the daily circulation rollup recount single days
+            models.Index(fields=['borrow_date'], name='borrow_date_idx'),
+            models.Index(fields=['return_date'], name='borrow_return_date_idx'),
+        ]
\ No newline at end of file
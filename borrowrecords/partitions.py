@@ -0,0 +1,239 @@
+"""
+Monthly range partitioning of the borrow history by ``borrow_date``.
+
+``partition_table`` turns the plain table that syncdb creates into a
+PostgreSQL partitioned table with one partition per month and a default
+partition for anything outside them. Queries that bound ``borrow_date`` scan
+only the months in range, and each month's indexes stay small.
+
+``maintain`` keeps it that way, run daily by Celery beat:
+
+- ``ensure_partitions`` creates the months ahead of today before loans land
+  in them, and splits rows that reached the default partition (backdated
+  imports) out into their own month;
+- ``archive_partitions`` detaches months older than
+  BORROW_ARCHIVE_AFTER_MONTHS and moves them to the BORROW_ARCHIVE_SCHEMA
+  schema, where they can be dumped or dropped. A month with a loan still out
+  stays attached. The month's loans and returns per book and day are first
+  added to reports' ArchivedCirculation, so the circulation rollup keeps
+  them when it is rebuilt.
+
+PostgreSQL requires the primary key of a partitioned table to include the
+partition key, so the table's key becomes (id, borrow_date). Django still
+treats ``id`` as the primary key; ids stay unique because they come from one
+sequence.
+"""
+import logging
+import re
+from datetime import date
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from reports import rollups
+from .models import BorrowRecord
+
+logger = logging.getLogger(__name__)
+
+BOUNDS = re.compile(r"FROM \('([\d-]+)'\) TO \('([\d-]+)'\)")
+
+
+def table_name():
+    return BorrowRecord._meta.db_table
+
+
+def partition_name(month):
+    return f'{table_name()}_y{month.year}m{month.month:02d}'
+
+
+def month_start(day):
+    return day.replace(day=1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def is_partitioned(cursor):
+    cursor.execute(
+        'SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass)', [table_name()]
+    )
+    return cursor.fetchone()[0]
+
+
+def partitions(cursor):
+    """
+    The month partitions as (name, first day, first day of the next month), oldest first.
+    """
+    cursor.execute(
+        '''
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = %s::regclass
+        ''',
+        [table_name()],
+    )
+    months = []
+    for name, bound in cursor.fetchall():
+        match = BOUNDS.search(bound)
+        if match:
+            months.append((name, date.fromisoformat(match[1]), date.fromisoformat(match[2])))
+    return sorted(months, key=lambda partition: partition[1])
+
+
+def partition_table(months_ahead=None, today=None):
+    """
+    Convert the borrow table into a partitioned one, keeping its rows, ids,
+    indexes and foreign keys. Returns the number of rows moved, or None when
+    the table is already partitioned.
+
+    Runs in one transaction holding an exclusive lock on the table, so the
+    app waits for the copy rather than seeing a half-converted table.
+    """
+    table = table_name()
+    months_ahead = settings.BORROW_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    today = today or timezone.localdate()
+    with transaction.atomic(), connection.cursor() as cursor:
+        if is_partitioned(cursor):
+            return None
+        cursor.execute(f'LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE')
+        # Deferred foreign key checks still pending in the caller's transaction would block the DROP
+        cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        cursor.execute(
+            'SELECT pg_get_indexdef(indexrelid) FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary',
+            [table],
+        )
+        indexes = [row[0] for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'",
+            [table],
+        )
+        foreign_keys = cursor.fetchall()
+        cursor.execute(f'SELECT MIN(borrow_date) FROM {table}')
+        first_month = month_start(cursor.fetchone()[0] or today)
+
+        # LIKE leaves out the identity, which partitioned tables can't have
+        # before PostgreSQL 17; a sequence takes its place below
+        staging = f'{table}_partitioned'
+        cursor.execute(f'CREATE TABLE {staging} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (borrow_date)')
+        month = first_month
+        while month <= add_months(month_start(today), months_ahead):
+            cursor.execute(
+                f'CREATE TABLE {partition_name(month)} PARTITION OF {staging} FOR VALUES FROM (%s) TO (%s)',
+                [month, add_months(month, 1)],
+            )
+            month = add_months(month, 1)
+        cursor.execute(f'CREATE TABLE {table}_default PARTITION OF {staging} DEFAULT')
+        cursor.execute(f'INSERT INTO {staging} SELECT * FROM {table}')
+        moved = cursor.rowcount
+
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {staging} RENAME TO {table}')
+        cursor.execute(f'ALTER TABLE {table} ADD PRIMARY KEY (id, borrow_date)')
+        for index in indexes:
+            cursor.execute(index)
+        for name, definition in foreign_keys:
+            cursor.execute(f'ALTER TABLE {table} ADD CONSTRAINT {name} {definition}')
+        cursor.execute(f'CREATE SEQUENCE {table}_id_seq OWNED BY {table}.id')
+        cursor.execute(f"SELECT setval('{table}_id_seq', COALESCE(MAX(id), 0) + 1, false) FROM {table}")
+        cursor.execute(f"ALTER TABLE {table} ALTER COLUMN id SET DEFAULT nextval('{table}_id_seq')")
+        cursor.execute(f'ANALYZE {table}')
+    logger.info("Partitioned %s by month: %d rows moved", table, moved)
+    return moved
+
+
+def ensure_partitions(months_ahead=None, today=None):
+    """
+    Create the partitions of this month and the next ``months_ahead``, and
+    of every month with rows in the default partition. Returns the names created.
+    """
+    table = table_name()
+    months_ahead = settings.BORROW_PARTITIONS_AHEAD if months_ahead is None else months_ahead
+    today = today or timezone.localdate()
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return created
+        existing = {low for _, low, _ in partitions(cursor)}
+        cursor.execute(f"SELECT DISTINCT date_trunc('month', borrow_date)::date FROM {table}_default")
+        months = {row[0] for row in cursor.fetchall()}
+        months.update(add_months(month_start(today), offset) for offset in range(months_ahead + 1))
+        for month in sorted(months - existing):
+            name, high = partition_name(month), add_months(month, 1)
+            # Built outside the table and attached, after taking the month's
+            # rows out of the default partition, which would block the attach
+            cursor.execute(f'CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)')
+            cursor.execute(
+                f'''
+                WITH moved AS (
+                    DELETE FROM {table}_default WHERE borrow_date >= %s AND borrow_date < %s RETURNING *
+                )
+                INSERT INTO {name} SELECT * FROM moved
+                ''',
+                [month, high],
+            )
+            cursor.execute(
+                f'ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', [month, high]
+            )
+            created.append(name)
+    if created:
+        logger.info("Created borrow record partitions: %s", ', '.join(created))
+    return created
+
+
+def archive_partitions(after_months=None, today=None):
+    """
+    Detach the months that ended more than ``after_months`` months before
+    this one and move them to the archive schema. Returns the names archived.
+    """
+    table = table_name()
+    after_months = settings.BORROW_ARCHIVE_AFTER_MONTHS if after_months is None else after_months
+    if not after_months:
+        return []
+    cutoff = add_months(month_start(today or timezone.localdate()), -after_months)
+    schema = settings.BORROW_ARCHIVE_SCHEMA
+    archived = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if not is_partitioned(cursor):
+            return archived
+        for name, _, high in partitions(cursor):
+            if high > cutoff:
+                break
+            # Holds off returns until the partition is gone
+            cursor.execute(f'LOCK TABLE {name} IN SHARE MODE')
+            cursor.execute(f'SELECT EXISTS (SELECT 1 FROM {name} WHERE return_date IS NULL)')
+            if cursor.fetchone()[0]:
+                logger.warning("Not archiving %s: it has loans that are still out", name)
+                continue
+            rollups.archive_counts(cursor, name)
+            cursor.execute(f'ALTER TABLE {table} DETACH PARTITION {name}')
+            # Archived loans mustn't stop their books from being deleted
+            cursor.execute(
+                "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f'", [name]
+            )
+            for (constraint,) in cursor.fetchall():
+                cursor.execute(f'ALTER TABLE {name} DROP CONSTRAINT {constraint}')
+            cursor.execute(f'CREATE SCHEMA IF NOT EXISTS {schema}')
+            cursor.execute('SELECT to_regclass(%s)', [f'{schema}.{name}'])
+            if cursor.fetchone()[0]:
+                # The month was archived before and backdated rows recreated it
+                cursor.execute(f'INSERT INTO {schema}.{name} SELECT * FROM {name}')
+                cursor.execute(f'DROP TABLE {name}')
+            else:
+                cursor.execute(f'ALTER TABLE {name} SET SCHEMA {schema}')
+            archived.append(name)
+    if archived:
+        logger.info("Archived borrow record partitions to %s: %s", schema, ', '.join(archived))
+    return archived
+
+
+def maintain(today=None):
+    """
+    Create upcoming partitions and archive old ones; a no-op until the table is partitioned.
+    """
+    return {
+        'created': ensure_partitions(today=today),
+        'archived': archive_partitions(today=today),
+    }
@@ -1,15 +1,36 @@
+from collections import Counter
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
+from core.serializers import ValuesSerializerMixin
 from .models import BorrowRecord
 from books.models import Book
+from books.serializers import BookSerializer
+from borrowers.models import Borrower
+from core import events
+from reports import counters
+from reports.models import LibraryCounter
 
-class BorrowRecordSerializer(serializers.ModelSerializer):
+# Upper bound on items in one bulk borrow/return request
+MAX_BULK_ITEMS = 500
+
+class BorrowRecordSerializer(ValuesSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for BorrowRecord model to handle borrowing and returning books
     """
+    expandable_fields = {'book': BookSerializer}
+
     class Meta:
         model = BorrowRecord
-        fields = ['id', 'book', 'borrowed_by', 'borrow_date', 'return_date']
-        read_only_fields = ['id', 'borrow_date', 'return_date']
+        fields = ['id', 'book', 'borrowed_by', 'borrower', 'borrow_date', 'return_date']
+        read_only_fields = ['id', 'borrower', 'borrow_date', 'return_date']
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """
+        Load only the columns this serializer renders
+        """
+        return queryset.only('id', 'book', 'borrowed_by', 'borrower', 'borrow_date', 'return_date')
 
     def validate_book(self, value):
         """
@@ -21,8 +42,139 @@ class BorrowRecordSerializer(serializers.ModelSerializer):
 
     def create(self, validated_data):
         """
-        Custom create method to reduce available copies
+        Custom create method to reduce available copies.
+        The copy is taken and the record inserted in one transaction, so a
+        failed insert never leaks a copy. Raises ValueError if no copy is left.
         """
         book = validated_data['book']
-        book.reduce_available_copies()
-        return BorrowRecord.objects.create(**validated_data)
\ No newline at end of file
+        with transaction.atomic():
+            book.reduce_available_copies()
+            borrow_record = BorrowRecord.objects.create(**validated_data)
+            counters.increment(LibraryCounter.OPEN_LOANS)
+        return borrow_record
+
+class BulkBorrowItemSerializer(serializers.Serializer):
+    """
+    One item of a bulk borrow request. Books are resolved in bulk, not per item.
+    """
+    book = serializers.IntegerField(min_value=1)
+    borrowed_by = serializers.CharField(max_length=255)
+
+
+class BulkBorrowSerializer(serializers.Serializer):
+    """
+    Borrow a cart of books in one transaction.
+
+    Items are validated one by one, so a bad item fails alone. The distinct
+    books are locked with a single SELECT ... FOR UPDATE and copies are handed
+    out in request order. Each distinct book then gets one aggregated
+    copy-count UPDATE, and all records go in with one bulk_create.
+    """
+    items = serializers.ListField(
+        child=serializers.DictField(), min_length=1, max_length=MAX_BULK_ITEMS
+    )
+
+    def create(self, validated_data):
+        results = []
+        wanted = []
+        for index, item in enumerate(validated_data['items']):
+            item_serializer = BulkBorrowItemSerializer(data=item)
+            if item_serializer.is_valid():
+                wanted.append((index, item_serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({"index": index, "status": "failed", "errors": item_serializer.errors})
+
+        with transaction.atomic():
+            book_ids = sorted({item['book'] for _, item in wanted})
+            available = dict(
+                Book.objects.select_for_update()
+                .filter(pk__in=book_ids)
+                .order_by('pk')
+                .values_list('pk', 'available_copies')
+            )
+
+            granted = Counter()
+            records = []
+            for index, item in wanted:
+                book_id = item['book']
+                if book_id not in available:
+                    results[index] = {"index": index, "book": book_id, "status": "failed", "error": "Book not found"}
+                elif available[book_id] - granted[book_id] <= 0:
+                    results[index] = {
+                        "index": index, "book": book_id, "status": "failed",
+                        "error": "No copies of this book are currently available",
+                    }
+                else:
+                    granted[book_id] += 1
+                    records.append((index, BorrowRecord(book_id=book_id, borrowed_by=item['borrowed_by'])))
+
+            for book_id, count in granted.items():
+                if not Book.objects.filter(pk=book_id).take_copies(count):
+                    raise ValueError("No copies available for borrowing")
+            events.publish('book', granted, fields=['available_copies'])
+
+            # bulk_create skips save(), so the cart's borrowers are resolved together
+            borrower_ids = Borrower.objects.resolve({record.borrowed_by for _, record in records})
+            for _, record in records:
+                record.borrower_id = borrower_ids[record.borrowed_by]
+            BorrowRecord.objects.bulk_create([record for _, record in records])
+            counters.increment(LibraryCounter.OPEN_LOANS, len(records))
+
+        for index, record in records:
+            results[index] = {
+                "index": index, "book": record.book_id, "status": "borrowed",
+                "id": record.pk, "borrow_date": record.borrow_date,
+            }
+        return results
+
+
+class BulkReturnSerializer(serializers.Serializer):
+    """
+    Return a cart of borrow records in one transaction.
+
+    The records are locked with one SELECT ... FOR UPDATE and closed with one
+    bulk_update. Each distinct book then gets one aggregated copy-count UPDATE.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1, max_length=MAX_BULK_ITEMS
+    )
+
+    def create(self, validated_data):
+        ids = validated_data['ids']
+        return_date = timezone.localdate()
+
+        with transaction.atomic():
+            records = {
+                record.pk: record
+                for record in BorrowRecord.objects.select_for_update()
+                .filter(pk__in=set(ids))
+                .order_by('pk')
+                .only('id', 'book', 'return_date')
+            }
+
+            results = []
+            returned = []
+            copies = Counter()
+            for index, pk in enumerate(ids):
+                record = records.get(pk)
+                if record is None:
+                    results.append({"index": index, "id": pk, "status": "failed", "error": "Borrow record not found"})
+                elif record.return_date:
+                    results.append({
+                        "index": index, "id": pk, "status": "failed",
+                        "error": "This book has already been returned",
+                    })
+                else:
+                    record.return_date = return_date
+                    returned.append(record)
+                    copies[record.book_id] += 1
+                    results.append({"index": index, "id": pk, "status": "returned", "return_date": return_date})
+
+            BorrowRecord.objects.bulk_update(returned, ['return_date'])
+            for book_id, count in copies.items():
+                Book.objects.filter(pk=book_id).put_back_copies(count)
+            events.publish('book', copies, fields=['available_copies'])
+            counters.increment(LibraryCounter.OPEN_LOANS, -len(returned))
+
+        return results
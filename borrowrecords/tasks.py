@@ -0,0 +1,47 @@
+import os
+from datetime import datetime
+from celery import shared_task
+from django.conf import settings
+from . import partitions
+from .exports import EXPORT_FORMATS, export_borrow_history
+import logging
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def export_borrow_history_file(fmt='ndjson', compress=True):
+    """
+    Write the full borrow history to REPORTS_DIR as NDJSON or CSV, optionally gzipped
+    The file is streamed to disk piece by piece and renamed into place when complete
+    """
+    reports_dir = os.path.abspath(settings.REPORTS_DIR)
+    os.makedirs(reports_dir, exist_ok=True)
+
+    _, extension = EXPORT_FORMATS[fmt]
+    filename = f'borrow_history_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+    if compress:
+        filename += '.gz'
+    filepath = os.path.join(reports_dir, filename)
+    partial_path = filepath + '.part'
+
+    try:
+        with open(partial_path, 'wb') as f:
+            for piece in export_borrow_history(fmt, compress=compress):
+                f.write(piece)
+        os.replace(partial_path, filepath)
+    except Exception:
+        logger.exception("Borrow history export failed")
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    logger.info("Borrow history exported to %s", filepath)
+    return filepath
+
+
+@shared_task
+def maintain_borrow_partitions():
+    """
+    Create the coming months' borrow record partitions and archive the oldest ones
+    """
+    return partitions.maintain()
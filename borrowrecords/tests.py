@@ -1,7 +1,26 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import tempfile
+import threading
+from unittest import mock
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
-from .models import BorrowRecord, Book, User
+from authors.models import Author
+from books.models import Book
+from core.testing import QueryBudgetMixin
+from reports.models import ArchivedCirculation, DailyCirculation
+from reports.rollups import refresh_daily_circulation
+from . import partitions
+from .exports import export_borrow_history
+from .models import BorrowRecord
+from .tasks import export_borrow_history_file
 
 class BorrowRecordAPITestCase(TestCase):
     def setUp(self):
@@ -12,16 +31,17 @@ class BorrowRecordAPITestCase(TestCase):
         self.client.force_authenticate(user=self.user)
 
         # Create a test book
+        self.author = Author.objects.create(name="Author Name")
         self.book = Book.objects.create(
             title="Test Book",
-            author="Author Name",
-            total_copies=5,
+            author=self.author,
+            isbn="1234567890",
             available_copies=5
         )
 
         # Create a borrow record
         self.borrow_record = BorrowRecord.objects.create(
-            user=self.user,
+            borrowed_by=self.user.username,
             book=self.book
         )
 
@@ -29,8 +49,8 @@ class BorrowRecordAPITestCase(TestCase):
         """
         Test creating a new borrow record
         """
-        data = {"book": self.book.id}
-        response = self.client.post("/api/borrow-records/", data)
+        data = {"book": self.book.id, "borrowed_by": "Reader"}
+        response = self.client.post("/api/borrow/", data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertIn("Borrow record created successfully!", str(response.data))
 
@@ -38,7 +58,7 @@ class BorrowRecordAPITestCase(TestCase):
         """
         Test returning a borrowed book
         """
-        response = self.client.put(f"/api/borrow-records/{self.borrow_record.id}/return/")
+        response = self.client.put(f"/api/borrow/{self.borrow_record.id}/return/")
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn("Book returned successfully!", str(response.data))
 
@@ -47,6 +67,385 @@ class BorrowRecordAPITestCase(TestCase):
         Test returning a book that has already been returned
         """
         self.borrow_record.mark_as_returned()  # Manually mark as returned
-        response = self.client.put(f"/api/borrow-records/{self.borrow_record.id}/return/")
+        response = self.client.put(f"/api/borrow/{self.borrow_record.id}/return/")
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("This book has already been returned", str(response.data))
+
+
+class BorrowReturnAtomicityTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Author Name")
+        self.book = Book.objects.create(
+            title="Test Book", author=self.author, isbn="1234567890", available_copies=1
+        )
+
+    def test_borrow_takes_one_copy(self):
+        """
+        Test borrowing decrements the copy count exactly once
+        """
+        response = self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+
+    def test_borrow_refused_when_no_copies_left(self):
+        """
+        Test the conditional update refuses to take a copy that isn't there
+        """
+        Book.objects.filter(pk=self.book.pk).update(available_copies=0)
+        with self.assertRaises(ValueError):
+            self.book.reduce_available_copies()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 0)
+        self.assertFalse(BorrowRecord.objects.exists())
+
+    def test_return_gives_copy_back_once(self):
+        """
+        Test a stale second return doesn't add a phantom copy
+        """
+        record = BorrowRecord.objects.create(book=self.book, borrowed_by="Reader")
+        stale = BorrowRecord.objects.get(pk=record.pk)
+        self.assertTrue(record.mark_as_returned())
+        self.assertFalse(stale.mark_as_returned())
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.available_copies, 2)
+
+
+class ExportCursorTestCase(TransactionTestCase):
+    def test_export_reads_from_a_cursor_without_hold(self):
+        """
+        Test the export streams from a transaction's cursor, not a WITH HOLD one built up front
+        """
+        if connection.vendor != "postgresql":
+            self.skipTest("Needs PostgreSQL server-side cursors")
+        author = Author.objects.create(name="Author Name")
+        book = Book.objects.create(title="Test Book", author=author, isbn="1234567890", available_copies=5)
+        BorrowRecord.objects.bulk_create([BorrowRecord(book=book, borrowed_by=f"Reader {i}") for i in range(5)])
+
+        with mock.patch("borrowrecords.exports.EXPORT_BUFFER_SIZE", 1):
+            pieces = export_borrow_history("csv", chunk_size=2)
+            next(pieces)
+            next(pieces)
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT is_holdable FROM pg_cursors WHERE name LIKE '_django_curs_%%'")
+                self.assertEqual(cursor.fetchall(), [(False,)])
+            self.assertTrue(connection.in_atomic_block)
+            self.assertEqual(len(list(pieces)), 4)
+        self.assertFalse(connection.in_atomic_block)
+
+
+class ConcurrentBorrowTestCase(TransactionTestCase):
+    def test_concurrent_borrowers_never_oversell(self):
+        """
+        Test concurrent checkouts of the last copies never take the count below zero
+        """
+        if connection.vendor != "postgresql":
+            self.skipTest("Needs a database that supports concurrent connections")
+
+        author = Author.objects.create(name="Author Name")
+        book = Book.objects.create(title="Hot Book", author=author, isbn="1234567890", available_copies=3)
+        outcomes = []
+
+        def borrow(index):
+            try:
+                with transaction.atomic():
+                    Book.objects.get(pk=book.pk).reduce_available_copies()
+                    BorrowRecord.objects.create(book=book, borrowed_by=f"Reader {index}")
+                outcomes.append(True)
+            except ValueError:
+                outcomes.append(False)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=borrow, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        self.assertEqual(outcomes.count(True), 3)
+        self.assertEqual(book.available_copies, 0)
+        self.assertEqual(BorrowRecord.objects.filter(book=book).count(), 3)
+
+
+class BulkBorrowReturnTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Author Name")
+        self.scarce = Book.objects.create(title="Scarce", author=self.author, isbn="1111111111", available_copies=1)
+        self.plenty = Book.objects.create(title="Plenty", author=self.author, isbn="2222222222", available_copies=50)
+
+    def test_bulk_borrow_reports_each_item(self):
+        """
+        Test a cart is borrowed in one request with a result per item
+        """
+        items = [{"book": self.plenty.id, "borrowed_by": f"Reader {i}"} for i in range(40)]
+        items += [
+            {"book": self.scarce.id, "borrowed_by": "First"},
+            {"book": self.scarce.id, "borrowed_by": "Second"},
+            {"book": 999999, "borrowed_by": "Nobody"},
+            {"book": self.plenty.id},
+        ]
+        # Includes one statement resolving the cart's borrowers
+        with self.assertMaxQueries(9):
+            response = self.client.post("/api/borrow/bulk/", {"items": items}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["data"]["results"]
+        self.assertEqual(response.data["data"]["borrowed"], 41)
+        self.assertEqual(results[40]["status"], "borrowed")
+        self.assertIn("No copies", results[41]["error"])
+        self.assertEqual(results[42]["error"], "Book not found")
+        self.assertIn("borrowed_by", results[43]["errors"])
+
+        self.scarce.refresh_from_db()
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.scarce.available_copies, 0)
+        self.assertEqual(self.plenty.available_copies, 10)
+        self.assertEqual(BorrowRecord.objects.count(), 41)
+
+    def test_bulk_return_reports_each_item(self):
+        """
+        Test a cart is returned in one request and copies are given back once
+        """
+        records = BorrowRecord.objects.bulk_create(
+            [BorrowRecord(book=self.plenty, borrowed_by=f"Reader {i}") for i in range(30)]
+        )
+        Book.objects.filter(pk=self.plenty.pk).update(available_copies=20)
+        ids = [record.id for record in records] + [records[0].id, 999999]
+
+        with self.assertMaxQueries(8):
+            response = self.client.put("/api/borrow/bulk/return/", {"ids": ids}, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["returned"], 30)
+        results = response.data["data"]["results"]
+        self.assertIn("already been returned", results[30]["error"])
+        self.assertEqual(results[31]["error"], "Borrow record not found")
+        self.plenty.refresh_from_db()
+        self.assertEqual(self.plenty.available_copies, 50)
+
+    def test_bulk_borrow_rejects_oversized_cart(self):
+        """
+        Test the item limit is enforced
+        """
+        items = [{"book": self.plenty.id, "borrowed_by": "Reader"}] * 501
+        response = self.client.post("/api/borrow/bulk/", {"items": items}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class OverdueBorrowRecordTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Author Name")
+        book = Book.objects.create(title="Test Book", author=author, isbn="1234567890", available_copies=5)
+        today = timezone.localdate()
+        self.records = {}
+        for label, days_ago, returned in [
+            ("recent", 3, False),
+            ("due_today", 14, False),
+            ("overdue", 15, False),
+            ("very_overdue", 40, False),
+            ("returned_late", 40, True),
+        ]:
+            record = BorrowRecord.objects.create(book=book, borrowed_by=label)
+            BorrowRecord.objects.filter(pk=record.pk).update(
+                borrow_date=today - timedelta(days=days_ago),
+                return_date=today if returned else None,
+            )
+            record.refresh_from_db()
+            self.records[label] = record
+
+    def test_overdue_queryset_matches_is_overdue(self):
+        """
+        Test the SQL overdue filter agrees with the per-row property
+        """
+        in_sql = set(BorrowRecord.objects.overdue().values_list("borrowed_by", flat=True))
+        in_python = {record.borrowed_by for record in self.records.values() if record.is_overdue}
+        self.assertEqual(in_sql, {"overdue", "very_overdue"})
+        self.assertEqual(in_sql, in_python)
+
+    def test_overdue_endpoint_lists_oldest_first(self):
+        """
+        Test the overdue listing pages through overdue loans only, oldest first
+        """
+        response = self.client.get("/api/borrow/overdue/?page_size=1")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"][0]["borrowed_by"], "very_overdue")
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"][0]["borrowed_by"], "overdue")
+        self.assertIsNone(response.data["next"])
+
+    def test_overdue_endpoint_expands_the_book(self):
+        """
+        Test ?expand=book embeds each loan's book, narrowed by ?fields=, in the paginated listing
+        """
+        book = self.records["overdue"].book
+        response = self.client.get(
+            "/api/borrow/overdue/", {"page_size": 1, "fields": "id,book.title,book.available_copies", "expand": "book"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["results"],
+            [{"id": self.records["very_overdue"].id, "book": {"title": book.title, "available_copies": 5}}],
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(response.data["results"][0]["id"], self.records["overdue"].id)
+
+        response = self.client.get("/api/borrow/overdue/", {"expand": "borrower"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BorrowHistoryExportTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="auditor", password="password123")
+        self.client.force_authenticate(user=self.user)
+        author = Author.objects.create(name="Author Name")
+        book = Book.objects.create(title="Test, Book", author=author, isbn="1234567890", available_copies=5)
+        BorrowRecord.objects.bulk_create(
+            [BorrowRecord(book=book, borrowed_by=f"Reader {i}") for i in range(25)]
+        )
+
+    def test_csv_export_streams_every_record(self):
+        """
+        Test the CSV export has a header and one row per record
+        """
+        response = self.client.get("/api/borrow/export/?type=csv")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode("utf-8"))))
+        self.assertEqual(rows[0][:3], ["id", "book_id", "book_title"])
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][2], "Test, Book")
+
+    def test_gzipped_ndjson_export(self):
+        """
+        Test the gzipped NDJSON export decompresses to one JSON object per record
+        """
+        response = self.client.get("/api/borrow/export/?gzip=1")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        lines = gzip.decompress(b"".join(response.streaming_content)).decode("utf-8").splitlines()
+        self.assertEqual(len(lines), 25)
+        self.assertEqual(json.loads(lines[0])["borrowed_by"], "Reader 0")
+
+    def test_export_task_writes_file(self):
+        """
+        Test the Celery task writes the export into the reports directory
+        """
+        with tempfile.TemporaryDirectory() as reports_dir, override_settings(REPORTS_DIR=reports_dir):
+            filepath = export_borrow_history_file("csv", compress=False)
+            with open(filepath) as f:
+                self.assertEqual(len(f.readlines()), 26)
+
+
+class BorrowRecordPartitioningTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="testuser", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.author = Author.objects.create(name="Author Name")
+        self.book = Book.objects.create(title="Test Book", author=self.author, isbn="1234567890", available_copies=5)
+        self.today = timezone.localdate()
+        self.this_month = partitions.month_start(self.today)
+        # Returned loans from five months ago and an open one from two months ago
+        self.old = [self.borrow(partitions.add_months(self.this_month, -5)) for _ in range(2)]
+        self.open = self.borrow(partitions.add_months(self.this_month, -2), returned=False)
+
+    def borrow(self, borrow_date, returned=True):
+        record = BorrowRecord.objects.create(book=self.book, borrowed_by="Reader")
+        BorrowRecord.objects.filter(pk=record.pk).update(
+            borrow_date=borrow_date, return_date=borrow_date + timedelta(days=3) if returned else None,
+        )
+        return record.pk
+
+    def partition_of(self, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT tableoid::regclass::text FROM {partitions.table_name()} WHERE id = %s", [pk]
+            )
+            row = cursor.fetchone()
+        return row and row[0]
+
+    def test_partitioning_keeps_rows_and_routes_new_loans(self):
+        """
+        Test converting the table keeps every row and id, and new loans land in this month's partition
+        """
+        self.assertEqual(partitions.partition_table(months_ahead=1), 3)
+        self.assertIsNone(partitions.partition_table())
+        self.assertEqual(
+            self.partition_of(self.open), partitions.partition_name(partitions.add_months(self.this_month, -2))
+        )
+
+        response = self.client.post("/api/borrow/", {"book": self.book.id, "borrowed_by": "Reader"})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        new_id = response.data["data"]["id"]
+        self.assertGreater(new_id, self.open)
+        self.assertEqual(self.partition_of(new_id), partitions.partition_name(self.this_month))
+
+        response = self.client.put(f"/api/borrow/{self.open}/return/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(BorrowRecord.objects.get(pk=self.open).return_date, self.today)
+
+    def test_backdated_rows_get_their_own_partition(self):
+        """
+        Test rows older than the first partition go to the default one until maintenance splits them out
+        """
+        partitions.partition_table(months_ahead=1)
+        year_ago = partitions.add_months(self.this_month, -12)
+        pk = self.borrow(year_ago)
+        self.assertEqual(self.partition_of(pk), f"{partitions.table_name()}_default")
+
+        created = partitions.ensure_partitions(months_ahead=2)
+        self.assertEqual(
+            created,
+            [partitions.partition_name(year_ago), partitions.partition_name(partitions.add_months(self.this_month, 2))],
+        )
+        self.assertEqual(self.partition_of(pk), partitions.partition_name(year_ago))
+        self.assertEqual(BorrowRecord.objects.count(), 4)
+
+    def test_archive_skips_months_with_open_loans(self):
+        """
+        Test old months are detached to the archive schema unless a loan is still out
+        """
+        partitions.partition_table(months_ahead=1)
+        with override_settings(BORROW_ARCHIVE_SCHEMA="test_borrow_archive"):
+            archived = partitions.archive_partitions(after_months=1)
+        # Five months ago and the two empty months after it; two months ago has the open loan
+        self.assertEqual(
+            archived,
+            [partitions.partition_name(partitions.add_months(self.this_month, offset)) for offset in (-5, -4, -3)],
+        )
+        self.assertEqual(list(BorrowRecord.objects.values_list("pk", flat=True)), [self.open])
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM test_borrow_archive.{archived[0]}")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+        # The archived loans no longer hold on to their book
+        self.book.delete()
+        self.assertFalse(BorrowRecord.objects.exists())
+
+    def test_rollup_rebuild_keeps_archived_history(self):
+        """
+        Test a full rollup rebuild after archiving still counts the archived loans and returns
+        """
+        partitions.partition_table(months_ahead=1)
+        refresh_daily_circulation(full=True)
+        before = list(DailyCirculation.objects.order_by("day").values_list("day", "book_id", "loans", "returns"))
+        with override_settings(BORROW_ARCHIVE_SCHEMA="test_borrow_archive"):
+            self.assertEqual(len(partitions.archive_partitions(after_months=1)), 3)
+        self.assertEqual(BorrowRecord.objects.count(), 1)
+
+        refresh_daily_circulation(full=True)
+        after = list(DailyCirculation.objects.order_by("day").values_list("day", "book_id", "loans", "returns"))
+        self.assertEqual(after, before)
+        self.assertEqual(sum(row.loans for row in ArchivedCirculation.objects.all()), 2)
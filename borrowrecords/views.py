@@ -1,12 +1,17 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
 from django.db import IntegrityError
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from .exports import EXPORT_FORMATS, export_borrow_history
 from .models import BorrowRecord
-from .serializers import BorrowRecordSerializer
+from .serializers import BorrowRecordSerializer, BulkBorrowSerializer, BulkReturnSerializer
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
+from core.pagination import KeysetPagination
 
 
 class BorrowRecordCreateView(APIView):
@@ -34,16 +39,8 @@ class BorrowRecordCreateView(APIView):
         serializer = BorrowRecordSerializer(data=request.data)
         try:
             if serializer.is_valid():
-                borrow_record = serializer.save()
-                # Check if the book is available
-                if not borrow_record.book.is_available():
-                    borrow_record.delete()
-                    return Response(
-                        {"error": "Book is not available for borrowing"},
-                        status=status.HTTP_400_BAD_REQUEST,
-                    )
-                # Reduce available copies
-                borrow_record.book.reduce_copies()
+                # Takes a copy and inserts the record atomically
+                serializer.save()
                 return Response(
                     {"message": "Borrow record created successfully!", "data": serializer.data},
                     status=status.HTTP_201_CREATED,
@@ -52,6 +49,12 @@ class BorrowRecordCreateView(APIView):
                 {"error": "Validation failed", "details": serializer.errors},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        except ValueError:
+            # The last copy went to a concurrent borrower after validation
+            return Response(
+                {"error": "Book is not available for borrowing"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         except IntegrityError as e:
             return Response(
                 {"error": f"Database error: {str(e)}"},
@@ -115,10 +118,13 @@ class BorrowRecordReturnView(APIView):
             )
 
         try:
-            # Mark book as returned
-            borrow_record.mark_as_returned()
-            borrow_record.book.increase_copies()
-            
+            # Mark book as returned and give the copy back
+            if not borrow_record.mark_as_returned():
+                return Response(
+                    {"error": "This book has already been returned"},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
             serializer = BorrowRecordSerializer(borrow_record)
             return Response(
                 {"message": "Book returned successfully!", "data": serializer.data}
@@ -128,3 +134,174 @@ class BorrowRecordReturnView(APIView):
                 {"error": f"An unexpected error occurred: {str(e)}"},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR,
             )
+
+
+class BorrowRecordBulkCreateView(APIView):
+    """
+    Borrow several books in one request
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Borrow up to 500 books in one transaction, with a result per item",
+        request_body=BulkBorrowSerializer,
+        responses={
+            200: openapi.Response(description="Per-item borrow results"),
+            400: "Validation Error",
+        },
+    )
+    def post(self, request):
+        """
+        Borrow a batch of books
+        Items that can't be borrowed fail individually without affecting the rest
+        """
+        serializer = BulkBorrowSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            results = serializer.save()
+            borrowed = sum(1 for result in results if result["status"] == "borrowed")
+            return Response(
+                {
+                    "message": f"{borrowed} of {len(results)} books borrowed successfully!",
+                    "data": {"borrowed": borrowed, "failed": len(results) - borrowed, "results": results},
+                }
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An unexpected error occurred: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BorrowRecordBulkReturnView(APIView):
+    """
+    Return several borrowed books in one request
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Return up to 500 borrow records in one transaction, with a result per item",
+        request_body=BulkReturnSerializer,
+        responses={
+            200: openapi.Response(description="Per-item return results"),
+            400: "Validation Error",
+        },
+    )
+    def put(self, request):
+        """
+        Mark a batch of borrow records as returned
+        Records that can't be returned fail individually without affecting the rest
+        """
+        serializer = BulkReturnSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": serializer.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            results = serializer.save()
+            returned = sum(1 for result in results if result["status"] == "returned")
+            return Response(
+                {
+                    "message": f"{returned} of {len(results)} books returned successfully!",
+                    "data": {"returned": returned, "failed": len(results) - returned, "results": results},
+                }
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An unexpected error occurred: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BorrowRecordOverdueView(APIView):
+    """
+    List overdue borrow records
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Retrieve a page of overdue borrow records, oldest loans first",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Opaque cursor taken from the previous page's `next` link"),
+            openapi.Parameter('page_size', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of results per page"),
+            openapi.Parameter('fields', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Comma-separated fields to return, e.g. `id,borrow_date,book.title`"),
+            openapi.Parameter('expand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              description="Embed the `book` object instead of its id"),
+        ],
+        responses={200: BorrowRecordSerializer(many=True)},
+    )
+    def get(self, request):
+        """
+        Retrieve a page of overdue loans, keyset-paginated on (borrow_date, id)
+        Served from the partial index on open loans, so history size doesn't matter
+        ?expand=book joins the book in the same query
+        """
+        try:
+            paginator = KeysetPagination(ordering=('borrow_date', 'id'))
+            fieldset = BorrowRecordSerializer.fieldset(request.query_params, paginator.ordering)
+            records = paginator.paginate_queryset(
+                fieldset.values(BorrowRecord.objects.overdue()), request, view=self
+            )
+            return paginator.get_paginated_response(fieldset.rows(records))
+        except ValidationError as e:
+            return Response(
+                {"error": "Invalid field selection", "details": e.detail},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        except NotFound as e:
+            return Response(
+                {"error": str(e.detail)},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving overdue records: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class BorrowRecordExportView(APIView):
+    """
+    Stream the full borrow history
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Download the full borrow history as streamed NDJSON or CSV",
+        manual_parameters=[
+            openapi.Parameter('type', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=list(EXPORT_FORMATS), description="Output format (default ndjson)"),
+            openapi.Parameter('gzip', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+                              description="Gzip the file"),
+        ],
+        responses={200: "Streamed export file", 400: "Validation Error"},
+    )
+    def get(self, request):
+        """
+        Stream every borrow record without loading the history into memory
+        """
+        fmt = request.query_params.get('type', 'ndjson')
+        if fmt not in EXPORT_FORMATS:
+            return Response(
+                {"error": f"Unknown export type '{fmt}'. Use one of: {', '.join(EXPORT_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+        content_type, extension = EXPORT_FORMATS[fmt]
+        filename = f'borrow_history_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{extension}'
+        if compress:
+            content_type = 'application/gzip'
+            filename += '.gz'
+
+        response = StreamingHttpResponse(export_borrow_history(fmt, compress=compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -14,3 +14,9 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
 
 application = get_asgi_application()
+
+# Uvicorn imports this module in every worker process; each listens for the
+# other processes' change events (core/events.py)
+from core import events  # noqa: E402
+
+events.start_listener()
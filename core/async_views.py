@@ -0,0 +1,82 @@
+import asyncio
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View):
+    """
+    Read-only async view for the ASGI request path.
+
+    DRF's APIView can only run synchronously, so this keeps the parts of it
+    the catalog reads need: the request is wrapped in a DRF ``Request`` (for
+    ``query_params`` and the configured authenticators) and anonymous users
+    are refused the way ``IsAuthenticated`` refuses them. Handlers receive the
+    DRF request and return plain ``JsonResponse`` objects. Authentication runs
+    in a worker thread because it may query the database; everything else
+    should use the async ORM.
+
+    Under ASGI each request's ORM calls run in a thread of their own, and each
+    thread opens its own database connection. At most
+    ASYNC_VIEW_DB_CONCURRENCY requests per process are let past a semaphore
+    at once, so thousands of open client connections never turn into
+    thousands of database connections; the rest wait on the event loop.
+    The connection is closed before the semaphore is released, so these
+    views don't use persistent connections.
+    """
+    http_method_names = ['get', 'head', 'options']
+    _semaphores = weakref.WeakKeyDictionary()
+
+    async def dispatch(self, request, *args, **kwargs):
+        async with self.get_semaphore():
+            try:
+                return await self.authenticate_and_dispatch(request, *args, **kwargs)
+            finally:
+                # Close this request's connection before the next request is
+                # let in, rather than whenever the response finishes sending
+                await sync_to_async(close_request_connections)()
+
+    @classmethod
+    def get_semaphore(cls):
+        loop = asyncio.get_running_loop()
+        if loop not in cls._semaphores:
+            cls._semaphores[loop] = asyncio.Semaphore(settings.ASYNC_VIEW_DB_CONCURRENCY)
+        return cls._semaphores[loop]
+
+    async def authenticate_and_dispatch(self, request, *args, **kwargs):
+        authenticators = [auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+        drf_request = Request(request, authenticators=authenticators)
+        try:
+            user = await sync_to_async(lambda: drf_request.user)()
+        except exceptions.APIException as e:
+            return self.refuse(request, authenticators, e)
+        if not (user and user.is_authenticated):
+            return self.refuse(request, authenticators, exceptions.NotAuthenticated())
+        return await super().dispatch(drf_request, *args, **kwargs)
+
+    def refuse(self, request, authenticators, exc):
+        """
+        401 with a challenge when an authenticator offers one, else 403, as APIView does
+        """
+        challenge = authenticators[0].authenticate_header(request) if authenticators else None
+        response = JsonResponse({"detail": str(exc.detail)}, status=401 if challenge else 403)
+        if challenge:
+            response['WWW-Authenticate'] = challenge
+        return response
+
+
+def close_request_connections():
+    """
+    Close the calling thread's database connections, leaving any that are
+    inside a transaction (a test case's, for one) alone.
+    """
+    for connection in connections.all(initialized_only=True):
+        if not connection.in_atomic_block:
+            connection.close()
@@ -0,0 +1,229 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import events
+
+DEFAULT_CATALOG_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+    'LOCAL_TIMEOUT': 5,
+    'LOCAL_MAX_ENTRIES': 1024,
+}
+
+
+class LocalLRU:
+    """
+    Small thread-safe in-process LRU with a per-entry expiry.
+
+    ``epoch`` moves on every delete or clear. A reader takes it before
+    loading and passes it to ``set``, which then refuses a payload loaded
+    before an invalidation that happened while it was in flight.
+    """
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.epoch = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout, max_entries, epoch=None):
+        with self._lock:
+            if epoch is not None and epoch != self.epoch:
+                return
+            self._entries[key] = (time.monotonic() + timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self.epoch += 1
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self.epoch += 1
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ReadThroughCache:
+    """
+    Two-tier read-through cache of serialized payloads keyed by primary key.
+
+    Reads check a per-process LRU first, then the shared Django cache (Redis
+    in production), and only then call the loader. The shared tier holds
+    entries for TIMEOUT seconds and evicts by Redis' maxmemory policy. The
+    local tier holds them for LOCAL_TIMEOUT seconds, which bounds how long
+    another process can serve a payload after it was invalidated here.
+
+    Keys carry `version`. Bump it whenever the payload shape changes, so old
+    entries are never read. Entries are dropped on the change events of
+    `namespace` (core/events.py), delivered after the transaction commits.
+    This process drops both tiers; other processes drop their local tier
+    when the event reaches them, so LOCAL_TIMEOUT only matters for events
+    that are lost.
+
+    Dropping alone would let a reader that loaded the row before the commit
+    store it again afterwards. So each key also has a generation in the
+    shared tier, replaced with a fresh token on every invalidation. Readers
+    take the generation before loading and store it with the payload. A
+    payload whose generation is no longer current is a miss. The local tier
+    checks its ``epoch`` the same way.
+    """
+
+    def __init__(self, namespace, version=1):
+        self.namespace = namespace
+        self.version = version
+        self.local = LocalLRU()
+        self.stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+        self._stats_lock = threading.Lock()
+        events.subscribe(namespace, self.on_events)
+
+    @property
+    def config(self):
+        return {**DEFAULT_CATALOG_CACHE, **getattr(settings, 'CATALOG_CACHE', {})}
+
+    @property
+    def shared(self):
+        return caches[self.config['ALIAS']]
+
+    def make_key(self, pk):
+        return f"{self.namespace}:v{self.version}:{pk}"
+
+    def generation_key(self, key):
+        return f"{key}:gen"
+
+    def generation_timeout(self, config):
+        # A payload stored just after an invalidation, by a reader that took
+        # the old generation, must expire before the new generation does
+        return 2 * config['TIMEOUT']
+
+    def get_or_load(self, pk, loader):
+        """
+        Return the cached payload for `pk`, or call `loader()` and cache its
+        result. A loader returning None (not found) is not cached.
+        """
+        config = self.config
+        key = self.make_key(pk)
+        generation_key = self.generation_key(key)
+
+        epoch = self.local.epoch
+        payload = self.local.get(key)
+        if payload is not None:
+            self._count('local_hits')
+            return payload
+
+        found = self.shared.get_many([key, generation_key])
+        payload = self._current(found, key, generation_key)
+        if payload is not None:
+            self._count('shared_hits')
+        else:
+            self._count('misses')
+            payload = loader()
+            if payload is None:
+                return None
+            self.shared.set(key, (found.get(generation_key), payload), config['TIMEOUT'])
+
+        self.local.set(key, payload, config['LOCAL_TIMEOUT'], config['LOCAL_MAX_ENTRIES'], epoch)
+        return payload
+
+    async def aget_or_load(self, pk, loader):
+        """
+        Async version of ``get_or_load``; ``loader`` is a coroutine function.
+        """
+        config = self.config
+        key = self.make_key(pk)
+        generation_key = self.generation_key(key)
+
+        epoch = self.local.epoch
+        payload = self.local.get(key)
+        if payload is not None:
+            self._count('local_hits')
+            return payload
+
+        found = await self.shared.aget_many([key, generation_key])
+        payload = self._current(found, key, generation_key)
+        if payload is not None:
+            self._count('shared_hits')
+        else:
+            self._count('misses')
+            payload = await loader()
+            if payload is None:
+                return None
+            await self.shared.aset(key, (found.get(generation_key), payload), config['TIMEOUT'])
+
+        self.local.set(key, payload, config['LOCAL_TIMEOUT'], config['LOCAL_MAX_ENTRIES'], epoch)
+        return payload
+
+    @staticmethod
+    def _current(found, key, generation_key):
+        """
+        The payload of a shared entry stored at the key's current generation, else None.
+        """
+        entry = found.get(key)
+        if entry is None or entry[0] != found.get(generation_key):
+            return None
+        return entry[1]
+
+    def invalidate(self, *pks):
+        """
+        Drop the payloads for `pks` from both tiers once the current
+        transaction commits (immediately when not in a transaction), by
+        publishing a change event for them.
+        """
+        events.publish(self.namespace, pks)
+
+    def on_events(self, changes, local):
+        """
+        Change event subscriber: drop the changed entries, and move their
+        shared generations on too when the change was committed by this process.
+        """
+        if any(change.id is None for change in changes):
+            self.local.clear()
+            return
+        keys = [self.make_key(change.id) for change in changes]
+        for key in keys:
+            self.local.delete(key)
+        if local:
+            token = secrets.token_hex(8)
+            self.shared.set_many(
+                {self.generation_key(key): token for key in keys}, self.generation_timeout(self.config)
+            )
+            self.shared.delete_many(keys)
+
+    def get_stats(self):
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = sum(stats.values())
+        stats['hit_ratio'] = round((stats['local_hits'] + stats['shared_hits']) / lookups, 4) if lookups else None
+        stats['local_entries'] = len(self.local)
+        return stats
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+# Serialized BookDetailSerializer / AuthorDetailSerializer payloads, stored
+# with the ETag and Last-Modified they were rendered at
+book_cache = ReadThroughCache('book', version=3)
+author_cache = ReadThroughCache('author', version=3)
@@ -18,7 +18,18 @@ app.autodiscover_tasks(lambda: settings.INSTALLED_APPS)
 app.conf.beat_schedule = {
     'generate-daily-report': {
         'task': 'reports.tasks.generate_library_report',
-        # 'schedule': 86400.0,  # Daily (24 hours)
-        'schedule': 60.0,  # Daily (1 minute)
+        'schedule': 86400.0,  # Daily (24 hours)
+    },
+    'reconcile-library-counters': {
+        'task': 'reports.tasks.reconcile_library_counters',
+        'schedule': 3600.0,  # Hourly
+    },
+    'refresh-daily-circulation': {
+        'task': 'reports.tasks.refresh_daily_circulation',
+        'schedule': 300.0,  # Every 5 minutes
+    },
+    'maintain-borrow-partitions': {
+        'task': 'borrowrecords.tasks.maintain_borrow_partitions',
+        'schedule': 86400.0,  # Daily
     },
 }
@@ -0,0 +1,141 @@
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.regex_helper import _lazy_re_compile
+
+try:
+    import brotli
+except ImportError:  # optional: without it only gzip is offered
+    brotli = None
+
+_CODING_RE = _lazy_re_compile(r'^\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$')
+# Only API payloads: HTML pages such as the admin's carry the CSRF token
+# next to echoed input (?q=), which compression would leak through BREACH
+_COMPRESSIBLE_TYPES = ('application/json',)
+
+
+def accepted_encoding(accept_encoding):
+    """
+    Best coding of the Accept-Encoding header we can produce, or None.
+
+    Quality values are honoured, ``q=0`` refusing a coding; brotli wins a tie
+    with gzip since it compresses JSON tighter at the same speed.
+    """
+    offered = {'gzip': 2}
+    if brotli is not None:
+        offered['br'] = 1
+    qualities = {}
+    for part in accept_encoding.split(','):
+        match = _CODING_RE.match(part)
+        if not match:
+            continue
+        coding, quality = match[1].lower(), match[2]
+        try:
+            qualities[coding] = float(quality) if quality is not None else 1.0
+        except ValueError:
+            continue
+    best, best_key = None, (0, 0)
+    for coding, rank in offered.items():
+        quality = qualities.get(coding, qualities.get('*', 0))
+        if quality > 0 and (quality, -rank) > best_key:
+            best, best_key = coding, (quality, -rank)
+    return best
+
+
+class _Compressor:
+    """
+    Incremental encoder with the interface of a zlib compressobj.
+    """
+
+    def __init__(self, coding):
+        if coding == 'br':
+            self._encoder = brotli.Compressor(quality=settings.COMPRESSION_BROTLI_QUALITY)
+            self.compress, self._finish = self._encoder.process, self._encoder.finish
+            self.flush = self._encoder.flush
+        else:
+            # wbits 16 + MAX_WBITS writes the gzip header and trailer
+            self._encoder = zlib.compressobj(settings.COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self._finish = self._encoder.compress, self._encoder.flush
+            self.flush = lambda: self._encoder.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._finish()
+
+
+def compress_body(coding, body):
+    compressor = _Compressor(coding)
+    return compressor.compress(body) + compressor.finish()
+
+
+def compress_chunks(coding, chunks):
+    """
+    Compress a streamed body chunk by chunk. Each chunk is flushed, so rows
+    reach the client as they are produced instead of when the encoder's
+    window fills up.
+    """
+    compressor = _Compressor(coding)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+async def acompress_chunks(coding, chunks):
+    compressor = _Compressor(coding)
+    async for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON API responses with the best coding the client accepts.
+
+    Bodies under COMPRESSION_MIN_BYTES go out as they are: below a packet or
+    two, compressing costs more CPU than the bytes it saves. Streamed bodies
+    are always compressed, chunk by chunk, as their size isn't known up front.
+
+    HTML and other text responses are left alone. The admin's pages hold a
+    CSRF token alongside reflected search input, the combination BREACH
+    exploits; JSON responses hold no CSRF token, the API authenticating
+    with tokens sent in headers, so no padding is added to them.
+    """
+
+    def process_response(self, request, response):
+        if (
+            response.has_header('Content-Encoding')
+            or not response.get('Content-Type', '').startswith(_COMPRESSIBLE_TYPES)
+            or (not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES)
+        ):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_chunks(coding, response.streaming_content)
+            else:
+                response.streaming_content = compress_chunks(coding, response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = compress_body(coding, response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        # The ETag names the uncompressed representation; a weak one still
+        # matches If-None-Match, which is compared weakly
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
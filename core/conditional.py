@@ -0,0 +1,110 @@
+import datetime
+import hashlib
+
+from django.db.models import Count, F, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+CONDITIONAL_HEADERS = ('HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE', 'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE')
+# Column ``with_modified`` adds to a page's rows for ``rows_validators``
+MODIFIED_COLUMN = 'page_modified'
+
+
+def make_etag(*parts):
+    """
+    Strong ETag over the values a representation is built from.
+
+    Callers pass the same fingerprint whether it was read with an aggregate
+    query or computed from loaded rows, so datetimes are normalised to UTC and
+    numbers to ints before hashing.
+    """
+    normalized = []
+    for part in parts:
+        if isinstance(part, datetime.datetime):
+            part = part.astimezone(datetime.timezone.utc).isoformat()
+        elif part is not None and not isinstance(part, (str, int)):
+            part = int(part)
+        normalized.append(part)
+    digest = hashlib.blake2b(repr(normalized).encode('utf-8'), digest_size=16).hexdigest()
+    return quote_etag(digest)
+
+
+def has_conditional_headers(request):
+    return any(header in request.META for header in CONDITIONAL_HEADERS)
+
+
+def not_modified(request, etag, last_modified):
+    """
+    Return a 304 (or 412) response when the request's validators match, else
+    None. The ETag takes precedence over If-Modified-Since.
+    """
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Attach the validators and ask clients to revalidate before reusing a copy.
+    """
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def page_validators(request, window, field='updated_at'):
+    """
+    ETag of a page from one aggregate over its rows.
+
+    ``window`` is the unevaluated page queryset from
+    ``KeysetPagination.get_page_window``. Only the row count, id sum and
+    newest timestamp are read, so nothing is loaded or serialized. The count
+    and id sum change when a row enters or leaves the page, which the newest
+    timestamp alone would miss; that is also why pages send no
+    Last-Modified, leaving If-Modified-Since unanswered.
+    """
+    stats = window.aggregate(**_page_aggregates(field))
+    return _page_etag(request, stats)
+
+
+async def apage_validators(request, window, field='updated_at'):
+    """
+    Async version of ``page_validators``.
+    """
+    stats = await window.aaggregate(**_page_aggregates(field))
+    return _page_etag(request, stats)
+
+
+def with_modified(queryset, field='updated_at'):
+    """
+    ``queryset`` (of values() rows) with each row's ``field`` read alongside,
+    so ``rows_validators`` can fingerprint the page once it's loaded.
+    """
+    return queryset.annotate(**{MODIFIED_COLUMN: F(field) if isinstance(field, str) else field})
+
+
+def rows_validators(request, rows):
+    """
+    The ``page_validators`` ETag of a window's loaded rows, without the aggregate
+    query: for requests with no validators to check, which are served the
+    rows anyway. Takes the ``with_modified`` column back out of each row.
+    """
+    stamps = [row.pop(MODIFIED_COLUMN) for row in rows]
+    stats = {
+        'last_modified': max((stamp for stamp in stamps if stamp is not None), default=None),
+        'rows': len(rows),
+        'ids': sum(row['id'] for row in rows) if rows else None,
+    }
+    return _page_etag(request, stats)
+
+
+def _page_aggregates(field):
+    return {'last_modified': Max(field), 'rows': Count('pk'), 'ids': Sum('pk')}
+
+
+def _page_etag(request, stats):
+    return make_etag(request.build_absolute_uri(), stats['last_modified'], stats['rows'], stats['ids'])
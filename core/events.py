@@ -0,0 +1,169 @@
+import logging
+import os
+import select
+import socket
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+import orjson
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EVENTS = {
+    'CHANNEL': 'lms_events',
+    'NOTIFY': True,
+    'RECONNECT_SECONDS': 5,
+}
+# NOTIFY payloads must stay under 8000 bytes
+_MAX_PAYLOAD = 7500
+
+# `id` None means any row of `entity` may have changed (events were missed)
+Event = namedtuple('Event', 'entity id fields version')
+
+_subscribers = defaultdict(list)
+_listener = {'pid': None, 'thread': None}
+_listener_lock = threading.Lock()
+
+
+def config():
+    return {**DEFAULT_EVENTS, **getattr(settings, 'EVENTS', {})}
+
+
+def subscribe(entity, callback):
+    """
+    Call ``callback(events, local)`` with each batch of committed changes to
+    `entity`. ``local`` is True for changes committed by this process,
+    delivered right after the commit, and False for other processes'
+    changes, which arrive through the listener once it's started.
+    """
+    _subscribers[entity].append(callback)
+
+
+def publish(entity, ids, fields=(), version=None, using='default'):
+    """
+    Announce that rows `ids` of `entity` changed, once the current transaction
+    commits (at once outside a transaction); nothing is sent on rollback.
+
+    ``fields`` names the columns that changed, empty when unknown or for a
+    deletion. ``version`` is the rows' new ``updated_at`` when the caller
+    has it, sent as integer microseconds so subscribers can order changes.
+    """
+    if isinstance(version, datetime):
+        version = int(version.timestamp() * 1_000_000)
+    events = [Event(entity, pk, tuple(fields), version) for pk in ids if pk is not None]
+    if events:
+        transaction.on_commit(lambda: _committed(events, using), using=using)
+
+
+def _committed(events, using):
+    _deliver(events, local=True)
+    if not config()['NOTIFY']:
+        return
+    try:
+        with connections[using].cursor() as cursor:
+            for payload in _encode(events):
+                cursor.execute('SELECT pg_notify(%s, %s)', [config()['CHANNEL'], payload])
+    except Exception:
+        # The change is committed and this process is up to date; other
+        # processes fall back on their caches' expiry
+        logger.exception("Could not publish %d change events", len(events))
+
+
+def _origin():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _encode(events):
+    """
+    Compact payloads of [origin, [entity, id, fields, version], ...], split to fit NOTIFY.
+    """
+    origin = _origin()
+    batch, size = [], 0
+    for event in events:
+        row = orjson.dumps(list(event))
+        if batch and size + len(row) > _MAX_PAYLOAD:
+            yield (b'[%s,%s]' % (orjson.dumps(origin), b','.join(batch))).decode()
+            batch, size = [], 0
+        batch.append(row)
+        size += len(row) + 1
+    if batch:
+        yield (b'[%s,%s]' % (orjson.dumps(origin), b','.join(batch))).decode()
+
+
+def _decode(payload):
+    origin, *rows = orjson.loads(payload)
+    return origin, [Event(entity, pk, tuple(fields), version) for entity, pk, fields, version in rows]
+
+
+def _deliver(events, local):
+    by_entity = defaultdict(list)
+    for event in events:
+        by_entity[event.entity].append(event)
+    for entity, batch in by_entity.items():
+        for callback in _subscribers.get(entity, ()):
+            try:
+                callback(batch, local)
+            except Exception:
+                logger.exception("Change event subscriber %r failed", callback)
+
+
+def start_listener(using='default'):
+    """
+    Start receiving other processes' events in a daemon thread, once per
+    process. Serving processes call it after forking (see core.warmup);
+    the listener holds a database connection of its own for LISTEN.
+    """
+    with _listener_lock:
+        if _listener['pid'] == os.getpid():
+            return
+        thread = threading.Thread(target=_listen, args=(using,), name='change-events', daemon=True)
+        _listener.update(pid=os.getpid(), thread=thread)
+        thread.start()
+
+
+def _listen(using):
+    options = config()
+    origin = _origin()
+    connected_before = False
+    while True:
+        wrapper = connections.create_connection(using)
+        raw = None
+        try:
+            raw = wrapper.Database.connect(**wrapper.get_connection_params())
+            raw.autocommit = True
+            raw.cursor().execute(f'LISTEN "{options["CHANNEL"]}"')
+            if connected_before:
+                # Whatever was published while disconnected is lost
+                _deliver([Event(entity, None, (), None) for entity in list(_subscribers)], local=False)
+            connected_before = True
+            for payload in _notifications(raw):
+                sender, events = _decode(payload)
+                if sender != origin:
+                    _deliver(events, local=False)
+        except Exception:
+            logger.exception("Change event listener disconnected; reconnecting")
+        finally:
+            if raw is not None:
+                try:
+                    raw.close()
+                except Exception:
+                    pass
+        time.sleep(options['RECONNECT_SECONDS'])
+
+
+def _notifications(raw):
+    if is_psycopg3:
+        for notify in raw.notifies():
+            yield notify.payload
+        return
+    while True:
+        if select.select([raw], [], [], 60) == ([], [], []):
+            continue
+        raw.poll()
+        while raw.notifies:
+            yield raw.notifies.pop(0).payload
@@ -0,0 +1,248 @@
+import contextvars
+import logging
+import os
+import time
+import traceback
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views import View
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+from .profiling import start_request_sampler
+
+logger = logging.getLogger(__name__)
+
+INF = float('inf')
+
+REQUEST_SECONDS = Histogram(
+    'lms_request_duration_seconds', "Wall time of each request until the response is returned",
+    ['view', 'method', 'status'],
+)
+DB_SECONDS = Histogram(
+    'lms_request_db_duration_seconds', "Time each request spent waiting on database queries", ['view'],
+)
+QUERIES = Histogram(
+    'lms_request_queries', "Database queries run by each request", ['view'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, INF),
+)
+DUPLICATE_QUERIES = Histogram(
+    'lms_request_duplicate_queries', "Queries repeating an earlier query of the same request, SQL and parameters",
+    ['view'], buckets=(0, 1, 2, 5, 10, 50, INF),
+)
+RESPONSE_BYTES = Histogram(
+    'lms_response_size_bytes', "Size of each serialized (non-streaming) response body", ['view'],
+    buckets=(256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, INF),
+)
+
+REPEATED_QUERIES = Counter(
+    'lms_repeated_queries', "Requests running one SQL statement N_PLUS_ONE_THRESHOLD or more times", ['view'],
+)
+SLOW_QUERIES = Counter(
+    'lms_slow_queries', "Queries slower than SLOW_QUERY_MS", ['view'],
+)
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Database work of one request, filled in by ``record_query``.
+
+    Besides the totals, it keeps a stack snippet of the code behind each
+    statement run N_PLUS_ONE_THRESHOLD times (the same SQL with different
+    parameters is the N+1 pattern of a relation read once per row) and of
+    each query slower than SLOW_QUERY_MS, for the middleware to log.
+    """
+    __slots__ = (
+        'started', 'queries', 'duplicates', 'db_seconds', 'seen', 'statements',
+        'repeated', 'slow', 'repeat_threshold', 'slow_seconds',
+    )
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.duplicates = 0
+        self.db_seconds = 0.0
+        self.seen = set()
+        self.statements = {}
+        self.repeated = {}
+        self.slow = []
+        self.repeat_threshold = settings.N_PLUS_ONE_THRESHOLD
+        self.slow_seconds = settings.SLOW_QUERY_MS / 1000
+
+    def add(self, sql, params, many, seconds):
+        self.queries += 1
+        self.db_seconds += seconds
+        if not many:
+            key = (sql, repr(params))
+            if key in self.seen:
+                self.duplicates += 1
+            else:
+                self.seen.add(key)
+        count = self.statements[sql] = self.statements.get(sql, 0) + 1
+        if count == self.repeat_threshold:
+            self.repeated[sql] = stack_snippet()
+        if seconds >= self.slow_seconds:
+            self.slow.append((sql, seconds, stack_snippet()))
+
+
+def stack_snippet(limit=6):
+    """
+    The innermost project frames of the calling stack, formatted like a
+    traceback; library frames (Django, DRF) and this module are left out.
+    """
+    project = str(settings.BASE_DIR)
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(project) and 'site-packages' not in frame.filename
+        and frame.filename != __file__
+    ]
+    return ''.join(traceback.format_list(frames[-limit:])) or '  (no project frames)\n'
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Connection execute wrapper timing each query into the current request's stats.
+
+    The stats travel in a context variable, so queries the async ORM runs in
+    worker threads are still counted against the request that awaited them.
+    """
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, params, many, time.perf_counter() - started)
+
+
+def instrument_connection(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_connections():
+    """
+    Add ``record_query`` to the calling thread's connections without opening
+    any, for those opened before this module was loaded.
+    """
+    for connection in connections.all():
+        instrument_connection(connection)
+
+
+def _instrument_new_connection(sender, connection, **kwargs):
+    instrument_connection(connection)
+
+
+# Every connection opened from now on, in whatever thread: the async ORM's
+# worker threads under ASGI get their own connections for each request
+connection_created.connect(_instrument_new_connection)
+
+
+class RequestMetricsMiddleware:
+    """
+    Record each request's wall time, database time, query count, duplicate
+    query count and response size per view, for ``/metrics``, and report the
+    timings to the client in a ``Server-Timing`` header.
+
+    Place it first in MIDDLEWARE so the other middleware's time and queries
+    (sessions, authentication) are counted too. Times stop when the response
+    is returned, so streamed bodies are not included.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        instrument_connections()
+        # Sampled profiles cover sync requests only: an async request's work
+        # moves between the event loop and worker threads
+        sampler = start_request_sampler()
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+            if sampler is not None:
+                sampler.stop()
+                sampler.write(settings.REQUEST_PROFILE_DIR, view_name(request))
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        elapsed = time.perf_counter() - stats.started
+        view = view_name(request)
+        REQUEST_SECONDS.labels(view, request.method, response.status_code).observe(elapsed)
+        DB_SECONDS.labels(view).observe(stats.db_seconds)
+        QUERIES.labels(view).observe(stats.queries)
+        DUPLICATE_QUERIES.labels(view).observe(stats.duplicates)
+        if not response.streaming:
+            RESPONSE_BYTES.labels(view).observe(len(response.content))
+        if stats.repeated:
+            REPEATED_QUERIES.labels(view).inc()
+            for sql, stack in stats.repeated.items():
+                logger.warning(
+                    "%s %s ran the same SQL %d times, likely an N+1 query: %s\n%s",
+                    view, request.path, stats.statements[sql], sql[:500], stack,
+                )
+        for sql, seconds, stack in stats.slow:
+            SLOW_QUERIES.labels(view).inc()
+            logger.warning("%s %s ran a slow query (%.0fms): %s\n%s", view, request.path, seconds * 1000, sql[:500], stack)
+        if settings.METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'app;dur={elapsed * 1000:.1f}, '
+                f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries, {stats.duplicates} duplicate"'
+            )
+        return response
+
+
+def view_name(request):
+    """
+    Class name of the view that handled the request ('BookListCreateView'),
+    the function name for function views, or 'unmatched' for 404s.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return getattr(match.func, 'view_class', match.func).__name__
+
+
+class MetricsView(View):
+    """
+    Prometheus text exposition of the request metrics, for scrapers on METRICS_ALLOWED_IPS
+    """
+    http_method_names = ['get']
+
+    def get(self, request):
+        if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+            return HttpResponseForbidden()
+        if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+            # Gunicorn workers each write their samples to files in this
+            # directory; a scrape is answered by one worker, so merge them all
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return HttpResponse(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
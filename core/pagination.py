@@ -0,0 +1,167 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique ordering.
+
+    The cursor carries the ordering values of the last row on the page, so the
+    next page is fetched with a range condition on the ordering columns instead
+    of an OFFSET. No COUNT(*) is issued; one extra row is read to know whether
+    a next page exists. Reading page 5,000 costs the same as reading page 1 as
+    long as an index covers the ordering.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering=('id',)):
+        """
+        ``ordering`` must end with a unique field (usually ``id``) so that every
+        row has a distinct position. Fields may be prefixed with ``-``.
+        """
+        self.ordering = tuple(ordering)
+        self.page_size = api_settings.PAGE_SIZE or 10
+        self.next_position = None
+        self.request = None
+
+    def get_page_size(self, request):
+        """
+        Page size from the query string, bounded by ``max_page_size``.
+        """
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return the rows of the requested page as a list.
+        """
+        return self.paginate_window(self.get_page_window(queryset, request))
+
+    def get_page_window(self, queryset, request):
+        """
+        Unevaluated queryset of the requested page plus one look-ahead row.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, queryset.model)
+
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(position))
+        return queryset[:self.page_size + 1]
+
+    def paginate_window(self, window):
+        """
+        Evaluate a window from ``get_page_window`` into the page's rows.
+        """
+        rows = list(window)
+        page = rows[:self.page_size]
+        if len(rows) > self.page_size:
+            self.next_position = self.get_position(page[-1])
+        else:
+            self.next_position = None
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def seek_filter(self, position):
+        """
+        Build ``(a, b, ...) > (x, y, ...)`` for the ordering, honouring each
+        field's direction. The leading column also gets an inclusive bound so
+        the planner can use it as an index range.
+        """
+        condition = Q()
+        equal_prefix = Q()
+        for (name, descending), value in zip(self._fields(), position):
+            lookup = 'lt' if descending else 'gt'
+            condition |= equal_prefix & Q(**{f'{name}__{lookup}': value})
+            equal_prefix &= Q(**{name: value})
+
+        name, descending = self._fields()[0]
+        lookup = 'lte' if descending else 'gte'
+        return Q(**{f'{name}__{lookup}': position[0]}) & condition
+
+    def get_position(self, row):
+        """
+        Ordering values of a model instance or a ``values()`` dict.
+        """
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self._fields()]
+        return [getattr(row, name) for name, _ in self._fields()]
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, model):
+        """
+        Decode the cursor from the query string into typed ordering values.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii'))
+            values = json.loads(raw.decode('utf-8'))
+            fields = self._fields()
+            if not isinstance(values, list) or len(values) != len(fields):
+                raise ValueError
+            return [self.to_python(model, name, value) for (name, _), value in zip(fields, values)]
+        except (TypeError, ValueError, UnicodeError, binascii.Error, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def to_python(self, model, name, value):
+        """
+        Cursor value typed like the model field, or as decoded from JSON for
+        an annotation such as a search rank.
+        """
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            if not isinstance(value, (int, float, str)):
+                raise ValueError
+            return value
+        return field.to_python(value)
+
+    def _fields(self):
+        return [
+            (field[1:], True) if field.startswith('-') else (field, False)
+            for field in self.ordering
+        ]
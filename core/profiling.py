@@ -0,0 +1,88 @@
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+
+
+class StackSampler:
+    """
+    Statistical profiler for one thread.
+
+    A background thread reads the target thread's Python stack every
+    ``interval`` seconds and counts identical stacks. Unlike cProfile this
+    adds nothing to the profiled code's own calls, and the samples come out
+    in the "folded" format (``outer;inner;innermost count``) that
+    flamegraph.pl, speedscope and inferno read directly. Files from many
+    requests can be concatenated into one flame graph.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[fold(frame)] += 1
+
+    def write(self, directory, name):
+        """
+        Write the samples to ``<directory>/<name>.<time>.<pid>.folded`` and
+        return the path, or None when the thread finished before the first sample.
+        """
+        if not self.stacks:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{name}.{time.time_ns()}.{os.getpid()}.folded')
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.items():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+def fold(frame):
+    """
+    The stack ending at ``frame`` as ``outer;...;innermost``, each frame as
+    ``function (file:first line)`` so samples anywhere in a function merge.
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({short_path(code.co_filename)}:{code.co_firstlineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def short_path(filename):
+    for prefix in (str(settings.BASE_DIR), *sys.path):
+        if prefix and filename.startswith(prefix):
+            return filename[len(prefix):].lstrip(os.sep)
+    return filename
+
+
+def start_request_sampler():
+    """
+    Start a sampler on the calling thread for REQUEST_PROFILE_RATE of
+    requests; None for the rest, or when profiling is off.
+    """
+    rate = settings.REQUEST_PROFILE_RATE
+    if rate <= 0 or random.random() >= rate:
+        return None
+    return StackSampler(interval=settings.REQUEST_PROFILE_INTERVAL_MS / 1000).start()
@@ -0,0 +1,79 @@
+from itertools import islice
+
+import orjson
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# orjson writes dates and times as isoformat() does, and with UTC_Z ends UTC
+# datetimes in Z like DRF's encoder; values it doesn't encode itself
+# (decimals, lazy strings, ...) go through DRF's encoder
+_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+_default = JSONEncoder().default
+
+
+class FastJSONRenderer(BaseRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer built on orjson.
+
+    orjson encodes dicts, lists, strings and numbers in C, several times
+    faster than the stdlib encoder on large list payloads, and writes UTF-8
+    directly like DRF's default UNICODE_JSON. ``?indent`` in the Accept
+    header is honoured with orjson's only indent, two spaces.
+    """
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        options = _OPTIONS
+        if accepted_media_type and 'indent=' in accepted_media_type:
+            options |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=_default, option=options)
+
+
+class FastJsonResponse(HttpResponse):
+    """
+    JsonResponse encoded like FastJSONRenderer, for views that bypass DRF's
+    content negotiation (the async views).
+    """
+
+    def __init__(self, data, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(orjson.dumps(data, default=_default, option=_OPTIONS), **kwargs)
+
+
+class StreamingListResponse(StreamingHttpResponse):
+    """
+    A whole list as ``{"next": null, "results": [...]}``, the shape of its
+    last page, written a chunk of rows at a time.
+
+    ``queryset`` is iterated with a server-side cursor inside a transaction
+    (outside one Django declares the cursor WITH HOLD, which makes the
+    database materialize the whole result before the first row comes back),
+    so the first bytes leave as soon as the first chunk is read and the
+    worker holds one chunk of rows at a time however long the list is.
+    ``transform`` is applied to each chunk, e.g. ``Fieldset.rows``.
+    """
+
+    def __init__(self, queryset, chunk_size=None, transform=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(self.chunks(queryset, chunk_size or settings.STREAM_CHUNK_ROWS, transform), **kwargs)
+
+    @staticmethod
+    def chunks(queryset, chunk_size, transform=None):
+        yield b'{"next":null,"results":['
+        with transaction.atomic(using=queryset.db):
+            rows = queryset.iterator(chunk_size=chunk_size)
+            separator = b''
+            while batch := list(islice(rows, chunk_size)):
+                if transform is not None:
+                    batch = transform(batch)
+                # Each batch is encoded as a list, then its brackets are dropped
+                yield separator + orjson.dumps(batch, default=_default, option=_OPTIONS)[1:-1]
+                separator = b','
+        yield b']}'
@@ -0,0 +1,58 @@
+import re
+
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+
+# No stemming or stop words: titles and names come in many languages, and
+# prefix matching on stems would miss partially typed words
+SEARCH_CONFIG = 'simple'
+# Terms beyond this are ignored, which bounds the cost of one query
+MAX_SEARCH_TERMS = 8
+# Matches ranked per query. A short prefix can match a tenth of the catalog,
+# and paging through all of it is what makes broad queries slow; past this
+# many, only the best ranked are paged and the user is expected to type on
+MAX_RANKED_MATCHES = 2000
+
+_TERM_RE = re.compile(r'[^\W_]+')
+
+
+def search_vector(*fields):
+    """
+    tsvector expression over ``fields``, for a stored ``search_document``
+    column. Storing it means neither the GIN recheck nor ranking has to
+    re-parse the text of every matching row.
+    """
+    return SearchVector(*fields, config=SEARCH_CONFIG)
+
+
+def prefix_query(text):
+    """
+    tsquery matching every term of ``text`` as a prefix, so ``harry pot``
+    becomes ``harry:* & pot:*``. Returns None when there are no terms.
+    Terms are reduced to letters and digits, so user input can never carry
+    tsquery operators.
+    """
+    terms = _TERM_RE.findall(text.lower())[:MAX_SEARCH_TERMS]
+    if not terms:
+        return None
+    return SearchQuery(' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG)
+
+
+def ranked_matches(queryset, query, document='search_document'):
+    """
+    Rows whose stored ``document`` matches ``query``, annotated with a ``rank``.
+
+    Only the MAX_RANKED_MATCHES best ranked matches are kept, ties broken by
+    primary key, so every page of a query is cut from the same candidates.
+    ts_rank returns a float4; it's widened to float8 so the value survives
+    the JSON round trip of a keyset cursor exactly.
+    """
+    rank = Cast(SearchRank(F(document), query), FloatField())
+    candidates = (
+        queryset.model._base_manager.filter(**{document: query})
+        .annotate(candidate_rank=rank)
+        .order_by('-candidate_rank', 'pk')
+        .values('pk')[:MAX_RANKED_MATCHES]
+    )
+    return queryset.filter(pk__in=candidates).annotate(rank=rank)
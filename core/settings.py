@@ -26,9 +26,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.getenv('DJANGO_SECRET_KEY')
 
-DEBUG = True
+DEBUG = os.getenv('DJANGO_DEBUG', 'True').lower() in ('1', 'true', 'yes')
 
-ALLOWED_HOSTS = ['library-management-system-zlrp.onrender.com']
+ALLOWED_HOSTS = os.getenv('DJANGO_ALLOWED_HOSTS', 'library-management-system-zlrp.onrender.com').split(',')
 
 CSRF_TRUSTED_ORIGINS = [
     'https://library-management-system-zlrp.onrender.com',
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -50,11 +51,17 @@ INSTALLED_APPS = [
     # Project apps
     'authors',
     'books',
+    'borrowers',
     'borrowrecords',
     'reports',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    # First, so every other middleware's time and queries are measured too
+    'core.metrics.RequestMetricsMiddleware',
+    # Before anything that reads or changes the body, so it sees the final one
+    'core.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -103,9 +110,71 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Keep each worker thread's connection open between requests instead of
+        # reconnecting (and authenticating) every time; it is checked before
+        # reuse, so a connection dropped by the server is replaced transparently
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Optional connection pool shared by a worker's threads, for when threads x
+# workers would exceed the database's max_connections. Needs psycopg 3 and
+# psycopg-pool installed in place of psycopg2, and replaces persistent connections.
+DB_POOL_MAX_SIZE = os.getenv('DB_POOL_MAX_SIZE')
+if DB_POOL_MAX_SIZE:
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(DB_POOL_MAX_SIZE),
+            'timeout': 10,
+        },
+    }
+
+# Cache Configuration
+# Redis (a separate database of the Celery Redis) when CACHE_URL is set, else per-process memory
+CACHE_URL = os.getenv('CACHE_URL')
+if CACHE_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Read-through cache of book/author detail payloads (see core/cache.py)
+CATALOG_CACHE = {
+    'ALIAS': 'default',
+    'TIMEOUT': int(os.getenv('CATALOG_CACHE_TIMEOUT', 300)),
+    'LOCAL_TIMEOUT': float(os.getenv('CATALOG_CACHE_LOCAL_TIMEOUT', 5)),
+    'LOCAL_MAX_ENTRIES': int(os.getenv('CATALOG_CACHE_LOCAL_MAX_ENTRIES', 1024)),
+}
+
+# Change events (core/events.py): committed changes are announced with NOTIFY on
+# CHANNEL, and each serving process's listener drops its local cache entries
+# and re-reads its availability index from them. LISTEN holds a session of its
+# own, which PgBouncer's transaction pooling can't provide.
+EVENTS = {
+    'CHANNEL': os.getenv('EVENTS_CHANNEL', 'lms_events'),
+    'NOTIFY': os.getenv('EVENTS_NOTIFY', 'True').lower() in ('1', 'true', 'yes'),
+    'RECONNECT_SECONDS': float(os.getenv('EVENTS_RECONNECT_SECONDS', 5)),
+}
+
+# Per-process ISBN availability index (see books/availability.py): how often
+# other processes' changes are synced, and how often it is rebuilt in full
+AVAILABILITY_INDEX = {
+    'SYNC_SECONDS': float(os.getenv('AVAILABILITY_SYNC_SECONDS', 1)),
+    'SYNC_OVERLAP_SECONDS': float(os.getenv('AVAILABILITY_SYNC_OVERLAP_SECONDS', 5)),
+    'REBUILD_SECONDS': float(os.getenv('AVAILABILITY_REBUILD_SECONDS', 300)),
+}
+
 # Celery Configuration
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND')
@@ -118,9 +187,11 @@ CELERY_TIMEZONE = 'UTC'
 REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # The browsable API renders an HTML page, forms included, for any browser
+    # that asks; only worth it while developing
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
-        'rest_framework.renderers.BrowsableAPIRenderer',
+        'core.renderers.FastJSONRenderer',
+        *(['rest_framework.renderers.BrowsableAPIRenderer'] if DEBUG else []),
     ],
 }
 
@@ -135,3 +206,64 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 REPORTS_DIR = os.path.join(MEDIA_ROOT, 'reports')
 os.makedirs(REPORTS_DIR, exist_ok=True)
 
+# Library report pipeline (reports/aggregates.py): book ids per parallel
+# shard task, and the length of its top-N lists
+REPORT_SHARD_BOOKS = int(os.getenv('REPORT_SHARD_BOOKS', 50_000))
+REPORT_TOP_N = int(os.getenv('REPORT_TOP_N', 20))
+
+# Longest date range, in days, the circulation endpoints answer for
+CIRCULATION_MAX_DAYS = int(os.getenv('CIRCULATION_MAX_DAYS', 366))
+
+# Borrow history partitioning (borrowrecords/partitions.py): months of
+# partitions kept ready ahead of today, months after which a month is moved to
+# the archive schema (0 keeps everything attached), and that schema
+BORROW_PARTITIONS_AHEAD = int(os.getenv('BORROW_PARTITIONS_AHEAD', 3))
+BORROW_ARCHIVE_AFTER_MONTHS = int(os.getenv('BORROW_ARCHIVE_AFTER_MONTHS', 24))
+BORROW_ARCHIVE_SCHEMA = os.getenv('BORROW_ARCHIVE_SCHEMA', 'borrow_archive')
+
+# Library statistics counters: rows per counter that writers spread their updates over
+LIBRARY_COUNTER_SHARDS = int(os.getenv('LIBRARY_COUNTER_SHARDS', 8))
+
+# Requests per ASGI worker allowed to run async views (and so hold a database
+# connection) at the same time; keep workers x this below max_connections
+ASYNC_VIEW_DB_CONCURRENCY = int(os.getenv('ASYNC_VIEW_DB_CONCURRENCY', 20))
+
+# Response compression (core/compression.py): bodies smaller than this go out
+# uncompressed; gzip level and brotli quality (brotli needs the package installed)
+COMPRESSION_MIN_BYTES = int(os.getenv('COMPRESSION_MIN_BYTES', 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv('COMPRESSION_GZIP_LEVEL', 6))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv('COMPRESSION_BROTLI_QUALITY', 5))
+
+# Rows read from the server-side cursor and encoded per chunk of a streamed list (?stream=1)
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', 2000))
+
+# Request metrics (core/metrics.py): addresses allowed to scrape /metrics, and
+# whether responses carry a Server-Timing header with the app and database time
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+METRICS_SERVER_TIMING = os.getenv('METRICS_SERVER_TIMING', 'True').lower() in ('1', 'true', 'yes')
+
+# Request diagnostics: log a warning, with the view and a stack snippet, for
+# queries slower than SLOW_QUERY_MS and for SQL a request runs N_PLUS_ONE_THRESHOLD times
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 200))
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'verbose': {'format': '%(asctime)s %(levelname)s %(name)s %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'verbose'},
+    },
+    'loggers': {
+        'core': {'handlers': ['console'], 'level': os.getenv('CORE_LOG_LEVEL', 'INFO'), 'propagate': False},
+    },
+}
+
+# Opt-in sampling profiler (core/profiling.py): the fraction of requests to
+# profile, and where their folded stacks are written for flame graphs
+REQUEST_PROFILE_RATE = float(os.getenv('REQUEST_PROFILE_RATE', 0))
+REQUEST_PROFILE_INTERVAL_MS = float(os.getenv('REQUEST_PROFILE_INTERVAL_MS', 5))
+REQUEST_PROFILE_DIR = os.getenv('REQUEST_PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
+
@@ -17,10 +17,21 @@ Including another URLconf
 
 from django.contrib import admin
 from django.urls import path, include
-from authors.views import AuthorListCreateView, AuthorDetailView
-from books.views import BookListCreateView, BookDetailView
-from borrowrecords.views import BorrowRecordCreateView, BorrowRecordReturnView
-from reports.views import ReportView
+from authors.async_views import AsyncAuthorListView, AsyncAuthorDetailView
+from authors.views import AuthorListCreateView, AuthorDetailView, AuthorSearchView
+from books.async_views import AsyncBookListView, AsyncBookDetailView
+from books.views import BookListCreateView, BookDetailView, BookSearchView, CatalogImportView, BookAvailabilityView
+from borrowers.views import BorrowerListView, BorrowerDetailView, BorrowerLoansView
+from borrowrecords.views import (
+    BorrowRecordCreateView,
+    BorrowRecordReturnView,
+    BorrowRecordBulkCreateView,
+    BorrowRecordBulkReturnView,
+    BorrowRecordOverdueView,
+    BorrowRecordExportView,
+)
+from reports.views import ReportView, CirculationDailyView, CirculationTopBooksView
+from core.metrics import MetricsView
 
 from rest_framework import permissions
 from drf_yasg.views import get_schema_view
@@ -50,17 +61,40 @@ urlpatterns = [
     # Authors Routes
     path('api/authors/', AuthorListCreateView.as_view(), name='author-list-create'),
     path('api/authors/<int:pk>/', AuthorDetailView.as_view(), name='author-detail'),
+    path('api/authors/import/', CatalogImportView.as_view(kind='authors'), name='author-import'),
+    path('api/authors/search/', AuthorSearchView.as_view(), name='author-search'),
     
     # Books Routes
     path('api/books/', BookListCreateView.as_view(), name='book-list-create'),
     path('api/books/<int:pk>/', BookDetailView.as_view(), name='book-detail'),
+    path('api/books/import/', CatalogImportView.as_view(kind='books'), name='book-import'),
+    path('api/books/search/', BookSearchView.as_view(), name='book-search'),
+    path('api/books/availability/', BookAvailabilityView.as_view(), name='book-availability'),
+    
+    # Async catalog reads, for the ASGI server (core/asgi.py)
+    path('api/async/authors/', AsyncAuthorListView.as_view(), name='async-author-list'),
+    path('api/async/authors/<int:pk>/', AsyncAuthorDetailView.as_view(), name='async-author-detail'),
+    path('api/async/books/', AsyncBookListView.as_view(), name='async-book-list'),
+    path('api/async/books/<int:pk>/', AsyncBookDetailView.as_view(), name='async-book-detail'),
     
     # Borrow Routes
     path('api/borrow/', BorrowRecordCreateView.as_view(), name='borrow-create'),
     path('api/borrow/<int:pk>/return/', BorrowRecordReturnView.as_view(), name='borrow-return'),
+    path('api/borrow/bulk/', BorrowRecordBulkCreateView.as_view(), name='borrow-bulk-create'),
+    path('api/borrow/bulk/return/', BorrowRecordBulkReturnView.as_view(), name='borrow-bulk-return'),
+    path('api/borrow/overdue/', BorrowRecordOverdueView.as_view(), name='borrow-overdue'),
+    path('api/borrow/export/', BorrowRecordExportView.as_view(), name='borrow-export'),
+    
+    # Borrower Routes
+    path('api/borrowers/', BorrowerListView.as_view(), name='borrower-list'),
+    path('api/borrowers/<int:pk>/', BorrowerDetailView.as_view(), name='borrower-detail'),
+    path('api/borrowers/<int:pk>/loans/', BorrowerLoansView.as_view(), name='borrower-loans'),
+    path('api/borrowers/<int:pk>/history/', BorrowerLoansView.as_view(history=True), name='borrower-history'),
     
     # Reports Routes
     path('api/reports/', ReportView.as_view(), name='reports'),
+    path('api/reports/circulation/', CirculationDailyView.as_view(), name='circulation-daily'),
+    path('api/reports/circulation/books/', CirculationTopBooksView.as_view(), name='circulation-top-books'),
     
     # Swagger Documentation
     path('swagger<format>/', schema_view.without_ui(cache_timeout=0), name='schema-json'),
@@ -70,6 +104,9 @@ urlpatterns = [
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 
+    # Prometheus scrape endpoint (core/metrics.py)
+    path('metrics', MetricsView.as_view(), name='metrics'),
+
 ]
 
 if settings.DEBUG:
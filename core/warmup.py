@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.urls import get_resolver
+
+from . import events
+
+
+def warm_up():
+    """
+    Do the one-off work of a process's first request up front.
+
+    Resolving the URLconf imports every view, serializer and model module;
+    the database and cache round trips fail fast on bad credentials instead
+    of on a user's request, and leave the cache client's connection pool
+    open for the request threads to share. Database connections are per
+    thread, so the one opened here is closed again rather than kept. Last,
+    the process starts listening for other processes' change events.
+    """
+    get_resolver().url_patterns
+    for connection in connections.all():
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        finally:
+            connection.close()
+    caches[settings.CATALOG_CACHE['ALIAS']].get('warm-up')
+    events.start_listener()
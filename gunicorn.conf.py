@@ -0,0 +1,72 @@
+"""
+Gunicorn settings for serving core.wsgi in production.
+
+Gunicorn reads this file automatically when started from the project root:
+
+    gunicorn core.wsgi:application
+
+Every setting can be overridden with the GUNICORN_* environment variables
+below. Each worker thread holds its own persistent database connection
+(CONN_MAX_AGE), so workers x threads must stay below the database's
+max_connections, less what Celery and the ASGI server use; set
+DB_POOL_MAX_SIZE to share a pool between a worker's threads instead.
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+
+# Processes for CPU-bound work (serialization, templates), threads to overlap
+# the time requests spend waiting on PostgreSQL and Redis
+workers = int(os.getenv('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+# Idle keep-alive connections are held by a worker's selector, not a thread
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks can't build up; the jitter keeps
+# them from all restarting at once
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+# Import Django once in the master so workers fork with it already loaded
+preload_app = True
+
+# The worker heartbeat file is touched constantly; keep it off the container's overlay filesystem
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_worker_init(worker):
+    """
+    Do the first request's one-off work before the worker takes traffic.
+    """
+    from core.warmup import warm_up
+
+    warm_up()
+
+
+def on_starting(server):
+    """
+    Clear metric files left by a previous run when the workers share metrics
+    through PROMETHEUS_MULTIPROC_DIR (see core/metrics.py).
+    """
+    directory = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith('.db'):
+                os.remove(os.path.join(directory, name))
+
+
+def child_exit(server, worker):
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
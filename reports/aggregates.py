@@ -0,0 +1,141 @@
+"""
+Circulation aggregates for the library report, computed in shards.
+
+Books are split into ranges of ``book_id`` and each range is aggregated in
+SQL on its own (``compute_shard``), so the work can run in parallel Celery
+tasks and no single query scans the whole borrow history. A book and all of
+its loans fall in exactly one shard, which keeps the merge (``merge``) exact:
+per-book figures are never split, and per-author and library-wide figures
+are plain sums. Partials use lists rather than dicts keyed by id because
+they travel through Celery's JSON serializer, which would turn int keys into
+strings.
+"""
+import heapq
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Max, Min, Q, Sum
+
+from authors.models import Author
+from books.models import Book
+from borrowrecords.models import BorrowRecord, LOAN_PERIOD_DAYS
+from .models import ArchivedCirculation
+
+
+def shard_ranges(shard_size=None):
+    """
+    Half-open [low, high) book id ranges covering every book.
+    """
+    shard_size = shard_size or settings.REPORT_SHARD_BOOKS
+    bounds = Book.objects.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return []
+    return [
+        (low, min(low + shard_size, bounds['high'] + 1))
+        for low in range(bounds['low'], bounds['high'] + 1, shard_size)
+    ]
+
+
+def compute_shard(low, high, today, top_n=None):
+    """
+    Partial aggregates of the books with ``low <= id < high`` and their loans.
+    """
+    top_n = top_n or settings.REPORT_TOP_N
+    cutoff = today - timedelta(days=LOAN_PERIOD_DAYS)
+    open_loan = Q(return_date__isnull=True)
+    overdue = open_loan & Q(borrow_date__lt=cutoff)
+    loans = BorrowRecord.objects.filter(book_id__gte=low, book_id__lt=high).order_by()
+
+    books = Book.objects.filter(id__gte=low, id__lt=high).aggregate(
+        books=Count('id'),
+        available=Sum('available_copies', default=0),
+        fully_out=Count('id', filter=Q(available_copies=0)),
+    )
+    totals = loans.aggregate(
+        loans=Count('id'),
+        open_loans=Count('id', filter=open_loan),
+        overdue_loans=Count('id', filter=overdue),
+        returned=Count('id', filter=Q(return_date__isnull=False)),
+        returned_late=Count('id', filter=Q(return_date__gt=F('borrow_date') + timedelta(days=LOAN_PERIOD_DAYS))),
+    )
+    totals.update(ArchivedCirculation.objects.filter(book_id__gte=low, book_id__lt=high).aggregate(
+        archived_loans=Sum('loans', default=0),
+    ))
+    # Every book lives in one shard, so a shard's top N holds every book
+    # that can make the overall top N
+    top_books = list(
+        loans.values('book_id').annotate(loans=Count('id')).order_by('-loans', 'book_id')
+        .values_list('book_id', 'loans')[:top_n]
+    )
+    authors = list(
+        loans.values('book__author_id').annotate(
+            loans=Count('id'), open_loans=Count('id', filter=open_loan), overdue_loans=Count('id', filter=overdue),
+        ).values_list('book__author_id', 'loans', 'open_loans', 'overdue_loans')
+    )
+    return {'range': [low, high], **books, **totals, 'top_books': top_books, 'authors': authors}
+
+
+def merge(partials, top_n=None):
+    """
+    Combine shard partials into the report's circulation sections.
+    """
+    top_n = top_n or settings.REPORT_TOP_N
+    totals = {
+        name: sum(partial[name] for partial in partials)
+        for name in ('books', 'available', 'fully_out', 'loans', 'open_loans', 'overdue_loans',
+                     'returned', 'returned_late', 'archived_loans')
+    }
+
+    top_books = heapq.nlargest(
+        top_n, (row for partial in partials for row in partial['top_books']), key=lambda row: (row[1], -row[0])
+    )
+    titles = dict(Book.objects.filter(pk__in=[book_id for book_id, _ in top_books]).values_list('id', 'title'))
+
+    authors = {}
+    for partial in partials:
+        for author_id, loans, open_loans, overdue_loans in partial['authors']:
+            row = authors.setdefault(author_id, [0, 0, 0])
+            row[0] += loans
+            row[1] += open_loans
+            row[2] += overdue_loans
+    names = dict(Author.objects.filter(pk__in=authors).values_list('id', 'name'))
+
+    copies = totals['available'] + totals['open_loans']
+    # Loan figures cover the borrow table; archived_loans counts the loans
+    # archived out of it (borrowrecords.partitions), which they leave out
+    return {
+        'utilization': {
+            'books': totals['books'],
+            'copies': copies,
+            'available_copies': totals['available'],
+            'open_loans': totals['open_loans'],
+            'utilization_rate': ratio(totals['open_loans'], copies),
+            'books_fully_out': totals['fully_out'],
+        },
+        'overdue': {
+            'open_loans': totals['open_loans'],
+            'overdue_loans': totals['overdue_loans'],
+            'overdue_rate': ratio(totals['overdue_loans'], totals['open_loans']),
+            'returned_loans': totals['returned'],
+            'returned_late': totals['returned_late'],
+            'late_return_rate': ratio(totals['returned_late'], totals['returned']),
+        },
+        'total_loans': totals['loans'],
+        'archived_loans': totals['archived_loans'],
+        'top_borrowed_books': [
+            {'book_id': book_id, 'title': titles.get(book_id), 'loans': loans} for book_id, loans in top_books
+        ],
+        'author_circulation': [
+            {
+                'author_id': author_id, 'name': names.get(author_id),
+                'loans': loans, 'open_loans': open_loans, 'overdue_loans': overdue_loans,
+            }
+            for author_id, (loans, open_loans, overdue_loans) in sorted(
+                authors.items(), key=lambda item: (-item[1][0], item[0])
+            )
+        ],
+    }
+
+
+def ratio(part, whole):
+    return round(part / whole, 4) if whole else 0.0
@@ -0,0 +1,73 @@
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import LibraryCounter
+
+
+def get_shard_count():
+    return getattr(settings, 'LIBRARY_COUNTER_SHARDS', 8)
+
+
+def increment(name, delta=1):
+    """
+    Add `delta` to a counter. Call it inside the transaction that makes the
+    change being counted, so the counter commits or rolls back with it.
+    """
+    if not delta:
+        return
+    shard = random.randrange(get_shard_count())
+    if LibraryCounter.objects.filter(name=name, shard=shard).update(value=F('value') + delta):
+        return
+    # The shard doesn't exist yet (the shard count was raised). If the counter
+    # was never seeded at all, nothing is updated and reconcile() counts this
+    # change from the source table instead.
+    LibraryCounter.objects.filter(name=name, shard=0).update(value=F('value') + delta)
+
+
+def snapshot():
+    """
+    Current value of every counter, read from a few rows regardless of table sizes.
+    Counters that were never seeded by reconcile() are missing from the result.
+    """
+    return dict(
+        LibraryCounter.objects.values('name')
+        .annotate(total=Sum('value'))
+        .values_list('name', 'total')
+    )
+
+
+def reconcile():
+    """
+    Recount every statistic from the source tables and overwrite the counters.
+
+    Each counter's shards are locked while it is recounted, so writes made
+    during the recount wait and then apply on top of the exact value instead
+    of being lost. Only writers of that one statistic wait, and only for its
+    COUNT. Returns the drift that was corrected for each counter.
+    """
+    # Imported here: these apps import this module to maintain the counters
+    from authors.models import Author
+    from books.models import Book
+    from borrowrecords.models import BorrowRecord
+
+    sources = {
+        LibraryCounter.AUTHORS: Author.objects.all(),
+        LibraryCounter.BOOKS: Book.objects.all(),
+        LibraryCounter.OPEN_LOANS: BorrowRecord.objects.open(),
+    }
+    drift = {}
+    for name, queryset in sources.items():
+        with transaction.atomic():
+            LibraryCounter.objects.bulk_create(
+                [LibraryCounter(name=name, shard=index) for index in range(get_shard_count())],
+                ignore_conflicts=True,
+            )
+            shards = list(LibraryCounter.objects.select_for_update().filter(name=name).order_by('shard'))
+            actual = queryset.count()
+            drift[name] = actual - sum(shard.value for shard in shards)
+            LibraryCounter.objects.filter(name=name).update(value=0)
+            LibraryCounter.objects.filter(name=name, shard=0).update(value=actual)
+    return drift
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from reports import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the daily circulation rollup up to date now, as the scheduled task does. "
+        "Use --full to rebuild it from the whole borrow history."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild every day instead of the changed ones")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = rollups.refresh_daily_circulation(full=options['full'])
+        summary = "Rebuilt the rollup" if days is None else f"Recounted {days} days"
+        self.stdout.write(f"{summary} in {time.perf_counter() - started:.2f}s")
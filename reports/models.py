@@ -8,3 +8,115 @@ class Report(models.Model):
 
     def __str__(self):
         return f"Report {self.id} - {self.created_at.strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+class LibraryCounter(models.Model):
+    """
+    One shard of a running library statistic.
+
+    A statistic's value is the sum of its shards. Writers bump a random shard,
+    so concurrent borrows don't all queue on the same row lock, and readers sum
+    a handful of rows instead of counting whole tables.
+    """
+    AUTHORS = 'authors'
+    BOOKS = 'books'
+    OPEN_LOANS = 'open_loans'
+    NAMES = (AUTHORS, BOOKS, OPEN_LOANS)
+
+    name = models.CharField(max_length=50)
+    shard = models.PositiveSmallIntegerField()
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}[{self.shard}] = {self.value}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'shard'], name='library_counter_name_shard_uniq'),
+        ]
+
+
+class DailyCirculation(models.Model):
+    """
+    Loans and returns of one book on one day, rolled up from BorrowRecord.
+
+    Kept up to date by reports.rollups.refresh_daily_circulation, so
+    date-range questions read a few rows per day instead of the borrow
+    history.
+    """
+    day = models.DateField(help_text="Day the loans were made or the copies returned")
+    book = models.ForeignKey(
+        'books.Book',
+        on_delete=models.CASCADE,
+        related_name='daily_circulation',
+        help_text="Book that circulated"
+    )
+    loans = models.PositiveIntegerField(default=0, help_text="Loans of the book made that day")
+    returns = models.PositiveIntegerField(default=0, help_text="Copies of the book returned that day")
+
+    def __str__(self):
+        return f"{self.day} book {self.book_id}: {self.loans} loans, {self.returns} returns"
+
+    class Meta:
+        constraints = [
+            # Also the index behind per-book date ranges
+            models.UniqueConstraint(fields=['book', 'day'], name='daily_circulation_book_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='daily_circulation_day_idx'),
+        ]
+
+
+class DailyCirculationTotal(models.Model):
+    """
+    Library-wide loans and returns per day: DailyCirculation summed over
+    books, so a daily series costs one row per day.
+    """
+    day = models.DateField(unique=True)
+    loans = models.PositiveIntegerField(default=0)
+    returns = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.loans} loans, {self.returns} returns"
+
+
+class ArchivedCirculation(models.Model):
+    """
+    Loans and returns of one book on one day among borrow records archived
+    out of the borrow table, which a rebuild of the rollup can no longer
+    count there. Filled in by reports.rollups.archive_counts.
+    """
+    day = models.DateField(help_text="Day the loans were made or the copies returned")
+    book = models.ForeignKey(
+        'books.Book',
+        on_delete=models.CASCADE,
+        related_name='archived_circulation',
+        help_text="Book that circulated"
+    )
+    loans = models.PositiveIntegerField(default=0, help_text="Archived loans of the book made that day")
+    returns = models.PositiveIntegerField(default=0, help_text="Archived loans of the book returned that day")
+
+    def __str__(self):
+        return f"{self.day} book {self.book_id}: {self.loans} archived loans, {self.returns} returns"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'day'], name='archived_circulation_book_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['day'], name='archived_circulation_day_idx'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """
+    How far a rollup has processed its source: the highest source id seen
+    and the day of the last refresh.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_record_id = models.BigIntegerField(default=0)
+    refreshed_on = models.DateField(null=True, blank=True)
+    refreshed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} through record {self.last_record_id} on {self.refreshed_on}"
@@ -0,0 +1,135 @@
+"""
+Daily circulation rollup of the borrow history.
+
+``refresh_daily_circulation`` recounts only the days that can have changed
+since its watermark and rewrites their rows in DailyCirculation and
+DailyCirculationTotal:
+
+- loans and returns made through the app are stamped with the current date,
+  so every day from the day before the last refresh to today is recounted
+  (the day before catches transactions that committed after midnight);
+- rows inserted with an older date (imports, bulk loads) are found by id,
+  above the highest BorrowRecord id the last refresh saw.
+
+Edits that move an existing record to another past day (admin, raw SQL)
+aren't tracked; ``full=True`` rebuilds everything.
+
+Borrow records archived out of the table (borrowrecords.partitions) leave
+their counts behind in ArchivedCirculation, which every recount adds in, so
+a rebuild after archiving still covers the whole history.
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from borrowrecords.models import BorrowRecord
+from .models import ArchivedCirculation, DailyCirculation, DailyCirculationTotal, RollupWatermark
+
+WATERMARK = 'daily_circulation'
+
+
+def refresh_daily_circulation(full=False):
+    """
+    Bring the rollup up to date. Returns the number of days recounted, or
+    None after a full rebuild.
+    """
+    today = timezone.localdate()
+    with transaction.atomic():
+        RollupWatermark.objects.get_or_create(name=WATERMARK)
+        # Serialize refreshes: a second one waits and then sees this one's watermark
+        watermark = RollupWatermark.objects.select_for_update().get(name=WATERMARK)
+        high_id = BorrowRecord.objects.aggregate(high=Max('id'))['high'] or 0
+
+        if full or watermark.refreshed_on is None:
+            days = None
+            recount(None)
+        else:
+            start = watermark.refreshed_on - timedelta(days=1)
+            days = {start + timedelta(days=offset) for offset in range((today - start).days + 1)}
+            days.update(
+                BorrowRecord.objects.filter(id__gt=watermark.last_record_id, id__lte=high_id)
+                .order_by().values_list('borrow_date', flat=True).distinct()
+            )
+            recount(sorted(days))
+
+        watermark.last_record_id = high_id
+        watermark.refreshed_on = today
+        watermark.refreshed_at = timezone.now()
+        watermark.save()
+    return None if days is None else len(days)
+
+
+def counts_sql(records, borrowed='', returned='WHERE return_date IS NOT NULL'):
+    """
+    SELECT of (day, book_id, loans, returns) per day and book of the borrow
+    records in table ``records``, restricted by the two WHERE clauses.
+    """
+    return f'''
+        SELECT day, book_id, SUM(loans) AS loans, SUM(returns) AS returns FROM (
+            SELECT borrow_date AS day, book_id, COUNT(*) AS loans, 0 AS returns
+            FROM {records} {borrowed} GROUP BY borrow_date, book_id
+            UNION ALL
+            SELECT return_date, book_id, 0, COUNT(*)
+            FROM {records} {returned} GROUP BY return_date, book_id
+        ) counts
+        GROUP BY day, book_id
+    '''
+
+
+def recount(days):
+    """
+    Replace the rollup rows of ``days`` (every day when None) with counts
+    from the borrow history and its archived counts, in two set-based
+    statements per table.
+    """
+    circulation = DailyCirculation._meta.db_table
+    totals = DailyCirculationTotal._meta.db_table
+    archived = ArchivedCirculation._meta.db_table
+    records = BorrowRecord._meta.db_table
+    if days is None:
+        borrowed, returned, within, params = '', 'WHERE return_date IS NOT NULL', '', []
+    else:
+        borrowed, returned = 'WHERE borrow_date = ANY(%s)', 'WHERE return_date = ANY(%s)'
+        within, params = 'WHERE day = ANY(%s)', [days]
+
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {circulation} {within}', params)
+        cursor.execute(f'DELETE FROM {totals} {within}', params)
+        cursor.execute(
+            f'''
+            INSERT INTO {circulation} (day, book_id, loans, returns)
+            SELECT day, book_id, SUM(loans), SUM(returns) FROM (
+                {counts_sql(records, borrowed, returned)}
+                UNION ALL
+                SELECT day, book_id, loans, returns FROM {archived} {within}
+            ) counts
+            GROUP BY day, book_id
+            ''',
+            params * 3,
+        )
+        cursor.execute(
+            f'''
+            INSERT INTO {totals} (day, loans, returns)
+            SELECT day, SUM(loans), SUM(returns) FROM {circulation} {within} GROUP BY day
+            ''',
+            params,
+        )
+
+
+def archive_counts(cursor, records):
+    """
+    Add the loans and returns of the borrow records in table ``records``,
+    about to be archived, to ArchivedCirculation. Runs in the archiving
+    transaction, so the rollup's counts never miss or double them.
+    """
+    archived = ArchivedCirculation._meta.db_table
+    cursor.execute(
+        f'''
+        INSERT INTO {archived} (day, book_id, loans, returns)
+        {counts_sql(records)}
+        ON CONFLICT (book_id, day) DO UPDATE
+        SET loans = {archived}.loans + EXCLUDED.loans, returns = {archived}.returns + EXCLUDED.returns
+        '''
+    )
@@ -1,3 +1,6 @@
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
 from rest_framework import serializers
 from .models import Report
 
@@ -5,3 +8,38 @@ class ReportSerializer(serializers.ModelSerializer):
     class Meta:
         model = Report
         fields = ['id', 'created_at', 'file_path']
+
+
+class CirculationRangeSerializer(serializers.Serializer):
+    """
+    Query parameters of the circulation endpoints: an inclusive date range,
+    by default the 30 days up to today, of at most CIRCULATION_MAX_DAYS days
+    """
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    book = serializers.IntegerField(required=False, min_value=1)
+    limit = serializers.IntegerField(required=False, min_value=1, max_value=100, default=20)
+
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.localdate()
+        attrs['start'] = attrs.get('start') or attrs['end'] - timedelta(days=29)
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("'start' must not be after 'end'")
+        if (attrs['end'] - attrs['start']).days >= settings.CIRCULATION_MAX_DAYS:
+            raise serializers.ValidationError(
+                f"The date range must not be longer than {settings.CIRCULATION_MAX_DAYS} days"
+            )
+        return attrs
+
+
+class DailyCirculationSerializer(serializers.Serializer):
+    day = serializers.DateField()
+    loans = serializers.IntegerField()
+    returns = serializers.IntegerField()
+
+
+class BookCirculationSerializer(serializers.Serializer):
+    book_id = serializers.IntegerField()
+    title = serializers.CharField()
+    loans = serializers.IntegerField()
+    returns = serializers.IntegerField()
@@ -0,0 +1,54 @@
+from django.db.models import Count, Q, QuerySet
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
+
+from authors.models import Author
+from books.models import Book
+from . import counters
+from .models import LibraryCounter
+
+
+@receiver(post_save, sender=Author)
+def count_created_author(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(LibraryCounter.AUTHORS)
+
+
+@receiver(post_save, sender=Book)
+def count_created_book(sender, instance, created, **kwargs):
+    if created:
+        counters.increment(LibraryCounter.BOOKS)
+
+
+@receiver(pre_delete, sender=Author)
+@receiver(pre_delete, sender=Book)
+def count_deletion(sender, instance, origin=None, **kwargs):
+    """
+    Take the authors and books of a delete, and the open loans cascading
+    with them, off the counters. Django sends pre_delete for every instance
+    before deleting any, so the whole operation is counted at the first one
+    from its origin, with one aggregate instead of queries per book.
+    """
+    if isinstance(origin, (Author, Book)):
+        deleted = type(origin).objects.filter(pk=origin.pk)
+    elif isinstance(origin, QuerySet) and origin.model in (Author, Book):
+        deleted = origin
+    else:
+        # Started from some other model's cascade: count this instance alone
+        origin, deleted = instance, sender.objects.filter(pk=instance.pk)
+    if getattr(origin, '_library_counted', False):
+        return
+    origin._library_counted = True
+
+    if deleted.model is Author:
+        authors = 1 if isinstance(origin, Author) else deleted.count()
+        books = Book.objects.filter(author__in=deleted)
+    else:
+        authors, books = 0, deleted
+    totals = books.aggregate(
+        books=Count('id', distinct=True),
+        open_loans=Count('borrow_records', filter=Q(borrow_records__return_date__isnull=True)),
+    )
+    counters.increment(LibraryCounter.AUTHORS, -authors)
+    counters.increment(LibraryCounter.BOOKS, -totals['books'])
+    counters.increment(LibraryCounter.OPEN_LOANS, -totals['open_loans'])
@@ -1,11 +1,11 @@
 import os
 import json
-from datetime import datetime
-from celery import shared_task
+from datetime import date, datetime
+from celery import chord, shared_task
 from django.conf import settings
-from authors.models import Author
-from books.models import Book
-from borrowrecords.models import BorrowRecord
+from django.utils import timezone
+from . import aggregates, counters, rollups
+from .models import LibraryCounter, Report
 import logging
 
 logger = logging.getLogger(__name__)
@@ -14,37 +14,94 @@ logger = logging.getLogger(__name__)
 def generate_library_report():
     """
     Generate a comprehensive library report
+    Splits the books into id ranges aggregated by parallel compute_report_shard
+    tasks, whose partials a chord hands to merge_report_shards to write the file
+    Returns the id of the merge task's result
+    """
+    generated_at = timezone.now()
+    shards = [
+        compute_report_shard.s(low, high, generated_at.date().isoformat())
+        for low, high in aggregates.shard_ranges()
+    ]
+    logger.info("Generating library report over %d shards", len(shards))
+    merge = merge_report_shards.s(generated_at.isoformat())
+    if not shards:
+        return merge.delay([]).id
+    return chord(shards)(merge).id
+
+
+@shared_task
+def compute_report_shard(low, high, today):
+    """
+    Aggregate the books with low <= id < high and their loans
+    """
+    return aggregates.compute_shard(low, high, date.fromisoformat(today))
+
+
+@shared_task
+def merge_report_shards(partials, generated_at):
+    """
+    Merge the shard aggregates with the library counters, write the report
+    file and record it as a Report
+    Totals come from the maintained library counters instead of COUNT(*) scans
     """
     try:
+        stats = counters.snapshot()
+        if any(name not in stats for name in LibraryCounter.NAMES):
+            # First run against existing data: seed the counters once
+            counters.reconcile()
+            stats = counters.snapshot()
+
         report_data = {
-            'total_authors': Author.objects.count(),
-            'total_books': Book.objects.count(),
-            'total_borrowed_books': BorrowRecord.objects.filter(return_date__isnull=True).count(),
-            'generated_at': datetime.now().isoformat()
+            'total_authors': stats[LibraryCounter.AUTHORS],
+            'total_books': stats[LibraryCounter.BOOKS],
+            'total_borrowed_books': stats[LibraryCounter.OPEN_LOANS],
+            'generated_at': generated_at,
+            'shards': len(partials),
+            **aggregates.merge(partials),
         }
         
         reports_dir = os.path.abspath(settings.REPORTS_DIR)
-        print(f"Reports directory path: {reports_dir}")
-        
         os.makedirs(reports_dir, exist_ok=True)
         
-        filename = f'report_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
+        filename = f'report_{datetime.fromisoformat(generated_at).strftime("%Y%m%d_%H%M%S")}.json'
         filepath = os.path.join(reports_dir, filename)
-        print(f"Attempting to write report to: {filepath}")
-        
         with open(filepath, 'w') as f:
             json.dump(report_data, f, indent=4)
         
-        print(f"Successfully wrote report to: {filepath}")
-        
-        if os.path.exists(filepath):
-            print("File verification successful")
+        # FileField names are relative to MEDIA_ROOT when the file is under it
+        media_root = os.path.abspath(settings.MEDIA_ROOT)
+        if os.path.commonpath([media_root, filepath]) == media_root:
+            name = os.path.relpath(filepath, media_root)
         else:
-            print("File was not created successfully")
-            
+            name = filepath
+        Report.objects.create(file_path=name)
+        logger.info("Wrote library report to %s", filepath)
         return filepath
         
-    except Exception as e:
-        print(f"Error generating report: {str(e)}")
+    except Exception:
+        logger.exception("Error generating library report")
         raise
-    
\ No newline at end of file
+
+
+@shared_task
+def reconcile_library_counters():
+    """
+    Recount the library statistics from the source tables to correct any drift
+    left by writes that bypass the counters (admin edits, raw SQL, bulk deletes)
+    """
+    drift = counters.reconcile()
+    corrected = {name: delta for name, delta in drift.items() if delta}
+    if corrected:
+        logger.warning("Library counters drifted and were corrected: %s", corrected)
+    return drift
+
+
+@shared_task
+def refresh_daily_circulation():
+    """
+    Recount the days of the daily circulation rollup changed since its watermark
+    """
+    days = rollups.refresh_daily_circulation()
+    logger.info("Daily circulation rollup refreshed: %s", f"{days} days recounted" if days is not None else "rebuilt")
+    return days
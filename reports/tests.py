@@ -1,3 +1,334 @@
-from django.test import TestCase
+import tempfile
+import json
+from datetime import timedelta
+from django.contrib.auth.models import User
+from django.db import connection
+from django.utils import timezone
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework import status
+from authors.models import Author
+from books.models import Book
+from borrowrecords.models import BorrowRecord
+from core.celery import app as celery_app
+from core.testing import QueryBudgetMixin
+from . import counters
+from .models import DailyCirculation, DailyCirculationTotal, LibraryCounter, Report
+from .rollups import refresh_daily_circulation
+from .tasks import generate_library_report, merge_report_shards
 
-# Create your tests here.
+
+class LibraryCounterTestCase(QueryBudgetMixin, TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        counters.reconcile()
+        self.author = Author.objects.create(name="Author Name")
+        self.books = [
+            Book.objects.create(title=f"Book {i}", author=self.author, isbn=f"{i:010d}", available_copies=5)
+            for i in range(3)
+        ]
+
+    def assertCountersMatchTables(self):
+        self.assertEqual(
+            counters.snapshot(),
+            {
+                LibraryCounter.AUTHORS: Author.objects.count(),
+                LibraryCounter.BOOKS: Book.objects.count(),
+                LibraryCounter.OPEN_LOANS: BorrowRecord.objects.open().count(),
+            },
+        )
+
+    def test_counters_follow_borrow_and_return(self):
+        """
+        Test single and bulk borrows/returns keep the open loan counter exact
+        """
+        self.client.post("/api/borrow/", {"book": self.books[0].id, "borrowed_by": "Reader"})
+        items = [{"book": book.id, "borrowed_by": "Reader"} for book in self.books]
+        self.client.post("/api/borrow/bulk/", {"items": items}, format="json")
+        self.assertCountersMatchTables()
+
+        record = BorrowRecord.objects.first()
+        self.client.put(f"/api/borrow/{record.id}/return/")
+        ids = list(BorrowRecord.objects.open().values_list("id", flat=True))
+        self.client.put("/api/borrow/bulk/return/", {"ids": ids[:2]}, format="json")
+        self.assertCountersMatchTables()
+
+    def test_counters_follow_deletes(self):
+        """
+        Test cascading deletes take books and their open loans off the counters
+        """
+        BorrowRecord.objects.create(book=self.books[1], borrowed_by="Reader")
+        counters.increment(LibraryCounter.OPEN_LOANS)
+        self.author.delete()
+        self.assertCountersMatchTables()
+
+    def test_cascading_delete_counts_once(self):
+        """
+        Test deleting an author costs the same queries however many books it has, and
+        queryset deletes of books and authors keep the counters right
+        """
+        def author_with_books(name, count):
+            author = Author.objects.create(name=name)
+            books = Book.objects.bulk_create([
+                Book(title=f"{name} {i}", author=author, isbn=f"{count:02d}{i:08d}", available_copies=1)
+                for i in range(count)
+            ])
+            counters.increment(LibraryCounter.BOOKS, count)
+            BorrowRecord.objects.create(book=books[0], borrowed_by="Reader")
+            counters.increment(LibraryCounter.OPEN_LOANS)
+            return author
+
+        small, large = author_with_books("Small", 2), author_with_books("Large", 20)
+        with CaptureQueriesContext(connection) as few:
+            small.delete()
+        with CaptureQueriesContext(connection) as many:
+            large.delete()
+        self.assertEqual(len(many), len(few))
+        self.assertCountersMatchTables()
+
+        BorrowRecord.objects.create(book=self.books[0], borrowed_by="Reader")
+        counters.increment(LibraryCounter.OPEN_LOANS)
+        Book.objects.filter(pk__in=[self.books[0].pk, self.books[1].pk]).delete()
+        self.assertCountersMatchTables()
+        Author.objects.create(name="Other")
+        Author.objects.all().delete()
+        self.assertCountersMatchTables()
+
+    def test_reconcile_corrects_drift(self):
+        """
+        Test reconciliation recounts counters that drifted
+        """
+        Book.objects.filter(pk=self.books[0].pk).delete()
+        Book.objects.bulk_create([Book(title="Raw", author=self.author, isbn="9999999999")])
+        counters.increment(LibraryCounter.AUTHORS, 7)
+
+        drift = counters.reconcile()
+        self.assertEqual(drift[LibraryCounter.AUTHORS], -7)
+        self.assertCountersMatchTables()
+
+    def test_report_reads_counters(self):
+        """
+        Test the report totals are read from the counters without counting the tables
+        """
+        with tempfile.TemporaryDirectory() as reports_dir, override_settings(REPORTS_DIR=reports_dir):
+            # The counter snapshot and the Report row
+            with self.assertMaxQueries(2):
+                filepath = merge_report_shards([], timezone.now().isoformat())
+            with open(filepath) as f:
+                report = json.load(f)
+        self.assertEqual(report["total_authors"], 1)
+        self.assertEqual(report["total_books"], 3)
+        self.assertEqual(report["total_borrowed_books"], 0)
+
+
+class ReportPipelineTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        # Run the chord in process instead of on a worker
+        eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", eager)
+
+        counters.reconcile()
+        self.ann = Author.objects.create(name="Ann")
+        self.bob = Author.objects.create(name="Bob")
+        self.books = [
+            Book.objects.create(title=f"Book {index}", author=author, isbn=f"{index:010d}", available_copies=2)
+            for index, author in enumerate([self.ann, self.ann, self.bob, self.bob, self.bob])
+        ]
+        today = timezone.localdate()
+        loans = [
+            # (book, days ago, days until returned or None while out)
+            (0, 3, None), (0, 40, 5), (0, 60, 20),
+            (1, 30, None), (1, 10, 2),
+            (2, 90, 30), (2, 50, 1), (2, 20, 3), (2, 2, None),
+            (4, 16, None),
+        ]
+        for book, days_ago, kept in loans:
+            record = BorrowRecord.objects.create(book=self.books[book], borrowed_by="Reader")
+            borrow_date = today - timedelta(days=days_ago)
+            BorrowRecord.objects.filter(pk=record.pk).update(
+                borrow_date=borrow_date,
+                return_date=None if kept is None else borrow_date + timedelta(days=kept),
+            )
+        # Copies on the shelf after the four open loans
+        for book, out in ((0, 1), (1, 1), (2, 1), (4, 1)):
+            Book.objects.filter(pk=self.books[book].pk).update(available_copies=2 - out)
+
+    def generate(self, shard_books):
+        with override_settings(REPORTS_DIR=self.reports_dir, REPORT_SHARD_BOOKS=shard_books, REPORT_TOP_N=2):
+            generate_library_report()
+        report = Report.objects.order_by("-id").first()
+        with open(report.file_path.name) as f:
+            return json.load(f)
+
+    def test_sharded_report_matches_single_shard(self):
+        """
+        Test splitting the books into shards gives the same aggregates as one shard
+        """
+        with tempfile.TemporaryDirectory() as self.reports_dir:
+            sharded = self.generate(shard_books=2)
+            whole = self.generate(shard_books=1000)
+        self.assertEqual(sharded["shards"], 3)
+        self.assertEqual(whole["shards"], 1)
+        for key in ("utilization", "overdue", "total_loans", "top_borrowed_books", "author_circulation"):
+            self.assertEqual(sharded[key], whole[key])
+
+        self.assertEqual(sharded["total_loans"], 10)
+        self.assertEqual(
+            [(book["title"], book["loans"]) for book in sharded["top_borrowed_books"]],
+            [("Book 2", 4), ("Book 0", 3)],
+        )
+        self.assertEqual(
+            [(author["name"], author["loans"], author["open_loans"], author["overdue_loans"])
+             for author in sharded["author_circulation"]],
+            [("Ann", 5, 2, 1), ("Bob", 5, 2, 1)],
+        )
+        self.assertEqual(sharded["utilization"]["copies"], 10)
+        self.assertEqual(sharded["utilization"]["open_loans"], 4)
+        self.assertEqual(sharded["utilization"]["utilization_rate"], 0.4)
+        self.assertEqual(sharded["overdue"]["overdue_loans"], 2)
+        self.assertEqual(sharded["overdue"]["overdue_rate"], 0.5)
+        self.assertEqual(sharded["overdue"]["returned_late"], 2)
+        self.assertEqual(sharded["overdue"]["late_return_rate"], round(2 / 6, 4))
+
+    def test_report_view_returns_latest_report(self):
+        """
+        Test the generated report is recorded and served by the report endpoint
+        """
+        with tempfile.TemporaryDirectory() as self.reports_dir:
+            self.generate(shard_books=2)
+        response = self.client.get("/api/reports/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], Report.objects.get().id)
+
+
+class CirculationRollupTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="librarian", password="password123")
+        self.client.force_authenticate(user=self.user)
+        self.today = timezone.localdate()
+        author = Author.objects.create(name="Author Name")
+        self.books = [
+            Book.objects.create(title=f"Book {index}", author=author, isbn=f"{index:010d}", available_copies=5)
+            for index in range(3)
+        ]
+        # (book, days ago, days until returned or None while out)
+        for book, days_ago, kept in [(0, 5, 2), (0, 5, None), (1, 5, 3), (1, 2, None), (2, 40, 1)]:
+            self.borrow(book, days_ago, kept)
+
+    def borrow(self, book, days_ago, kept=None):
+        record = BorrowRecord.objects.create(book=self.books[book], borrowed_by="Reader")
+        borrow_date = self.today - timedelta(days=days_ago)
+        BorrowRecord.objects.filter(pk=record.pk).update(
+            borrow_date=borrow_date,
+            return_date=None if kept is None else borrow_date + timedelta(days=kept),
+        )
+        return record
+
+    def rollup(self):
+        return {
+            (row.book_id, (self.today - row.day).days): (row.loans, row.returns)
+            for row in DailyCirculation.objects.all()
+        }
+
+    def test_refresh_rolls_up_loans_and_returns(self):
+        """
+        Test a first refresh counts each book's loans and returns per day
+        """
+        self.assertIsNone(refresh_daily_circulation())
+        book0, book1, book2 = (book.id for book in self.books)
+        self.assertEqual(self.rollup(), {
+            (book0, 5): (2, 0), (book0, 3): (0, 1),
+            (book1, 5): (1, 0), (book1, 2): (1, 1),
+            (book2, 40): (1, 0), (book2, 39): (0, 1),
+        })
+        self.assertEqual(
+            DailyCirculationTotal.objects.get(day=self.today - timedelta(days=5)).loans, 3
+        )
+
+    def test_incremental_refresh_picks_up_changes(self):
+        """
+        Test a later refresh adds today's loans and returns and backdated
+        inserts, and ends up where a full rebuild does
+        """
+        refresh_daily_circulation()
+        open_loan = BorrowRecord.objects.get(book=self.books[1], return_date__isnull=True)
+        self.client.put(f"/api/borrow/{open_loan.id}/return/")
+        self.client.post("/api/borrow/", {"book": self.books[2].id, "borrowed_by": "Reader"})
+        self.borrow(2, 100, 1)
+
+        days = refresh_daily_circulation()
+        # The day before the last refresh, today and the backdated loan's day
+        self.assertEqual(days, 3)
+        book1, book2 = self.books[1].id, self.books[2].id
+        incremental = self.rollup()
+        self.assertEqual(incremental[(book1, 0)], (0, 1))
+        self.assertEqual(incremental[(book2, 0)], (1, 0))
+        self.assertEqual(incremental[(book2, 100)], (1, 0))
+        # The return a day later falls outside the recounted days
+        self.assertNotIn((book2, 99), incremental)
+
+        refresh_daily_circulation(full=True)
+        rebuilt = self.rollup()
+        self.assertEqual(rebuilt[(book2, 99)], (0, 1))
+        del rebuilt[(book2, 99)]
+        self.assertEqual(incremental, rebuilt)
+
+    def test_daily_view_fills_empty_days(self):
+        """
+        Test the daily endpoint returns every day of the range, zeros included
+        """
+        refresh_daily_circulation()
+        start = self.today - timedelta(days=6)
+        response = self.client.get("/api/reports/circulation/", {"start": start.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["days"]), 7)
+        self.assertEqual(
+            [(day["loans"], day["returns"]) for day in response.data["days"]],
+            [(0, 0), (3, 0), (0, 0), (0, 1), (1, 1), (0, 0), (0, 0)],
+        )
+        self.assertEqual((response.data["loans"], response.data["returns"]), (4, 2))
+        self.assertIsNotNone(response.data["refreshed_at"])
+
+        response = self.client.get(
+            "/api/reports/circulation/", {"start": start.isoformat(), "book": self.books[1].id}
+        )
+        self.assertEqual((response.data["loans"], response.data["returns"]), (2, 1))
+
+    def test_top_books_view(self):
+        """
+        Test the top books endpoint ranks the books by loans in the range
+        """
+        refresh_daily_circulation()
+        response = self.client.get("/api/reports/circulation/books/", {"limit": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(row["title"], row["loans"], row["returns"]) for row in response.data["results"]],
+            [("Book 0", 2, 1), ("Book 1", 2, 1)],
+        )
+
+        response = self.client.get("/api/reports/circulation/books/", {
+            "start": self.today.isoformat(), "end": (self.today - timedelta(days=1)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_range_is_capped(self):
+        """
+        Test both endpoints reject ranges longer than CIRCULATION_MAX_DAYS days
+        """
+        with override_settings(CIRCULATION_MAX_DAYS=7):
+            for url in ("/api/reports/circulation/", "/api/reports/circulation/books/"):
+                response = self.client.get(url, {"start": (self.today - timedelta(days=6)).isoformat()})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                response = self.client.get(url, {"start": (self.today - timedelta(days=7)).isoformat()})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get("/api/reports/circulation/", {"start": "0001-01-01", "end": "9999-12-31"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,10 +1,34 @@
+from datetime import timedelta
+from django.db.models import Sum
+from drf_yasg import openapi
+from drf_yasg.utils import swagger_auto_schema
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Report
-from .serializers import ReportSerializer
+from books.models import Book
+from .models import DailyCirculation, DailyCirculationTotal, Report, RollupWatermark
+from .rollups import WATERMARK
+from .serializers import (
+    BookCirculationSerializer,
+    CirculationRangeSerializer,
+    DailyCirculationSerializer,
+    ReportSerializer,
+)
 from .tasks import generate_library_report
 
+RANGE_PARAMETERS = [
+    openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                      description="First day, inclusive (default 29 days before `end`)"),
+    openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                      description="Last day, inclusive (default today); ranges are capped at CIRCULATION_MAX_DAYS days"),
+]
+
+
+def rollup_refreshed_at():
+    return RollupWatermark.objects.filter(name=WATERMARK).values_list('refreshed_at', flat=True).first()
+
+
 class ReportView(APIView):
     def get(self, request):
         """
@@ -24,3 +48,104 @@ class ReportView(APIView):
         # Trigger the Celery task
         task = generate_library_report.delay()
         return Response({"message": "Report generation initiated", "task_id": task.id}, status=status.HTTP_202_ACCEPTED)
+
+
+class CirculationDailyView(APIView):
+    """
+    Daily loans and returns over a date range, from the circulation rollup
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Loans and returns per day over a date range, for the library or one book",
+        manual_parameters=RANGE_PARAMETERS + [
+            openapi.Parameter('book', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Only this book's circulation"),
+        ],
+        responses={200: DailyCirculationSerializer(many=True), 400: "Validation Error"},
+    )
+    def get(self, request):
+        """
+        Read one rollup row per day (per book and day with `book`), so the
+        cost follows the range length, not the size of the borrow history
+        Days without loans or returns are reported as zeros
+        """
+        params = CirculationRangeSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": params.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end, book = params.validated_data['start'], params.validated_data['end'], params.validated_data.get('book')
+        try:
+            rows = DailyCirculation.objects.filter(book_id=book) if book else DailyCirculationTotal.objects.all()
+            counts = {
+                row['day']: row
+                for row in rows.filter(day__range=(start, end)).values('day', 'loans', 'returns')
+            }
+            days = [
+                counts.get(day, {'day': day, 'loans': 0, 'returns': 0})
+                for day in (start + timedelta(days=offset) for offset in range((end - start).days + 1))
+            ]
+            return Response({
+                "start": start,
+                "end": end,
+                "book": book,
+                "refreshed_at": rollup_refreshed_at(),
+                "loans": sum(day['loans'] for day in days),
+                "returns": sum(day['returns'] for day in days),
+                "days": DailyCirculationSerializer(days, many=True).data,
+            })
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving circulation: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )
+
+
+class CirculationTopBooksView(APIView):
+    """
+    Most borrowed books over a date range, from the circulation rollup
+    """
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="The most borrowed books over a date range",
+        manual_parameters=RANGE_PARAMETERS + [
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description="Number of books (default 20, at most 100)"),
+        ],
+        responses={200: BookCirculationSerializer(many=True), 400: "Validation Error"},
+    )
+    def get(self, request):
+        """
+        Sum the per-book rollup rows of the range and keep the top `limit`
+        """
+        params = CirculationRangeSerializer(data=request.query_params)
+        if not params.is_valid():
+            return Response(
+                {"error": "Validation failed", "details": params.errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        start, end, limit = (params.validated_data[name] for name in ('start', 'end', 'limit'))
+        try:
+            top = list(
+                DailyCirculation.objects.filter(day__range=(start, end))
+                .values('book_id')
+                .annotate(loans=Sum('loans'), returns=Sum('returns'))
+                .order_by('-loans', 'book_id')[:limit]
+            )
+            titles = dict(Book.objects.filter(pk__in=[row['book_id'] for row in top]).values_list('id', 'title'))
+            for row in top:
+                row['title'] = titles.get(row['book_id'], '')
+            return Response({
+                "start": start,
+                "end": end,
+                "refreshed_at": rollup_refreshed_at(),
+                "results": BookCirculationSerializer(top, many=True).data,
+            })
+        except Exception as e:
+            return Response(
+                {"error": f"An error occurred while retrieving circulation: {str(e)}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            )